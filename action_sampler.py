@@ -0,0 +1,83 @@
+import numpy as np
+
+from constants import ACTION_BLOCK_SIZE, MAXIMAL_RANDOM_ACTION_DIRECTION, MAXIMAL_RANDOM_ACTION_LENGTH
+
+
+class ActionSampler:
+    """
+    Draws random actions to explore from a seeded numpy random number generator.
+    The actions are drawn in blocks of ACTION_BLOCK_SIZE actions at once and are handed out one after another, so a single action costs only a list access.
+    The same seed always creates the same actions, so simulations are reproducible.
+    The state of the sampler can be saved and restored, e.g. in a checkpoint.
+    """
+
+    def __init__(self, seed=None, block_size: int = ACTION_BLOCK_SIZE):
+        """
+        Creates a new action sampler.
+
+        Parameter
+        ---------
+        seed: int or numpy.random.SeedSequence
+            Seed of the random number generator, by default None for a random seed.
+        block_size: int
+            Number of actions drawn at once, by default ACTION_BLOCK_SIZE.
+        """
+        self._generator = np.random.default_rng(seed)
+        self._block_size = max(1, block_size)
+        self._block_state = None
+        self._directions = []
+        self._lengths = []
+        self._position = 0
+
+    def _draw_block(self):
+        """
+        Draws the next block of actions and remembers the state of the random number generator before drawing.
+        """
+        self._block_state = self._generator.bit_generator.state
+        self._directions = self._generator.integers(
+            0, MAXIMAL_RANDOM_ACTION_DIRECTION + 1, size=self._block_size).tolist()
+        self._lengths = self._generator.integers(
+            0, MAXIMAL_RANDOM_ACTION_LENGTH + 1, size=self._block_size).tolist()
+        self._position = 0
+
+    def next_action(self) -> tuple:
+        """
+        Returns the next random action.
+
+        Returns
+        -------
+        tuple: Direction index and length index of the action.
+        """
+        if self._position >= len(self._directions):
+            self._draw_block()
+        action = (self._directions[self._position],
+                  self._lengths[self._position])
+        self._position += 1
+        return action
+
+    def get_state(self) -> dict:
+        """
+        Returns the state of the sampler, it can be serialized with json.
+
+        Returns
+        -------
+        dict: State of the random number generator before the current block was drawn and the position in the block.
+        """
+        if self._block_state is None:
+            return {'generator': self._generator.bit_generator.state, 'position': 0}
+        return {'generator': self._block_state, 'position': self._position}
+
+    def set_state(self, state: dict):
+        """
+        Restores a state returned by get_state, the following actions are the same as after saving the state.
+
+        Parameter
+        ---------
+        state: dict
+            The saved state.
+        """
+        self._generator.bit_generator.state = state['generator']
+        self._draw_block()
+        self._position = state['position']
+
+# Original Author: Lukas Loeffler
@@ -0,0 +1,271 @@
+import numpy as np
+
+from parking_learner import ParkingLearner
+from transition_table import TransitionTable
+from mirror_symmetry import MirrorSymmetry
+from qtable_storage import decode_qtable, encode_qtable
+from training_metrics import TrainingMonitor
+
+from constants import SIMULATION_BATCH_SIZE, SIMULATION_MAXIMAL_STEPS, SIMULATION_TRUNCATE_REVISITS, SIMULATION_MIRROR_UPDATES, SIMULATION_SKIP_DOOMED_ACTIONS
+
+
+class BatchSimulator:
+    """
+    Simulates many parking episodes in lockstep, instead of one episode after another like ParkingLearner.simulated_parking.
+    The state of all running episodes is stored in numpy arrays, one for rho, phi and orientation, and the random actions are drawn for all episodes at once.
+    The q-table of the parking learner is updated in place with vectorized scatter operations, so the result can be saved like every other q-table.
+    If several episodes update the same state and action combination in the same step, the last update wins.
+    Scaled int16 q-tables are decoded into a float32 copy for the simulation and encoded back afterwards.
+    Finished episodes drop out of the batch and are replaced by new episodes, until all episodes are simulated.
+    A TrainingMonitor can log the training metrics and stop starting new episodes, when the greedy policy is stable.
+    Episodes are truncated after a maximal number of steps and optionally when they reach a state a second time.
+    Every running episode has a slot in a bitset matrix with one bit per state, the slot is cleared, when a new episode gets it.
+    If the parking learner counts visits, every update of a state and action combination is counted, also if several episodes update it in the same step.
+    With mirror updates, every step also updates the mirrored state and action combination, if the transition table shows that it is mirror symmetric.
+    Doomed actions leave the q-table immediately, their q value doesn't depend on the q-table. If they are skipped, they are filled in bulk at the start
+    and the random actions are drawn only from the other actions of a state, so no step is spent on an episode ending at once.
+    """
+
+    def __init__(self, parking_learner: ParkingLearner, batch_size: int = SIMULATION_BATCH_SIZE, transition_table: TransitionTable = None, maximal_steps: int = SIMULATION_MAXIMAL_STEPS, truncate_revisits: bool = SIMULATION_TRUNCATE_REVISITS, mirror_updates: bool = SIMULATION_MIRROR_UPDATES, skip_doomed_actions: bool = SIMULATION_SKIP_DOOMED_ACTIONS, tables: dict = None):
+        """
+        Creates a new batch simulator for the q-table of the given parking learner.
+
+        Parameter
+        ---------
+        parking_learner: ParkingLearner
+            The parking learner, whose q-table, alpha, y and parking direction are used.
+        batch_size: int
+            Number of episodes simulated in lockstep, by default SIMULATION_BATCH_SIZE.
+        transition_table: TransitionTable
+            The precomputed kinematic model, by default the cached transition table of the current geometry and the state resolution of the parking learner.
+        maximal_steps: int
+            Episodes are truncated after this number of steps, by default SIMULATION_MAXIMAL_STEPS. 0 disables the limit.
+        truncate_revisits: bool
+            If true, episodes are truncated, when they reach a state a second time, by default SIMULATION_TRUNCATE_REVISITS.
+        mirror_updates: bool
+            If true, the mirror symmetric state and action combination is updated too, by default SIMULATION_MIRROR_UPDATES.
+        skip_doomed_actions: bool
+            If true, doomed actions are filled in bulk and never explored, by default SIMULATION_SKIP_DOOMED_ACTIONS.
+        tables: dict
+            The read-only tables of another batch simulator for the same parking direction and state resolution, returned by its tables().
+            By default None, the tables are calculated from the transition table. If given, the transition table isn't loaded and mirror_updates and skip_doomed_actions are ignored.
+        """
+        self._parking_learner = parking_learner
+        self._batch_size = batch_size
+        self._maximal_steps = maximal_steps
+        self._truncate_revisits = truncate_revisits
+        if tables is None:
+            transition_table = transition_table if transition_table is not None else TransitionTable.load(
+                resolution=parking_learner._resolution)
+            tables = self._calculate_tables(
+                parking_learner, transition_table, mirror_updates, skip_doomed_actions)
+        self._state_shape = transition_table.state_shape if transition_table is not None else parking_learner._resolution.shape
+        self._next_state = tables['next_state']
+        self._leaves_table = tables['leaves_table']
+        self._in_range = tables['in_range']
+        self._reward = tables['reward']
+        self._number_of_actions = len(
+            self._reward) // int(np.prod(self._state_shape))
+        # Valid actions of every state in compressed sparse row format, None to draw from all actions.
+        self._valid_actions = (tables['valid_offsets'], tables['valid_actions']) if 'valid_offsets' in tables else None
+        # The random action is drawn from the valid actions of the state, so a state without valid actions would draw an action of the next state.
+        if self._valid_actions is not None and np.any(np.diff(self._valid_actions[0]) <= 0):
+            raise ValueError(
+                'Every state needs at least one valid action, see TransitionTable.valid_actions')
+        # Flat index of the mirrored state and action combination, -1 if it isn't mirror symmetric or mirrors onto itself.
+        self._mirror = tables.get('mirror')
+
+    @staticmethod
+    def _calculate_tables(parking_learner: ParkingLearner, transition_table: TransitionTable, mirror_updates: bool, skip_doomed_actions: bool) -> dict:
+        """
+        Calculates the read-only tables of the simulator from the transition table, see tables().
+        """
+        tables = {'next_state': transition_table.flat_next_state(),
+                  'leaves_table': transition_table.leaves_table(),
+                  'in_range': transition_table.in_range.reshape(-1),
+                  'reward': parking_learner.reward_table(transition_table).reshape(-1)}
+        if skip_doomed_actions:
+            tables['valid_offsets'], tables['valid_actions'] = transition_table.valid_actions()
+        if mirror_updates:
+            mirror_symmetry = MirrorSymmetry(
+                parking_learner._parking_direction, transition_table)
+            tables['mirror'] = np.where(mirror_symmetry.symmetric & (mirror_symmetry.mirror != np.arange(
+                len(mirror_symmetry.mirror))), mirror_symmetry.mirror, -1)
+        return tables
+
+    def run(self, number_of_episodes: int, random_start: bool = False, seed: int = None, distance: int = 15, angle: int = 0, orientation: int = 18, monitor: TrainingMonitor = None, start_sampler=None) -> int:
+        """
+        Simulates the given number of parking episodes and fills the q-table of the parking learner.
+
+        Parameter
+        ---------
+        number_of_episodes: int
+            How many episodes are simulated.
+        random_start: bool
+            If true, every episode starts at a random state, otherwise at the given start state.
+        seed: int or numpy.random.SeedSequence
+            Seed of the random number generator, by default None for a random seed.
+        distance, angle, orientation: int
+            Start state in the base resolution, if random_start is False. By default 15 cm, 0 degree and 180 degree saved as 18.
+        monitor: TrainingMonitor
+            Monitor of the q-table of the parking learner, by default None. If the monitor stops the training, no new episodes are started. The last interval is logged at the end.
+        start_sampler: CoverageStartSampler
+            Draws the random start states weighted towards rarely visited states, by default None for uniform random start states.
+
+        Returns
+        -------
+        int: The number of simulated steps.
+        """
+        rng = np.random.default_rng(seed)
+        scale = self._parking_learner._qtable_scale
+        qtable = self._parking_learner._qtable if scale is None else decode_qtable(
+            self._parking_learner._qtable, scale, dtype='float32')
+        q_values = qtable.reshape(-1)
+        q_states = q_values.reshape(-1, self._number_of_actions)
+        visits = self._parking_learner._visits
+        visit_counts = visits.reshape(-1) if visits is not None else None
+        alpha = self._parking_learner._alpha
+        y = self._parking_learner._y
+        number_of_states = q_states.shape[0]
+        if self._valid_actions is not None:
+            # Fills the doomed actions with their fixed point, the reward -100.0 plus y times -100.0 for leaving the q-table.
+            q_values[self._leaves_table] = -100.0 + y * -100.0
+        started = 0
+        steps = 0
+        state = np.empty(shape=0, dtype=np.int64)
+        # Says for every running episode, if it reached the parking position.
+        parked = np.empty(shape=0, dtype=bool)
+        # Number of steps and bitset slot of every running episode.
+        episode_steps = np.empty(shape=0, dtype=np.int64)
+        slot = np.empty(shape=0, dtype=np.int64)
+        free_slots = np.arange(self._batch_size)
+        visited = np.zeros(shape=(self._batch_size, number_of_states // 8 + 1),
+                           dtype=np.uint8) if self._truncate_revisits else None
+        while started < number_of_episodes or len(state) > 0:
+            # Fills the batch with new episodes.
+            new_episodes = min(self._batch_size - len(state),
+                               number_of_episodes - started)
+            if new_episodes > 0:
+                if random_start and start_sampler is not None:
+                    new_state = start_sampler.sample(new_episodes)
+                elif random_start:
+                    new_state = rng.integers(
+                        0, number_of_states, size=new_episodes)
+                else:
+                    new_state = np.full(shape=new_episodes, fill_value=np.ravel_multi_index(
+                        self._parking_learner._resolution.base_state(distance, angle, orientation), self._state_shape))
+                state = np.concatenate((state, new_state))
+                parked = np.concatenate(
+                    (parked, np.zeros(shape=new_episodes, dtype=bool)))
+                episode_steps = np.concatenate(
+                    (episode_steps, np.zeros(shape=new_episodes, dtype=np.int64)))
+                new_slot = free_slots[:new_episodes]
+                free_slots = free_slots[new_episodes:]
+                slot = np.concatenate((slot, new_slot))
+                if visited is not None:
+                    visited[new_slot] = 0
+                    self._visit(visited, new_slot, new_state)
+                started += new_episodes
+            # Random action of every episode, as flat index of state and action.
+            if self._valid_actions is None:
+                action = rng.integers(0, self._number_of_actions, size=len(state))
+            else:
+                offsets, valid_actions = self._valid_actions
+                first = offsets[state]
+                action = valid_actions[first + (rng.random(len(state)) * (
+                    offsets[state + 1] - first)).astype(np.int64)]
+            state_action = state * self._number_of_actions + action
+            # Updated state and action combinations, the mirrored combinations are appended behind the combinations of the episodes.
+            updated = state_action
+            if self._mirror is not None:
+                mirrored = self._mirror[state_action]
+                updated = np.concatenate((state_action, mirrored[mirrored >= 0]))
+            updated_next_state = self._next_state[updated]
+            next_state = updated_next_state[:len(state)]
+            # Maximal q value of the next state, -100.0 if the robot leaves the q-table.
+            best_next = np.where(self._leaves_table[updated], -100.0,
+                                 q_states[updated_next_state].max(axis=1))
+            q_values[updated] = (1 - alpha) * q_values[updated] + alpha * (
+                self._reward[updated] + y * best_next)
+            if visit_counts is not None:
+                np.add.at(visit_counts, updated, 1)
+            steps += len(state)
+            episode_steps += 1
+            in_range = self._in_range[state_action]
+            parked |= self._reward[state_action] > 0
+            # Truncates running episodes, which reached the step limit or a visited state.
+            truncated = np.zeros(shape=len(state), dtype=bool)
+            if self._maximal_steps > 0:
+                truncated |= episode_steps >= self._maximal_steps
+            if visited is not None:
+                truncated |= self._visit(visited, slot, next_state)
+            truncated &= in_range
+            running = in_range & ~truncated
+            if monitor is not None:
+                monitor.record(episodes=len(state) - int(np.count_nonzero(running)), steps=len(
+                    state), parked=int(np.count_nonzero(parked[~running])), truncated=int(np.count_nonzero(truncated)))
+                if monitor.interval_finished():
+                    # The monitor reads the q-table of the parking learner, so scaled q-tables are encoded back first.
+                    if scale is not None:
+                        self._parking_learner._qtable[...] = encode_qtable(
+                            qtable, dtype='int16', scale=scale)[0]
+                    if monitor.log():
+                        number_of_episodes = started
+            # Finished episodes drop out of the batch.
+            free_slots = np.concatenate((free_slots, slot[~running]))
+            state = next_state[running]
+            parked = parked[running]
+            episode_steps = episode_steps[running]
+            slot = slot[running]
+        # Writes back, if the q-table could not be reshaped without copying.
+        if not np.shares_memory(q_values, qtable):
+            qtable[...] = q_values.reshape(qtable.shape)
+        if scale is not None:
+            self._parking_learner._qtable[...] = encode_qtable(
+                qtable, dtype='int16', scale=scale)[0]
+        if monitor is not None:
+            monitor.finish()
+        return steps
+
+    def tables(self) -> dict:
+        """
+        Returns the read-only tables of the simulator, to create batch simulators in other processes without calculating them again.
+
+        Returns
+        -------
+        dict: The flat next states, the doomed actions, the in range flags and the rewards of all state and action combinations,
+            the valid actions as valid_offsets and valid_actions, if doomed actions are skipped, and the mirrored combinations, if mirror updates are used.
+        """
+        tables = {'next_state': self._next_state, 'leaves_table': self._leaves_table,
+                  'in_range': self._in_range, 'reward': self._reward}
+        if self._valid_actions is not None:
+            tables['valid_offsets'], tables['valid_actions'] = self._valid_actions
+        if self._mirror is not None:
+            tables['mirror'] = self._mirror
+        return tables
+
+    @staticmethod
+    def _visit(visited: np.ndarray, slot: np.ndarray, state: np.ndarray) -> np.ndarray:
+        """
+        Marks the states of the episodes in their bitsets.
+
+        Parameter
+        ---------
+        visited: numpy.ndarray
+            Bitset matrix, one row per slot and one bit per state.
+        slot: numpy.ndarray
+            Slot of every episode.
+        state: numpy.ndarray
+            Flat state of every episode.
+
+        Returns
+        -------
+        numpy.ndarray: Says for every episode, if the state was visited before.
+        """
+        byte = state >> 3
+        bit = (1 << (state & 7)).astype(np.uint8)
+        was_visited = visited[slot, byte] & bit != 0
+        visited[slot, byte] |= bit
+        return was_visited
+
+# Original Author: Lukas Loeffler
@@ -0,0 +1,138 @@
+import json
+import datetime
+
+from os.path import isfile
+from threading import Thread
+
+import numpy as np
+
+from parkingdirection import Parkingdirection
+from qtable_storage import load_qtable_pair, load_visit_pair, _write_synced
+
+from constants import CHECKPOINT_FILE, CHECKPOINT_EPISODES, CHECKPOINT_SECONDS
+
+
+class Checkpointer:
+    """
+    Saves checkpoints of a running training every CHECKPOINT_EPISODES episodes or CHECKPOINT_SECONDS seconds.
+    A checkpoint contains the q-table pair, the visit counts and the training state: the episode counter, the state of the random number generator and the exploration counter.
+    The q-tables are copied and written by a background thread into a temporary file, which is renamed afterwards,
+    so the training continues while the file is written and a crash never leaves a broken checkpoint.
+    """
+
+    def __init__(self, name: str, episodes: int = CHECKPOINT_EPISODES, seconds: float = CHECKPOINT_SECONDS):
+        """
+        Creates a new checkpointer.
+
+        Parameter
+        ---------
+        name: str
+            Name of the q-table pair, the checkpoint is saved as CHECKPOINT_FILE.
+        episodes: int
+            Saves a checkpoint after this number of episodes, by default CHECKPOINT_EPISODES. 0 disables the episode limit.
+        seconds: float
+            Saves a checkpoint after this number of seconds, by default CHECKPOINT_SECONDS. 0 disables the time limit.
+        """
+        self._path = CHECKPOINT_FILE.format(name)
+        self._episodes = episodes
+        self._seconds = seconds
+        self._last_episode = 0
+        self._last_time = datetime.datetime.now()
+        self._thread = None
+
+    def due(self, episode: int) -> bool:
+        """
+        Checks if a checkpoint should be saved.
+        Returns false as long as the last checkpoint is written, so the training never waits.
+
+        Parameter
+        ---------
+        episode: int
+            Number of finished episodes.
+
+        Returns
+        -------
+        bool: True if a checkpoint should be saved.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        episodes_due = self._episodes > 0 and episode - \
+            self._last_episode >= self._episodes
+        seconds_due = self._seconds > 0 and (
+            datetime.datetime.now() - self._last_time).total_seconds() >= self._seconds
+        return episodes_due or seconds_due
+
+    def save(self, qtable_pair: dict, scale_pair: dict, episode: int, random_state, exploration_counter: int, visit_pair: dict = None):
+        """
+        Copies the q-table pair and writes the checkpoint in a background thread.
+
+        Parameter
+        ---------
+        qtable_pair: dict
+            The q-tables keyed by Parkingdirection.
+        scale_pair: dict
+            The scales of the q-tables keyed by Parkingdirection.
+        episode: int
+            Number of finished episodes.
+        random_state: object
+            State of the random number generator, must be json serializable.
+        exploration_counter: int
+            The exploration counter of the parking learner.
+        visit_pair: dict
+            The visit counts keyed by Parkingdirection, by default None.
+        """
+        self.wait()
+        arrays = {}
+        for parking_direction in Parkingdirection:
+            arrays[parking_direction.name] = np.array(
+                qtable_pair[parking_direction])
+            if scale_pair[parking_direction] is not None:
+                arrays['{}_SCALE'.format(parking_direction.name)] = np.array(
+                    scale_pair[parking_direction])
+            if visit_pair is not None and visit_pair[parking_direction] is not None:
+                arrays['{}_VISITS'.format(parking_direction.name)] = np.array(
+                    visit_pair[parking_direction])
+        arrays['STATE'] = np.array(json.dumps({
+            'episode': episode,
+            'random_state': random_state,
+            'exploration_counter': exploration_counter
+        }))
+        self._last_episode = episode
+        self._last_time = datetime.datetime.now()
+        self._thread = Thread(target=_write_synced, args=(
+            self._path, lambda file: np.savez(file, **arrays)), daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        """
+        Waits until the last checkpoint is written.
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def load_checkpoint(name: str) -> tuple:
+    """
+    Loads the latest checkpoint of a q-table pair.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair.
+
+    Returns
+    -------
+    tuple: Dictionary of q-tables, dictionary of scales, dictionary of visit counts and the training state dictionary with episode, random_state and exploration_counter.
+        None if no checkpoint exists.
+    """
+    path = CHECKPOINT_FILE.format(name)
+    if not isfile(path):
+        return None
+    qtable_pair, scale_pair = load_qtable_pair(path)
+    visit_pair = load_visit_pair(path)
+    with np.load(path) as data:
+        state = json.loads(str(data['STATE']))
+    return (qtable_pair, scale_pair, visit_pair, state)
+
+# Original Author: Lukas Loeffler
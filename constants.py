@@ -64,8 +64,86 @@ float:
 How much the theta angle is allowed to different from pi/2 (90 dregree as radiant).
 """
 
+MINIMAL_INTERSECTION_ANGLE = pi / 180
+"""
+float:
+Minimal angle between two lines in radiant (1 degree), to calculate their intersection.
+Nearly parallel lines intersect far outside of the image and the intersection is numerically unstable, so they are skipped.
+"""
+
+INTERSECTION_CLUSTERING = 'axis_split'
+"""
+str:
+How the detected lines are split into vertical and horizontal lines.
+'axis_split': Deterministic split in a single pass, needs more than 45 degree between both groups of lines.
+'kmeans': cv2.kmeans with 10 random restarts on every frame, slower and not deterministic.
+"""
+
+INTERSECTION_TRACKING = True
+"""
+bool:
+If true, a detected intersection is tracked from frame to frame and the full intersection detection only runs,
+when the tracking misses, every INTERSECTION_TRACKING_REFRESH frames or when a line crossing the imagesection enters it.
+"""
+
+INTERSECTION_TRACKING_REFRESH = int(5)
+"""
+int:
+Number of frames, after which a tracked intersection is detected again with the full intersection detection.
+1 detects the intersection in every frame.
+"""
+
+INTERSECTION_PIXELS_PER_POWER_SECOND = 2.5
+"""
+float:
+How many pixels per second a tracked intersection moves down in the image per percent drive power.
+Depends on the camera mounting and the drive, adjust it if the tracking misses often while driving.
+"""
+
+INTERSECTION_TRACKING_WINDOW = int(61)
+"""
+int:
+Width and height of the window in pixels around the predicted intersection, which is checked for a cross of dark lines.
+"""
+
+INTERSECTION_CROSS_FRACTION = 0.5
+"""
+float:
+Minimal share of the window, which the horizontal and the vertical line through the predicted intersection have to cover with dark pixels.
+The straight line the robot follows covers the whole height, but only its width of the window.
+"""
+
+INTERSECTION_TRIGGER_FRACTION = 0.5
+"""
+float:
+Minimal share of the width of the imagesection, which a row needs to cover with dark or red pixels to start the full intersection detection,
+while no intersection is tracked. The line the robot follows covers only its width of a row.
+"""
+
 # endregion intersection_detection
 
+# region camera
+
+FRAME_WAIT_TIMEOUT = 1.0
+"""
+float:
+Seconds a worker thread of the swarmrobot waits for a new camera frame, before it checks again if it is still active.
+"""
+
+FRAME_RETRY_SLEEP_TIME = 0.01
+"""
+float:
+Seconds the capture thread sleeps, when the camera delivers no frame.
+"""
+
+FRAME_CACHE_MAX_ENTRIES = int(8)
+"""
+int:
+Maximal number of images derived from a camera frame, like the grayscale image or the red mask, which are cached for all detectors.
+"""
+
+# endregion camera
+
 # region color-bound
 
 RED_LOW = (0,0,75) # (0, 36, 235) alternative values, from former students
@@ -188,30 +266,203 @@ int:
 How many times the simulator tries random actions to learn and fill the q table.
 """
 
+SIMULATION_BATCH_SIZE = int(4096)
+"""
+int:
+How many parking episodes the batched simulator runs in lockstep.
+A bigger batch is faster, but uses more memory.
+"""
+
+SIMULATION_WORKERS = int(4)
+"""
+int:
+How many worker processes the parallel simulator uses.
+Should be the number of cpu cores, the Raspberry Pi 3b has 4 cores.
+"""
+
+SOLVER_TOLERANCE = 1e-3
+"""
+float:
+The q-table solver stops, when no q value changed more than this value in the last sweep.
+"""
+
+SOLVER_MAXIMAL_SWEEPS = int(1000)
+"""
+int:
+Maximal number of sweeps of the q-table solver, even if the q-table did not converge.
+"""
+
+TRANSITION_TABLE_FILE = 'transition_table_{}.npz'
+"""
+str:
+File name of the cached transition table of the simulator.
+The placeholder is replaced by the hash of the geometry values, so changing the geometry creates a new transition table.
+"""
+
+METRICS_INTERVAL = int(10000)
+"""
+int:
+Number of simulated episodes, after which the simulator writes a row of training metrics.
+"""
+
+METRICS_FILE = './training_metrics.csv'
+"""
+str:
+CSV file the simulator writes the training metrics into.
+"""
+
+EARLY_STOP_INTERVALS = int(5)
+"""
+int:
+The simulator stops training, if the greedy action of no state changed for this number of metrics intervals in a row.
+0 disables the early stop, so all NUMBER_OF_SIMULATIONS episodes are simulated.
+"""
+
+SIMULATION_MAXIMAL_STEPS = int(0)
+"""
+int:
+A simulated episode is truncated after this number of steps, 0 disables the limit.
+0 by default, so episodes only end when the robot leaves the parking area, like before the limit existed. 1000 is a reasonable limit.
+"""
+
+SIMULATION_TRUNCATE_REVISITS = False
+"""
+bool:
+If true, a simulated episode is truncated, when it reaches a state a second time.
+Every episode remembers its visited states in a bitset, 10 kB per episode, for the batched simulator SIMULATION_BATCH_SIZE times 10 kB.
+"""
+
+SIMULATION_MIRROR_UPDATES = False
+"""
+bool:
+If true, the batched simulator updates the mirrored state and action combination of every step too, mirrored about the axis through the parking lot.
+Only combinations, which the transition table shows to be mirror symmetric, are mirrored, mostly driving straight. Check the share with mirror_symmetry.py.
+"""
+
+SIMULATION_SKIP_DOOMED_ACTIONS = False
+"""
+bool:
+If true, the batched simulator fills the q values of doomed actions, which leave the parking area at once, with their final value before the training
+and explores only the other actions of a state. About half of all actions are doomed, so the episodes get longer and every step teaches more.
+"""
+
+RANDOM_SEED = None
+"""
+int:
+Seed of the random start positions and random actions of the simulator, None for a random seed.
+Simulations with the same seed create the same q-table, except in the parallel mode,
+where only the seeds of the workers are the same and concurrent updates can change the q-table.
+"""
+
+ACTION_BLOCK_SIZE = int(4096)
+"""
+int:
+Number of random actions, the parking learner draws at once to explore.
+"""
+
+CHECKPOINT_FILE = './{}_checkpoint.npz'
+"""
+str:
+File of the training checkpoint, the placeholder is replaced by the name of the q-table pair.
+"""
+
+CHECKPOINT_EPISODES = int(10000)
+"""
+int:
+The simulator saves a checkpoint after this number of episodes, 0 disables it.
+"""
+
+CHECKPOINT_SECONDS = 300.0
+"""
+float:
+The simulator saves a checkpoint after this number of seconds, 0 disables it.
+The checkpoint is written in the background, so a short interval doesn't slow down the simulation.
+"""
+
+EVALUATION_MAXIMAL_STEPS = int(100)
+"""
+int:
+Step limit of every episode of the policy evaluation, an episode reaching the limit counts as looping.
+"""
+
+EVALUATION_PERCENTILES = (50, 90, 99)
+"""
+tuple:
+Percentiles of the steps to park, reported by the policy evaluation.
+"""
+
+COVERAGE_START = False
+"""
+bool:
+If true, random start states of the simulator are drawn weighted towards rarely visited states, instead of uniformly.
+Needs TRACK_VISITS and isn't used by parallel workers. False by default, so the random start states stay uniform.
+"""
+
+COVERAGE_EXPONENT = 1.0
+"""
+float:
+How strong the coverage start states prefer rarely visited states, the weight of a state is (1 + visits of the state) ** -COVERAGE_EXPONENT.
+0.0 draws uniform start states.
+"""
+
+COVERAGE_REFRESH = int(10000)
+"""
+int:
+Number of drawn start states, after which the weights of the coverage start states are recalculated from the visit counts.
+"""
+
+SWEEP_RESULTS_FILE = './{}_sweep.csv'
+"""
+str:
+Path of the results table of a hyperparameter sweep, {} is replaced by the name of the sweep.
+"""
+
 # endregion simulator
 
 # region qtable
 # Q-tbale saves state as polar coordinates and orientation of the robot and actions with turning direction and drive length.
 
-SIZE_STATE_RHO = int(MAXIMAL_DISTANCE_TO_PARKING_LOT + 1)
+STATE_RHO_STEP = 1.0
+"""
+float:
+Rho step of the states in centimeter (cm), MAXIMAL_DISTANCE_TO_PARKING_LOT must be a multiple of it.
+The parking position and the default start state are given in 1 cm steps independent of it.
+"""
+
+STATE_ANGLE_STEP = 10.0
+"""
+float:
+Phi and orientation step of the states in degree, 360 must be a multiple of it.
+The parking position and the default start state are given in 10 degree steps independent of it.
+"""
+
+STATE_ROUNDING_DECIMALS = 9
+"""
+int:
+Decimals the position in state steps is rounded to, before it is cut off or rounded to a state.
+The scalar calculation in ParkingLearner.update_state and the vectorized transition table can differ in the last bit,
+which would change the state of positions right on the border between two states.
+"""
+
+SIZE_STATE_RHO = int(round(MAXIMAL_DISTANCE_TO_PARKING_LOT / STATE_RHO_STEP)) + 1
 """
 int:
 Number of possible rho values in state part of q-table.
-Depends on MAXIMAL_DISTANCE_TO_PARKING_LOT.
+Depends on MAXIMAL_DISTANCE_TO_PARKING_LOT and STATE_RHO_STEP.
 """
 
-SIZE_STATE_PHI = int(36)
+SIZE_STATE_PHI = int(round(360 / STATE_ANGLE_STEP))
 """
 int:
 Number of possible phi values in state part of q-table.
-360 degree of a full circle devided by 10 to reduce the ram usage.
+360 degree of a full circle devided by STATE_ANGLE_STEP, 10 degree to reduce the ram usage.
 """
 
-SIZE_STATE_ORIENTATION = int(36)
+SIZE_STATE_ORIENTATION = int(round(360 / STATE_ANGLE_STEP))
 """
 int:
 Number of possible orientation values in state part of q-table.
-360 degree of a full circle devided by 10 to reduce the ram usage.
+360 degree of a full circle devided by STATE_ANGLE_STEP, 10 degree to reduce the ram usage.
 """
 
 SIZE_ACTION_DIRECTION = len(TURNING_DIRECTIONS)
@@ -265,6 +516,67 @@ Depends on SIZE_ACTION_LENTGH.
 Please don't change.
 """
 
+QTABLE_DTYPE = 'float64'
+"""
+str:
+Data type of the q-tables in memory and in saved files, 'float64', 'float32', 'float16' or 'int16'.
+A float64 q-table pair needs about 63 MB, float32 the half and float16 and int16 a quarter.
+Files with another data type are converted at loading.
+"""
+
+QTABLE_INT16_LIMIT = 2000.0
+"""
+float:
+Biggest absolute q value, an int16 q-table can store without clipping.
+The scale of an int16 q-table is this value divided by 32767, the reward of 100 divided by (1 - y) is the biggest possible q value, 2000 for y = 0.95.
+"""
+
+QTABLE_STORAGE = 'npz'
+"""
+str:
+Format the exhibition and simulator save q-table pairs in.
+'npz' saves a compressed <name>.npz file.
+'mmap' saves uncompressed .npy files and a manifest into the directory QTABLE_MMAP_DIRECTORY, they are memory mapped at loading, so the start is nearly instant.
+At loading, a memory mapped q-table pair is preferred to an .npz file with the same name.
+"""
+
+QTABLE_MMAP_DIRECTORY = './{}.qtable'
+"""
+str:
+Directory of a memory mapped q-table pair, the placeholder is replaced by the name of the q-table pair.
+"""
+
+QTABLE_BACKEND = 'dense'
+"""
+str:
+How the exhibition holds the q-tables in memory, 'dense' or 'sparse'.
+'dense' holds the whole state grid as numpy array.
+'sparse' holds only the states with q values, so it needs memory in proportion to the visited states. Saved q-tables are dense in both cases.
+The simulator always uses dense q-tables.
+"""
+
+POLICY_FILE = './{}_policy.npz'
+"""
+str:
+File of the greedy policy pair, saved next to the q-table pair, the placeholder is replaced by the name of the q-table pair.
+The greedy policy contains the best action of every state, it is recalculated if it is older than the q-table pair.
+"""
+
+UTILIZE_POLICY_ONLY = False
+"""
+bool:
+If true and the exhibition utilizes, only the greedy policy pair is loaded and not the q-table pair, which needs much less memory.
+The q-table pair is loaded, as soon as exploring is selected.
+"""
+
+TRACK_VISITS = False
+"""
+bool:
+If true, the number of q value updates of every state and action combination is counted in a uint32 array with the shape of the q-table.
+The visit counts are saved with the q-table pair and used by the coverage start states and coverage.py.
+Needs 4 bytes per q value, about 63 MB per q-table pair in the default resolution, so it is off by default. A sparse QTABLE_BACKEND doesn't count visits.
+"""
+
 # endregion qtable
 
 # Original Author: Lukas Loeffler
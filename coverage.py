@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+import argparse
+
+from os.path import isfile
+
+import numpy as np
+
+from parkingdirection import Parkingdirection
+from qtable_storage import has_qtable_pair_mmap, qtable_mmap_directory, load_visit_pair
+
+from constants import COVERAGE_EXPONENT, COVERAGE_REFRESH
+
+HEATMAP_AXES = ('rho', 'phi', 'orientation')
+"""
+tuple[str]:
+Names of the state axes of the visit counts, used in the file names of the heatmaps.
+"""
+
+
+class CoverageStartSampler:
+    """
+    Draws random start states weighted towards states with few visits, instead of uniform random start states.
+    The weight of a state is (1 + visits of the state) to the power of -COVERAGE_EXPONENT, so rarely visited states are started from more often.
+    The weights are recalculated from the visit counts every COVERAGE_REFRESH drawn start states, because summing the visit counts takes a few milliseconds.
+    """
+
+    def __init__(self, visits: np.ndarray, seed=None, exponent: float = COVERAGE_EXPONENT, refresh: int = COVERAGE_REFRESH):
+        """
+        Creates a new start state sampler.
+
+        Parameter
+        ---------
+        visits: numpy.ndarray
+            Visit counts of the state and action combinations, shape=(rho, phi, orientation, direction, length). Changes of the visit counts are used at the next refresh.
+        seed: int, numpy.random.SeedSequence or numpy.random.Generator
+            Seed or random number generator, by default None for a random seed.
+        exponent: float
+            How strong rarely visited states are preferred, 0 draws uniform start states. By default COVERAGE_EXPONENT.
+        refresh: int
+            Number of drawn start states, after which the weights are recalculated, by default COVERAGE_REFRESH.
+        """
+        self._visits = visits
+        self._generator = np.random.default_rng(seed)
+        self._exponent = exponent
+        self._refresh = max(1, refresh)
+        self._state_shape = visits.shape[:3]
+        self._draws = 0
+        self._cumulative_weights = None
+
+    def refresh_weights(self):
+        """
+        Recalculates the weights of all states from the visit counts.
+        """
+        state_visits = self._visits.reshape(
+            int(np.prod(self._state_shape)), -1).sum(axis=1, dtype=np.float64)
+        self._cumulative_weights = np.cumsum(
+            (1.0 + state_visits) ** -self._exponent)
+        self._draws = 0
+
+    def sample(self, count: int) -> np.ndarray:
+        """
+        Draws start states.
+
+        Parameter
+        ---------
+        count: int
+            Number of start states.
+
+        Returns
+        -------
+        numpy.ndarray: Flat indices of the start states.
+        """
+        if self._cumulative_weights is None or self._draws >= self._refresh:
+            self.refresh_weights()
+        self._draws += count
+        return np.searchsorted(self._cumulative_weights, self._generator.random(count) * self._cumulative_weights[-1], side='right')
+
+    def sample_state(self) -> tuple:
+        """
+        Draws one start state.
+
+        Returns
+        -------
+        tuple: The start state (rho, phi, orientation).
+        """
+        return tuple(int(index) for index in np.unravel_index(int(self.sample(1)[0]), self._state_shape))
+
+
+def coverage_report(visits: np.ndarray) -> dict:
+    """
+    Calculates how much of the state and action space was visited.
+
+    Parameter
+    ---------
+    visits: numpy.ndarray
+        Visit counts of the state and action combinations.
+
+    Returns
+    -------
+    dict: Share of visited state and action combinations, share of visited states and total visits.
+    """
+    state_visits = visits.reshape(visits.shape[:3] + (-1,)).sum(axis=3)
+    return {
+        'visited_state_actions': float(np.count_nonzero(visits)) / visits.size,
+        'visited_states': float(np.count_nonzero(state_visits)) / state_visits.size,
+        'visits': int(state_visits.sum(dtype=np.uint64))
+    }
+
+
+def export_heatmaps(visits: np.ndarray, prefix: str, pixel_size: int = 8) -> list:
+    """
+    Saves heatmaps of the visits of every pair of state axes as png files, summed over the other axes.
+    The visits are shown logarithmic, blue means few and red many visits.
+
+    Parameter
+    ---------
+    visits: numpy.ndarray
+        Visit counts of the state and action combinations.
+    prefix: str
+        Prefix of the file names, the file names end with the names of the axes, e.g. <prefix>_rho_phi.png.
+    pixel_size: int
+        Width and height of a state in pixels, by default 8.
+
+    Returns
+    -------
+    list: Paths of the saved heatmaps.
+    """
+    # Imported here, so coverage can be calculated without opencv.
+    import cv2
+    state_visits = visits.reshape(
+        visits.shape[:3] + (-1,)).sum(axis=3, dtype=np.float64)
+    paths = []
+    for first_axis in range(len(HEATMAP_AXES)):
+        for second_axis in range(first_axis + 1, len(HEATMAP_AXES)):
+            other_axis = 3 - first_axis - second_axis
+            heatmap = np.log1p(state_visits.sum(axis=other_axis))
+            if heatmap.max() > 0:
+                heatmap = heatmap / heatmap.max()
+            image = cv2.applyColorMap(
+                (heatmap * 255).astype(np.uint8), cv2.COLORMAP_JET)
+            image = cv2.resize(image, (image.shape[1] * pixel_size, image.shape[0] * pixel_size),
+                               interpolation=cv2.INTER_NEAREST)
+            path = '{0}_{1}_{2}.png'.format(
+                prefix, HEATMAP_AXES[first_axis], HEATMAP_AXES[second_axis])
+            cv2.imwrite(path, image)
+            paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Prints the coverage of the visit counts of a q-table pair and saves heatmaps.')
+    parser.add_argument('name', nargs='?', default='default',
+                        help='Name of the q-table pair, by default "default".')
+    parser.add_argument('--no-heatmaps', action='store_true',
+                        help='Only prints the coverage.')
+    arguments = parser.parse_args()
+    path = qtable_mmap_directory(arguments.name) if has_qtable_pair_mmap(
+        arguments.name) else './{}.npz'.format(arguments.name)
+    if not isfile(path) and not has_qtable_pair_mmap(arguments.name):
+        raise FileNotFoundError('No q-table pair {}'.format(arguments.name))
+    visit_pair = load_visit_pair(path)
+    for parking_direction in Parkingdirection:
+        visits = visit_pair[parking_direction]
+        if visits is None:
+            print('{}: no visit counts'.format(parking_direction.name))
+            continue
+        print(parking_direction.name)
+        for key, value in coverage_report(visits).items():
+            print('    {0}: {1}'.format(key, value))
+        if not arguments.no_heatmaps:
+            for heatmap_path in export_heatmaps(visits, './{0}_{1}'.format(arguments.name, parking_direction.name.lower())):
+                print('    saved {}'.format(heatmap_path))
+
+# Original Author: Lukas Loeffler
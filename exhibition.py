@@ -17,8 +17,11 @@ from parkingdirection import Parkingdirection
 from programm_type import ProgrammType
 from print_logo import PrintLogo
 from turn_assistant import TurnAssistant
+from qtable_storage import empty_qtable, load_qtable_pair, save_qtable_pair, has_qtable_pair_mmap, open_qtable_pair_mmap, save_qtable_pair_mmap, convert_qtable, qtable_mmap_directory, empty_visits, load_visit_pair, MANIFEST_FILE
+from greedy_policy import GreedyPolicy, load_policy_pair, save_policy_pair
+from sparse_qtable import SparseQTable
 
-from constants import DISPLAY_CONFIRMATION_SLEEP_TIME, START_DISTANCE, END_DISTANCE_FORWARD, END_DISTANCE_BACKWARD, SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH
+from constants import QTABLE_STORAGE, QTABLE_BACKEND, TRACK_VISITS, UTILIZE_POLICY_ONLY, DISPLAY_CONFIRMATION_SLEEP_TIME, START_DISTANCE, END_DISTANCE_FORWARD, END_DISTANCE_BACKWARD, SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH
 
 
 class Exhibition:
@@ -42,7 +45,13 @@ class Exhibition:
         The current q-tables for parking forward an backward.
         A q-table is a three demensional numpy.ndarray with shape=(61, 36, 36, 9, 20).
         The q-table contains the potential reward of every combination of state (relativ position of the robot to the parking lot) and action (length and direction driving).
+    qtable_backend: str
+        How the q-tables are held in memory, 'dense' or 'sparse', by default QTABLE_BACKEND.
+    track_visits: bool
+        If the visits of the state and action combinations are counted, by default TRACK_VISITS with a dense QTABLE_BACKEND.
     """
+    qtable_backend = QTABLE_BACKEND
+    track_visits = TRACK_VISITS and QTABLE_BACKEND == 'dense'
     language_package = {
         'english': {
             'command': 'Enter "start" to start the parking.\nEnter "settings" to open the settings menu.\nEnter "german" to change the language. Geben Sie "deutsch" ein um die Sprache zu aendern.',
@@ -162,11 +171,14 @@ class Exhibition:
         # Loads configuration.
         self.load_config()
         self._qtable_pair = {}
+        self._qtable_scale_pair = {}
+        self._policy_pair = {}
+        self._visit_pair = {}
         self._parking_learner = None
         self.laod_qtable_pair(name=self.config['qtable_name'])
         # Creates instance of parking_learner.
         self._parking_learner = ParkingLearner(
-            bot=self._bot, qtable=self._qtable_pair[self.config['direction']], alpha=self.config['alpha'], y=self.config['y'], parkingdirection=self.config['direction'], action=self.config['action'])
+            bot=self._bot, qtable=self._qtable_pair[self.config['direction']], alpha=self.config['alpha'], y=self.config['y'], parkingdirection=self.config['direction'], action=self.config['action'], qtable_scale=self._qtable_scale_pair[self.config['direction']], policy=self._policy_pair[self.config['direction']], visits=self._visit_pair[self.config['direction']])
         self._bot.set_parking_learner(self._parking_learner)
         # Createst instance of turn assistant.
         self._turn_assistant = TurnAssistant(bot=self._bot)
@@ -376,7 +388,7 @@ class Exhibition:
             wrong_input = False
             if user_input == 'forward' or user_input == 'vorwaerts':
                 self._parking_learner.change_parking_direction(
-                    new_parking_direction=Parkingdirection.FORWARD, new_qtable=self._qtable_pair[Parkingdirection.FORWARD])
+                    new_parking_direction=Parkingdirection.FORWARD, new_qtable=self._qtable_pair[Parkingdirection.FORWARD], new_qtable_scale=self._qtable_scale_pair[Parkingdirection.FORWARD], new_policy=self._policy_pair[Parkingdirection.FORWARD], new_visits=self._visit_pair[Parkingdirection.FORWARD])
                 self.config['direction'] = Parkingdirection.FORWARD
                 print("{0} {1}".format(self.language_package[self.config['language']]['settings']['direction'][self._parking_learner._parking_direction].capitalize(),
                       self.language_package[self.config['language']]['settings']['direction']['confirmation']))
@@ -384,7 +396,7 @@ class Exhibition:
                 break
             elif user_input == 'backward' or user_input == 'rueckwaerts':
                 self._parking_learner.change_parking_direction(
-                    new_parking_direction=Parkingdirection.BACKWARD, new_qtable=self._qtable_pair[Parkingdirection.BACKWARD])
+                    new_parking_direction=Parkingdirection.BACKWARD, new_qtable=self._qtable_pair[Parkingdirection.BACKWARD], new_qtable_scale=self._qtable_scale_pair[Parkingdirection.BACKWARD], new_policy=self._policy_pair[Parkingdirection.BACKWARD], new_visits=self._visit_pair[Parkingdirection.BACKWARD])
                 self.config['direction'] = Parkingdirection.BACKWARD
                 print("{0} {1}".format(self.language_package[self.config['language']]['settings']['direction'][self._parking_learner._parking_direction].capitalize(),
                       self.language_package[self.config['language']]['settings']['direction']['confirmation']))
@@ -477,8 +489,13 @@ class Exhibition:
 
     def laod_qtable_pair(self, name: str):
         """
-        Loads q-table pair from file into self._qtable_pair.
+        Loads q-table pair from file into self._qtable_pair and converts it into QTABLE_DTYPE.
+        A memory mapped q-table pair is preferred to an .npz file, it is opened copy on write, so changes are only saved by save_qtable.
         Creates a new q-table pari if file with q-table pair not exsist.
+        Loads the greedy policy pair, if it is not older than the q-table pair, otherwise the greedy policy pair is derived from the q-table pair,
+        for a memory mapped q-table pair lazily state by state.
+        If UTILIZE_POLICY_ONLY is true and the action is utilize, only the greedy policy pair is loaded.
+        The visit counts are loaded, if they were saved with the q-table pair.
 
         Parameter
         ----------
@@ -488,22 +505,85 @@ class Exhibition:
         print('Load q-table')
         self.config['qtable_name'] = name
         path = "./{}.npz".format(name)
-        # Checks if file exists with q-table pair exists.
-        if isfile(path):
+        qtable_path = '{0}/{1}'.format(qtable_mmap_directory(name),
+                                       MANIFEST_FILE) if has_qtable_pair_mmap(name) else path
+        policy_pair = load_policy_pair(
+            name, qtable_path) if isfile(qtable_path) else None
+        visit_pair = None
+        # Checks if a memory mapped q-table pair or a file with q-table pair exists.
+        if policy_pair is not None and UTILIZE_POLICY_ONLY and self.config['action'] == 'utilize':
+            # Utilizes only the greedy policy pair, without q-table pair.
+            self._qtable_pair = {
+                parking_direction: None for parking_direction in Parkingdirection}
+            self._qtable_scale_pair = {
+                parking_direction: None for parking_direction in Parkingdirection}
+        elif has_qtable_pair_mmap(name):
+            # Opens memory mapped q-table pair, converts only if the data type differs.
+            self._qtable_pair, self._qtable_scale_pair = open_qtable_pair_mmap(
+                name)
+            if self.track_visits:
+                visit_pair = load_visit_pair(qtable_mmap_directory(name))
+            for parking_direction in Parkingdirection:
+                self._qtable_pair[parking_direction], self._qtable_scale_pair[parking_direction] = convert_qtable(
+                    self._qtable_pair[parking_direction], self._qtable_scale_pair[parking_direction])
+        elif isfile(path):
             # Loads q-table pair from file.
-            with np.load(path, allow_pickle=True) as data:
-                self._qtable_pair[Parkingdirection.FORWARD] = data[Parkingdirection.FORWARD.name]
-                self._qtable_pair[Parkingdirection.BACKWARD] = data[Parkingdirection.BACKWARD.name]
+            self._qtable_pair, self._qtable_scale_pair = load_qtable_pair(
+                path)
+            if self.track_visits:
+                visit_pair = load_visit_pair(path)
         else:
             # Creates new q-table pair.
-            self._qtable_pair[Parkingdirection.FORWARD] = np.zeros(
-                shape=(SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH), dtype=float)
-            self._qtable_pair[Parkingdirection.BACKWARD] = np.zeros(
-                shape=(SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH), dtype=float)
+            self._qtable_pair[Parkingdirection.FORWARD], self._qtable_scale_pair[Parkingdirection.FORWARD] = empty_qtable(
+            )
+            self._qtable_pair[Parkingdirection.BACKWARD], self._qtable_scale_pair[Parkingdirection.BACKWARD] = empty_qtable(
+            )
+        self.set_qtable_pair(self._qtable_pair,
+                             self._qtable_scale_pair, policy_pair, visit_pair)
+
+    def set_qtable_pair(self, qtable_pair: dict, scale_pair: dict, policy_pair: dict = None, visit_pair: dict = None):
+        """
+        Sets the q-table pair, the greedy policy pair and the visit counts and passes the q-table of the current parking direction to the parking learner.
+
+        Parameter
+        ---------
+        qtable_pair: dict
+            The q-tables keyed by Parkingdirection.
+        scale_pair: dict
+            The scales of the q-tables keyed by Parkingdirection.
+        policy_pair: dict
+            The greedy policies keyed by Parkingdirection, by default None to derive them from the q-tables.
+        visit_pair: dict
+            The visit counts keyed by Parkingdirection, by default None to start counting from zero if track_visits is true.
+        """
+        # Converts dense q-tables, if the q-tables are held sparse.
+        if self.qtable_backend == 'sparse':
+            for parking_direction in Parkingdirection:
+                if isinstance(qtable_pair[parking_direction], np.ndarray):
+                    qtable_pair[parking_direction] = SparseQTable.from_dense(
+                        qtable_pair[parking_direction])
+        self._qtable_pair = qtable_pair
+        self._qtable_scale_pair = scale_pair
+        # Derives the greedy policy pair, if no up to date greedy policy pair exists.
+        # The policy of a memory mapped q-table is derived state by state when it is utilized, so only the pages of the utilized states are read.
+        if policy_pair is None:
+            policy_pair = {parking_direction: GreedyPolicy.lazy(self._qtable_pair[parking_direction]) if isinstance(self._qtable_pair[parking_direction], np.memmap) else GreedyPolicy.from_qtable(
+                self._qtable_pair[parking_direction]) for parking_direction in Parkingdirection}
+        self._policy_pair = policy_pair
+        # Counts visits only of dense q-tables, without q-table there is nothing to update.
+        if visit_pair is None:
+            visit_pair = {}
+        for parking_direction in Parkingdirection:
+            qtable = self._qtable_pair[parking_direction]
+            if not self.track_visits or not isinstance(qtable, np.ndarray):
+                visit_pair[parking_direction] = None
+            elif visit_pair.get(parking_direction) is None or visit_pair[parking_direction].shape != qtable.shape:
+                visit_pair[parking_direction] = empty_visits(qtable.shape)
+        self._visit_pair = visit_pair
         # Sets new q-table in parking_learner.
         if self._parking_learner != None:
             self._parking_learner.change_parking_direction(
-                new_parking_direction=self._parking_learner._parking_direction, new_qtable=self._qtable_pair[self._parking_learner._parking_direction])
+                new_parking_direction=self._parking_learner._parking_direction, new_qtable=self._qtable_pair[self._parking_learner._parking_direction], new_qtable_scale=self._qtable_scale_pair[self._parking_learner._parking_direction], new_policy=self._policy_pair[self._parking_learner._parking_direction], new_visits=self._visit_pair[self._parking_learner._parking_direction])
 
     def print_save_qtable_menu(self):
         """
@@ -528,9 +608,17 @@ class Exhibition:
             self.print_wrong_input()
             self.print_save_qtable_menu()
         # Saves the current q-table pair, if the question was confirmed.
-        if user_input == 'yes' or user_input == 'ja':
-            np.savez_compressed(self.config['qtable_name'], FORWARD=self._qtable_pair[Parkingdirection.FORWARD],
-                                BACKWARD=self._qtable_pair[Parkingdirection.BACKWARD])
+        # Only the greedy policy pair is loaded, if the q-table pair is None, so there is nothing to save.
+        if (user_input == 'yes' or user_input == 'ja') and self._qtable_pair[Parkingdirection.FORWARD] is not None:
+            if QTABLE_STORAGE == 'mmap':
+                save_qtable_pair_mmap(
+                    self.config['qtable_name'], self._qtable_pair, self._qtable_scale_pair, visit_pair=self._visit_pair)
+            else:
+                save_qtable_pair(
+                    self.config['qtable_name'], self._qtable_pair, self._qtable_scale_pair, visit_pair=self._visit_pair)
+            # Saves the greedy policy pair after the q-table pair, so it is not older than the q-table pair.
+            self._parking_learner.refresh_policy()
+            save_policy_pair(self.config['qtable_name'], self._policy_pair)
 
     def print_action_settings_menu(self):
         """
@@ -570,9 +658,12 @@ class Exhibition:
                     exploration_counter = 250000 - entered_number if entered_number < 250000 else 250001
                 else:
                     exploration_counter = 0
+                self.config['action'] = 'explore'
+                # Loads the q-table pair, if only the greedy policy pair is loaded.
+                if self._qtable_pair[self.config['direction']] is None:
+                    self.laod_qtable_pair(name=self.config['qtable_name'])
                 self._parking_learner.set_action_explore(
                     exploration_counter=exploration_counter)
-                self.config['action'] = 'explore'
                 print("'{0}' {1}".format(self._parking_learner._action,
                       self.language_package[self.config['language']]['settings']['action']['confirmation']))
                 sleep(DISPLAY_CONFIRMATION_SLEEP_TIME)
@@ -0,0 +1,122 @@
+import time
+
+from threading import Thread, Condition
+
+from constants import FRAME_WAIT_TIMEOUT, FRAME_RETRY_SLEEP_TIME
+
+
+class FrameBroker:
+    """
+    Reads the camera in a single capture thread and publishes the latest frame to all worker threads of the SwarmRobot.
+    Without the broker, line tracking, navigation and intersection detection read the camera themselves,
+    so they contend for the camera, each one sees another frame and gets only a third of the frame rate.
+    Every frame gets a sequence number and the time it was captured. The frames are shared without copying and are read-only,
+    a consumer, which wants to draw into a frame or change it otherwise, has to copy it first.
+    """
+
+    def __init__(self, camera, wait_timeout: float = FRAME_WAIT_TIMEOUT):
+        """
+        Creates a new frame broker, the capture thread is started with start.
+
+        Parameter
+        ---------
+        camera: cv2.VideoCapture
+            The opened camera.
+        wait_timeout: float
+            Seconds wait_for_newer waits for a new frame at most, by default FRAME_WAIT_TIMEOUT.
+        """
+        self._camera = camera
+        self._wait_timeout = wait_timeout
+        self._condition = Condition()
+        self._sequence = 0
+        self._timestamp = None
+        self._frame = None
+        self._capture_thread = None
+        self._running = False
+
+    @property
+    def sequence(self) -> int:
+        """
+        Returns
+        -------
+        int: Sequence number of the latest frame, 0 before the first frame.
+        """
+        return self._sequence
+
+    def start(self):
+        """
+        Starts the capture thread, if it isn't running yet.
+        """
+        with self._condition:
+            if self._capture_thread is not None:
+                return
+            self._running = True
+            self._capture_thread = Thread(
+                group=None, target=self._capture, daemon=True)
+            self._capture_thread.start()
+
+    def stop(self):
+        """
+        Stops the capture thread and wakes up all waiting consumers.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._capture_thread is not None:
+            self._capture_thread.join()
+            self._capture_thread = None
+
+    def _capture(self):
+        """
+        Reads frames from the camera and publishes them, until the broker is stopped.
+        """
+        while self._running:
+            _, frame = self._camera.read()
+            timestamp = time.monotonic()
+            if frame is None:
+                # The camera delivers no frame, e.g. while it starts.
+                time.sleep(FRAME_RETRY_SLEEP_TIME)
+                continue
+            # The camera returns a new array for every frame, so the frame can be shared read-only without a copy.
+            frame.flags.writeable = False
+            with self._condition:
+                self._sequence += 1
+                self._timestamp = timestamp
+                self._frame = frame
+                self._condition.notify_all()
+
+    def latest(self) -> tuple:
+        """
+        Returns the latest frame without waiting.
+
+        Returns
+        -------
+        tuple: The sequence number, the capture time (time.monotonic) and the read-only frame, the frame is None before the first frame.
+        """
+        with self._condition:
+            return (self._sequence, self._timestamp, self._frame)
+
+    def wait_for_newer(self, sequence: int, timeout: float = None) -> tuple:
+        """
+        Waits for a frame, which is newer than the frame with the given sequence number.
+        Several consumers waiting for the same sequence number get the same frame.
+
+        Parameter
+        ---------
+        sequence: int
+            Sequence number of the last frame of the consumer, 0 if it has no frame yet.
+        timeout: float
+            Seconds to wait at most, by default the wait timeout of the broker.
+
+        Returns
+        -------
+        tuple: The sequence number, the capture time (time.monotonic) and the read-only frame.
+            If no newer frame arrived in time or the broker is stopped, the given sequence number and None for the capture time and the frame.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._sequence > sequence or not self._running,
+                                            timeout=self._wait_timeout if timeout is None else timeout) or self._sequence <= sequence:
+                return (sequence, None, None)
+            return (self._sequence, self._timestamp, self._frame)
+
+# Original Author: Lukas Loeffler
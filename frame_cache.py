@@ -0,0 +1,183 @@
+from threading import Lock, Event
+
+import cv2 as cv
+
+from constants import FRAME_CACHE_MAX_ENTRIES
+
+
+class _CacheEntry:
+    """
+    Derived image of the cache, which is computed by the first thread asking for it.
+    """
+
+    def __init__(self):
+        self.computed = Event()
+        self.image = None
+
+
+class FrameCache:
+    """
+    Caches images derived from the latest camera frame, like the grayscale image, the blurred grayscale image, the line mask or the red mask, so every detector gets them without computing them again.
+    Regions of interest are views of the cached images of the whole frame or part of the name of the operation.
+    An image is identified by the sequence number of the frame from the FrameBroker and the name of the operation.
+    It is computed lazily by the first detector asking for it, other detectors asking at the same time wait for the result.
+    Only the images of the latest frame are kept, they are evicted when a detector asks for a newer frame.
+    The cached images are read-only, a detector, which wants to change one, has to copy it first.
+    """
+
+    def __init__(self, max_entries: int = FRAME_CACHE_MAX_ENTRIES):
+        """
+        Creates a new, empty frame cache.
+
+        Parameter
+        ---------
+        max_entries: int
+            Maximal number of cached images of a frame, by default FRAME_CACHE_MAX_ENTRIES. Further images are computed without caching.
+        """
+        self._max_entries = max_entries
+        self._lock = Lock()
+        self._sequence = 0
+        self._entries = {}
+
+    def get(self, sequence: int, operation: str, compute):
+        """
+        Returns the image of the operation for the frame, computes it if it isn't cached yet.
+
+        Parameter
+        ---------
+        sequence: int
+            Sequence number of the frame, None computes the image without caching, e.g. for frames not from the FrameBroker.
+        operation: str
+            Name of the operation, it has to describe the image completely, e.g. the image section it is computed on.
+        compute: function
+            Function without parameters, which computes the image.
+
+        Returns
+        -------
+        numpy.ndarray: The read-only image.
+        """
+        if sequence is None:
+            return compute()
+        owner = False
+        with self._lock:
+            if sequence < self._sequence:
+                # A detector lagging behind gets the image of its older frame without caching.
+                entry = None
+            else:
+                if sequence > self._sequence:
+                    # A new frame evicts all images of the previous frame.
+                    self._sequence = sequence
+                    self._entries = {}
+                entry = self._entries.get(operation)
+                if entry is None and len(self._entries) < self._max_entries:
+                    entry = _CacheEntry()
+                    self._entries[operation] = entry
+                    owner = True
+        if entry is None:
+            return compute()
+        if not owner:
+            entry.computed.wait()
+            if entry.image is None:
+                # The computation of the owner failed, so this detector tries it itself.
+                return compute()
+            return entry.image
+        try:
+            image = compute()
+            if image is not None:
+                image.flags.writeable = False
+            entry.image = image
+        except Exception:
+            with self._lock:
+                if self._entries.get(operation) is entry:
+                    del self._entries[operation]
+            raise
+        finally:
+            entry.computed.set()
+        return image
+
+    def gray(self, sequence: int, frame):
+        """
+        Returns the grayscale image of the whole frame, the detectors cut their region of interest out of it.
+
+        Parameter
+        ---------
+        sequence: int
+            Sequence number of the frame, None computes the image without caching.
+        frame: numpy.ndarray
+            The colored camera frame.
+
+        Returns
+        -------
+        numpy.ndarray: The read-only grayscale image.
+        """
+        return self.get(sequence, 'gray', lambda: cv.cvtColor(frame, cv.COLOR_BGR2GRAY))
+
+    def gray_roi(self, sequence: int, frame, roi: tuple):
+        """
+        Returns the region of interest of the grayscale image, cut out of the cached grayscale image of the whole frame.
+
+        Parameter
+        ---------
+        sequence: int
+            Sequence number of the frame, None converts only the region of interest without caching.
+        frame: numpy.ndarray
+            The colored camera frame.
+        roi: tuple
+            The region of interest (y1, y2, x1, x2) in pixels.
+
+        Returns
+        -------
+        numpy.ndarray: The read-only grayscale region of interest.
+        """
+        y1, y2, x1, x2 = roi
+        if sequence is None:
+            return cv.cvtColor(frame[y1:y2, x1:x2], cv.COLOR_BGR2GRAY)
+        return self.gray(sequence, frame)[y1:y2, x1:x2]
+
+    def blurred_gray(self, sequence: int, frame, roi: tuple, kernel_size: tuple):
+        """
+        Returns the gaussian blurred grayscale image of a region of interest.
+
+        Parameter
+        ---------
+        sequence: int
+            Sequence number of the frame, None computes the image without caching.
+        frame: numpy.ndarray
+            The colored camera frame.
+        roi: tuple
+            The region of interest (y1, y2, x1, x2) in pixels.
+        kernel_size: tuple
+            Size of the kernel of the gaussian blur.
+
+        Returns
+        -------
+        numpy.ndarray: The read-only blurred grayscale image.
+        """
+        return self.get(sequence, 'blurred_gray_{0}_{1}'.format(roi, kernel_size),
+                        lambda: cv.GaussianBlur(self.gray_roi(sequence, frame, roi), kernel_size, 0))
+
+    def line_mask(self, sequence: int, frame, roi: tuple, kernel_size: tuple, threshold: int):
+        """
+        Returns the binary mask of the dark lines of a region of interest, thresholded on the blurred grayscale image.
+
+        Parameter
+        ---------
+        sequence: int
+            Sequence number of the frame, None computes the mask without caching.
+        frame: numpy.ndarray
+            The colored camera frame.
+        roi: tuple
+            The region of interest (y1, y2, x1, x2) in pixels.
+        kernel_size: tuple
+            Size of the kernel of the gaussian blur.
+        threshold: int
+            Gray values up to the threshold are part of a line.
+
+        Returns
+        -------
+        numpy.ndarray: The read-only mask, line pixels are 255.
+        """
+        return self.get(sequence, 'line_mask_{0}_{1}_{2}'.format(roi, kernel_size, threshold),
+                        lambda: cv.threshold(self.blurred_gray(sequence, frame, roi, kernel_size), threshold, 255, cv.THRESH_BINARY_INV)[1])
+
+# Original Author: Lukas Loeffler
@@ -0,0 +1,172 @@
+from os import stat
+from os.path import isfile
+
+import numpy as np
+
+from parkingdirection import Parkingdirection
+from sparse_qtable import SparseQTable
+
+from constants import POLICY_FILE
+
+
+class GreedyPolicy:
+    """
+    Cache of the best action of every state of a q-table.
+    The policy is an int8 array with shape=(rho, phi, orientation, 2), containing the direction index and the length index of the action with the highest q value.
+    Utilizing the q-table needs only one indexed read of the policy, instead of an argmax over all actions of the state.
+    A lazy policy derives the best action of a state, when it is asked for it the first time, states not derived yet have the direction index -1.
+    """
+
+    def __init__(self, policy: np.ndarray):
+        """
+        Creates a new greedy policy from a precomputed policy array.
+
+        Parameter
+        ---------
+        policy: numpy.ndarray
+            The best action of every state, shape=(rho, phi, orientation, 2), dtype int8.
+        """
+        self.policy = policy
+        # Q-table of a lazy policy, None if all states are derived.
+        self._qtable = None
+
+    @staticmethod
+    def from_qtable(qtable: np.ndarray):
+        """
+        Derives the greedy policy of a q-table.
+        The scale of an int16 q-table doesn't change the best action, so the stored q values are used directly.
+
+        Parameter
+        ---------
+        qtable: numpy.ndarray
+            The q-table, shape=(rho, phi, orientation, direction, length).
+
+        Returns
+        -------
+        GreedyPolicy: The greedy policy of the q-table.
+        """
+        greedy_policy = GreedyPolicy(np.empty(
+            shape=qtable.shape[:3] + (2,), dtype=np.int8))
+        greedy_policy.refresh(qtable)
+        return greedy_policy
+
+    @staticmethod
+    def lazy(qtable: np.ndarray):
+        """
+        Creates the greedy policy of a q-table, which derives the best action of a state only when it is needed.
+        Used for memory mapped q-tables, so only the pages of the utilized states are read from the disk.
+
+        Parameter
+        ---------
+        qtable: numpy.ndarray
+            The q-table, shape=(rho, phi, orientation, direction, length).
+
+        Returns
+        -------
+        GreedyPolicy: The lazy greedy policy of the q-table.
+        """
+        greedy_policy = GreedyPolicy(np.full(
+            shape=qtable.shape[:3] + (2,), fill_value=-1, dtype=np.int8))
+        greedy_policy._qtable = qtable
+        return greedy_policy
+
+    def complete(self):
+        """
+        Derives the best action of all states, which a lazy policy didn't derive yet, e.g. before the policy is saved.
+        """
+        if self._qtable is not None:
+            self.refresh(self._qtable)
+
+    def refresh(self, qtable: np.ndarray, states=None):
+        """
+        Recalculates the best action of the given states, or of all states.
+
+        Parameter
+        ---------
+        qtable: numpy.ndarray or SparseQTable
+            The q-table the policy belongs to.
+        states: iterable
+            States (rho, phi, orientation) whose q values changed, by default None to recalculate all states.
+        """
+        number_of_lengths = qtable.shape[4]
+        number_of_actions = qtable.shape[3] * number_of_lengths
+        if states is None and isinstance(qtable, SparseQTable):
+            # States without q values choose the first action, like the argmax of a dense q-table.
+            self.policy[...] = 0
+            self._qtable = None
+            states = qtable.states()
+        if states is None:
+            best_action = qtable.reshape(-1, number_of_actions).argmax(axis=1)
+            self.policy[..., 0] = (
+                best_action // number_of_lengths).reshape(qtable.shape[:3])
+            self.policy[..., 1] = (
+                best_action % number_of_lengths).reshape(qtable.shape[:3])
+            self._qtable = None
+            return
+        for rho, phi, orientation in states:
+            best_action = qtable[rho, phi, orientation].argmax()
+            self.policy[rho, phi, orientation] = divmod(
+                int(best_action), number_of_lengths)
+
+    def action(self, rho: int, phi: int, orientation: int) -> tuple:
+        """
+        Returns the best action of a state.
+
+        Parameter
+        ---------
+        rho, phi, orientation: int
+            The state.
+
+        Returns
+        -------
+        tuple: Direction index and length index of the best action.
+        """
+        if self._qtable is not None and self.policy[int(rho), int(phi), int(orientation), 0] < 0:
+            self.refresh(self._qtable, [(int(rho), int(phi), int(orientation))])
+        direction_index, length_index = self.policy[int(
+            rho), int(phi), int(orientation)]
+        return (int(direction_index), int(length_index))
+
+
+def save_policy_pair(name: str, policy_pair: dict):
+    """
+    Saves the greedy policies for parking forward and backward next to the q-table pair.
+    Lazy policies derive all states first.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair.
+    policy_pair: dict
+        The greedy policies keyed by Parkingdirection.
+    """
+    for policy in policy_pair.values():
+        policy.complete()
+    np.savez_compressed(POLICY_FILE.format(name), **{parking_direction.name: policy_pair[parking_direction].policy
+                                                     for parking_direction in Parkingdirection})
+
+
+def load_policy_pair(name: str, qtable_path: str = None) -> dict:
+    """
+    Loads the greedy policies saved next to a q-table pair.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair.
+    qtable_path: str
+        Path of the q-table pair file or directory. If given, the policies are only loaded if they are not older than the q-table pair.
+
+    Returns
+    -------
+    dict: The greedy policies keyed by Parkingdirection, None if no up to date policy file exists.
+    """
+    path = POLICY_FILE.format(name)
+    if not isfile(path):
+        return None
+    if qtable_path is not None and stat(path).st_mtime < stat(qtable_path).st_mtime:
+        return None
+    with np.load(path) as data:
+        return {parking_direction: GreedyPolicy(data[parking_direction.name]) for parking_direction in Parkingdirection}
+
+# Original Author: Lukas Loeffler
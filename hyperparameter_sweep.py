@@ -0,0 +1,260 @@
+#!/usr/bin/python3
+import os
+import csv
+import argparse
+import datetime
+import itertools
+
+from multiprocessing import Pool
+from os.path import isfile
+
+import numpy as np
+
+from parking_learner import ParkingLearner
+from parkingdirection import Parkingdirection
+from batch_simulator import BatchSimulator
+from transition_table import TransitionTable
+from policy_evaluation import PolicyEvaluator
+from greedy_policy import GreedyPolicy
+from coverage import CoverageStartSampler
+from qtable_storage import empty_qtable, empty_visits, save_qtable_pair
+
+from constants import SWEEP_RESULTS_FILE, SIMULATION_WORKERS, SIMULATION_BATCH_SIZE, EVALUATION_MAXIMAL_STEPS
+
+START_DISTRIBUTIONS = ('random', 'coverage', 'default')
+"""
+tuple[str]:
+Supported start distributions.
+'random': Uniform random start states.
+'coverage': Random start states weighted towards rarely visited states, see coverage.py.
+'default': Every episode starts at the default start state (15, 0, 18).
+"""
+
+RESULT_COLUMNS = ('alpha', 'y', 'start', 'episodes', 'success_rate', 'mean_steps',
+                  'looping_rate', 'default_start_parked', 'steps', 'seconds')
+"""
+tuple[str]:
+Columns of the results table, the rates and steps are the means of both parking directions.
+"""
+
+# Transition table of a worker process, loaded once by _load_transition_table.
+_transition_table = None
+
+
+def configuration_key(configuration: dict) -> str:
+    """
+    Returns a unique text of a configuration, used to find finished configurations in the results table and to seed the configuration.
+
+    Parameter
+    ---------
+    configuration: dict
+        The configuration with alpha, y, start and episodes.
+
+    Returns
+    -------
+    str: The key of the configuration.
+    """
+    return 'alpha={0}, y={1}, start={2}, episodes={3}'.format(float(configuration['alpha']), float(configuration['y']),
+                                                               configuration['start'], int(configuration['episodes']))
+
+
+def sweep_configurations(alphas: list, ys: list, starts: list, episodes: list) -> list:
+    """
+    Returns every combination of the given values.
+
+    Parameter
+    ---------
+    alphas, ys: list
+        Learning parameters.
+    starts: list
+        Start distributions, each one of START_DISTRIBUTIONS.
+    episodes: list
+        Numbers of simulated episodes per parking direction.
+
+    Returns
+    -------
+    list: The configurations as dictionaries with alpha, y, start and episodes.
+    """
+    for start in starts:
+        if start not in START_DISTRIBUTIONS:
+            raise ValueError('Unsupported start distribution {0}, use one of {1}'.format(
+                start, ', '.join(START_DISTRIBUTIONS)))
+    return [{'alpha': float(alpha), 'y': float(y), 'start': start, 'episodes': int(number)}
+            for alpha, y, start, number in itertools.product(alphas, ys, starts, episodes)]
+
+
+def _load_transition_table():
+    """
+    Loads the transition table once per worker process.
+    """
+    global _transition_table
+    _transition_table = TransitionTable.load()
+
+
+def run_configuration(task: tuple) -> tuple:
+    """
+    Trains and evaluates the q-table pair of one configuration, runs in a worker process.
+    The trained q-table pair is saved as candidate, the main process keeps it, if it is the best one.
+
+    Parameter
+    ---------
+    task: tuple
+        The configuration, the name of the candidate q-table pair, the seed, the batch size and the step limit of the evaluation.
+
+    Returns
+    -------
+    tuple: The row of the results table and the path of the candidate q-table pair.
+    """
+    configuration, candidate, seed, batch_size, maximal_steps = task
+    transition_table = _transition_table if _transition_table is not None else TransitionTable.load()
+    start_time = datetime.datetime.now()
+    # Every configuration gets the same seed in every run, independent of the order of the configurations.
+    seed_sequence = np.random.SeedSequence(None if seed is None else [
+                                           seed] + list(configuration_key(configuration).encode('utf-8')))
+    qtable_pair = {}
+    scale_pair = {}
+    reports = []
+    steps = 0
+    for parking_direction, direction_seed in zip(Parkingdirection, seed_sequence.spawn(len(Parkingdirection))):
+        qtable_pair[parking_direction], scale_pair[parking_direction] = empty_qtable()
+        visits = empty_visits() if configuration['start'] == 'coverage' else None
+        parking_learner = ParkingLearner(bot=None, qtable=qtable_pair[parking_direction], alpha=configuration['alpha'], y=configuration['y'],
+                                         parkingdirection=parking_direction, qtable_scale=scale_pair[parking_direction], seed=direction_seed, visits=visits)
+        start_sampler = CoverageStartSampler(
+            visits, seed=direction_seed.spawn(1)[0]) if visits is not None else None
+        steps += BatchSimulator(parking_learner, batch_size=batch_size, transition_table=transition_table).run(
+            number_of_episodes=configuration['episodes'], random_start=configuration['start'] != 'default', seed=direction_seed, start_sampler=start_sampler)
+        reports.append(PolicyEvaluator(parking_direction, transition_table).evaluate(
+            GreedyPolicy.from_qtable(qtable_pair[parking_direction]), maximal_steps))
+    save_qtable_pair(candidate, qtable_pair, scale_pair)
+    row = dict(configuration)
+    for column in ('success_rate', 'looping_rate', 'default_start_parked'):
+        row[column] = float(np.mean([report[column] for report in reports]))
+    # A direction without any parked start state has no mean steps.
+    mean_steps = [report['mean_steps']
+                  for report in reports if not np.isnan(report['mean_steps'])]
+    row['mean_steps'] = float(np.mean(mean_steps)) if len(
+        mean_steps) > 0 else float('nan')
+    row['steps'] = steps
+    row['seconds'] = (datetime.datetime.now() - start_time).total_seconds()
+    return (row, '{}.npz'.format(candidate))
+
+
+def load_results(path: str) -> list:
+    """
+    Loads the rows of a results table.
+
+    Parameter
+    ---------
+    path: str
+        Path of the csv file.
+
+    Returns
+    -------
+    list: The rows as dictionaries, an empty list if the file doesn't exist.
+    """
+    if not isfile(path):
+        return []
+    with open(path, 'r', newline='') as results_file:
+        rows = list(csv.DictReader(results_file))
+    for row in rows:
+        for column in RESULT_COLUMNS:
+            if column == 'start':
+                continue
+            row[column] = int(row[column]) if column in (
+                'episodes', 'steps') else float(row[column])
+    return rows
+
+
+def sweep(name: str, configurations: list, workers: int = SIMULATION_WORKERS, seed: int = 0, batch_size: int = SIMULATION_BATCH_SIZE, maximal_steps: int = EVALUATION_MAXIMAL_STEPS) -> list:
+    """
+    Trains every configuration in parallel worker processes and evaluates the greedy policies from every start state with the PolicyEvaluator.
+    Every finished configuration is appended to the results table SWEEP_RESULTS_FILE, so an interrupted sweep continues with the missing configurations.
+    The q-table pair with the highest success rate is saved as <name>_best.npz and can be loaded like every other q-table pair.
+
+    Parameter
+    ---------
+    name: str
+        Name of the sweep.
+    configurations: list
+        The configurations returned by sweep_configurations.
+    workers: int
+        Number of worker processes, by default SIMULATION_WORKERS.
+    seed: int
+        Seed of the sweep, by default 0. None draws a random seed for every configuration.
+    batch_size: int
+        Number of episodes simulated in lockstep, by default SIMULATION_BATCH_SIZE.
+    maximal_steps: int
+        Step limit of the evaluation, by default EVALUATION_MAXIMAL_STEPS.
+
+    Returns
+    -------
+    list: All rows of the results table.
+    """
+    path = SWEEP_RESULTS_FILE.format(name)
+    best_path = './{}_best.npz'.format(name)
+    rows = load_results(path)
+    finished = set(configuration_key(row) for row in rows)
+    best = max(rows, key=lambda row: row['success_rate']) if len(
+        rows) > 0 and isfile(best_path) else None
+    tasks = [(configuration, './{0}_sweep_{1}'.format(name, index), seed, batch_size, maximal_steps)
+             for index, configuration in enumerate(configurations) if configuration_key(configuration) not in finished]
+    print('{0} of {1} configurations finished, {2} left'.format(
+        len(configurations) - len(tasks), len(configurations), len(tasks)))
+    if len(tasks) == 0:
+        return rows
+    if not isfile(path):
+        with open(path, 'w', newline='') as results_file:
+            csv.DictWriter(results_file, RESULT_COLUMNS).writeheader()
+    # Creates the transition table cache once, before the workers load it.
+    TransitionTable.load()
+    with Pool(processes=max(1, min(workers, len(tasks))), initializer=_load_transition_table) as pool:
+        for row, candidate_path in pool.imap_unordered(run_configuration, tasks):
+            # Replaces the best q-table pair before the row is written, so an interruption never loses the best q-table pair of a written row.
+            if best is None or row['success_rate'] > best['success_rate']:
+                os.replace(candidate_path, best_path)
+                best = row
+            else:
+                os.remove(candidate_path)
+            with open(path, 'a', newline='') as results_file:
+                csv.DictWriter(results_file, RESULT_COLUMNS).writerow(row)
+                results_file.flush()
+                os.fsync(results_file.fileno())
+            rows.append(row)
+            print('{0}: success rate {1:.4f}, mean steps {2:.2f} in {3:.1f} s'.format(
+                configuration_key(row), row['success_rate'], row['mean_steps'], row['seconds']))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Trains q-table pairs with every combination of the given parameters in parallel and keeps the best one.')
+    parser.add_argument('name', nargs='?', default='sweep',
+                        help='Name of the sweep, the results are saved as <name>_sweep.csv and the best q-table pair as <name>_best.npz.')
+    parser.add_argument('--alpha', type=float, nargs='+', default=[0.5, 1.0],
+                        help='Values of alpha.')
+    parser.add_argument('--y', type=float, nargs='+', default=[0.9, 0.95, 0.99],
+                        help='Values of y.')
+    parser.add_argument('--start', choices=START_DISTRIBUTIONS, nargs='+', default=['random'],
+                        help='Start distributions.')
+    parser.add_argument('--episodes', type=int, nargs='+', default=[1000000],
+                        help='Numbers of simulated episodes per parking direction.')
+    parser.add_argument('--workers', type=int, default=SIMULATION_WORKERS,
+                        help='Number of worker processes, by default SIMULATION_WORKERS.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the sweep, by default 0.')
+    parser.add_argument('--batch-size', type=int, default=SIMULATION_BATCH_SIZE,
+                        help='Number of episodes simulated in lockstep.')
+    parser.add_argument('--steps', type=int, default=EVALUATION_MAXIMAL_STEPS,
+                        help='Step limit of the evaluation.')
+    arguments = parser.parse_args()
+    start_time = datetime.datetime.now()
+    results = sweep(arguments.name, sweep_configurations(arguments.alpha, arguments.y, arguments.start, arguments.episodes),
+                    workers=arguments.workers, seed=arguments.seed, batch_size=arguments.batch_size, maximal_steps=arguments.steps)
+    print('Best configurations:')
+    for row in sorted(results, key=lambda row: row['success_rate'], reverse=True)[:5]:
+        print('    {0}: success rate {1:.4f}'.format(
+            configuration_key(row), row['success_rate']))
+    print('Finished sweep in {}'.format(datetime.datetime.now() - start_time))
+
+# Original Author: Lukas Loeffler
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+import time
+import types
+import argparse
+import timeit
+
+from os.path import isfile
+
+import cv2 as cv
+import numpy as np
+
+from intersection_detection import IntersectionDetection
+
+
+def random_line_groups(lines_per_group: int, seed: int = None) -> list:
+    """
+    Creates two groups of random lines like cv2.HoughLines finds them at an intersection, one nearly vertical and one nearly horizontal.
+
+    Parameter
+    ---------
+    lines_per_group: int
+        Number of lines of every group.
+    seed: int
+        Seed of the random lines, by default None for a random seed.
+
+    Returns
+    -------
+    list: The groups, every line has the layout [[rho, theta]] of cv2.HoughLines.
+    """
+    generator = np.random.default_rng(seed)
+    groups = []
+    for angle in (0.0, np.pi / 2):
+        rho = generator.uniform(0, 320, lines_per_group)
+        theta = np.mod(angle + generator.uniform(-0.3,
+                       0.3, lines_per_group), np.pi)
+        groups.append([np.array([[r, t]], dtype=np.float32)
+                       for r, t in zip(rho, theta)])
+    return groups
+
+
+def loop_intersections(detector: IntersectionDetection, lines: list) -> list:
+    """
+    Calculates the intersections between the groups of lines one pair after another with IntersectionDetection.intersection,
+    like segmented_intersections did before it was vectorized.
+    """
+    intersections = []
+    for i, group in enumerate(lines[:-1]):
+        for next_group in lines[i + 1:]:
+            for line1 in group:
+                for line2 in next_group:
+                    intersections.append(detector.intersection(line1, line2))
+    return intersections
+
+
+def recorded_angles(paths: list) -> list:
+    """
+    Detects the lines of recorded frames like the intersection detection does.
+
+    Parameter
+    ---------
+    paths: list
+        Paths of the recorded frames.
+
+    Returns
+    -------
+    list: Theta of the lines of every frame, in which lines were detected.
+    """
+    frames = []
+    for path in paths:
+        image = cv.imread(path)
+        if image is None:
+            print('Could not read {}'.format(path))
+            continue
+        detector = IntersectionDetection(
+            image.shape[1], image.shape[0], types.SimpleNamespace())
+        detector.detect_intersection(image)
+        if detector.lines is not None and len(detector.lines) > 0:
+            frames.append(detector.lines[:, 0, 1])
+    return frames
+
+
+def drifting_angles(number_of_frames: int, seed: int = None) -> list:
+    """
+    Creates the line angles of a sequence of frames, while the robot turns slowly in front of an intersection.
+    The perspective of the camera changes the angle between both groups of lines by up to 30 degree.
+
+    Parameter
+    ---------
+    number_of_frames: int
+        Number of frames.
+    seed: int
+        Seed of the random lines, by default None for a random seed.
+
+    Returns
+    -------
+    list: Theta of the lines of every frame.
+    """
+    generator = np.random.default_rng(seed)
+    frames = []
+    for frame in range(number_of_frames):
+        # The robot turns about 0.5 degree per frame, back and forth
+        turn = np.deg2rad(20) * np.sin(frame / 50)
+        perspective = np.deg2rad(30) * np.cos(frame / 70)
+        angles = np.concatenate([angle + turn + generator.normal(0, 0.05, generator.integers(1, 20))
+                                 for angle in (0.0, np.pi / 2 + perspective)])
+        frames.append(generator.permutation(
+            np.mod(angles, np.pi)).astype(np.float32))
+    return frames
+
+
+def compare_clustering(frames: list) -> dict:
+    """
+    Clusters the line angles of every frame with both clustering methods.
+
+    Parameter
+    ---------
+    frames: list
+        Theta of the lines of every frame.
+
+    Returns
+    -------
+    dict: Mean milliseconds per frame of both methods and the mean share of the lines, which axis_split groups like kmeans.
+    """
+    detector = IntersectionDetection(640, 480, None)
+    seconds = {'kmeans': 0.0, 'axis_split': 0.0}
+    agreement = []
+    for angles in frames:
+        start_time = time.perf_counter()
+        kmeans_labels = detector.cluster_angles(
+            angles, method='kmeans')
+        seconds['kmeans'] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        axis_split_labels = detector.cluster_angles(
+            angles, method='axis_split')
+        seconds['axis_split'] += time.perf_counter() - start_time
+        # The cluster numbers of both methods can be swapped
+        same = float(np.mean(kmeans_labels == axis_split_labels))
+        agreement.append(max(same, 1.0 - same))
+    return {'kmeans_ms': seconds['kmeans'] * 1000 / max(1, len(frames)),
+            'axis_split_ms': seconds['axis_split'] * 1000 / max(1, len(frames)),
+            'agreement': float(np.mean(agreement)) if len(agreement) > 0 else float('nan'),
+            'identical_frames': sum(value == 1.0 for value in agreement)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compares the loop and the vectorized calculation of the intersections between two groups of lines and both clustering methods of the line angles.')
+    parser.add_argument('--lines', type=int, nargs='+', default=[5, 10, 20, 40],
+                        help='Numbers of lines per group.')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Number of measured runs, the fastest run is printed.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the random lines, by default 0.')
+    parser.add_argument('--images', nargs='*', default=['./parking-lot-example.jpg'],
+                        help='Recorded frames to compare the clustering methods on, in recording order.')
+    parser.add_argument('--frames', type=int, default=500,
+                        help='Number of generated frames to compare the clustering methods on.')
+    arguments = parser.parse_args()
+    print('Intersections:')
+    detector = IntersectionDetection(640, 480, None)
+    for lines_per_group in arguments.lines:
+        groups = random_line_groups(lines_per_group, arguments.seed)
+        loop_result = loop_intersections(detector, groups)
+        vectorized_result = detector.segmented_intersections(groups)
+        loop_seconds = min(timeit.repeat(lambda: loop_intersections(
+            detector, groups), number=1, repeat=arguments.repeat))
+        vectorized_seconds = min(timeit.repeat(lambda: detector.segmented_intersections(
+            groups), number=1, repeat=arguments.repeat))
+        print('{0} x {1} lines: loop {2:.3f} ms, vectorized {3:.3f} ms, {4:.1f} times faster, same result: {5}'.format(
+            lines_per_group, lines_per_group, loop_seconds * 1000, vectorized_seconds * 1000,
+            loop_seconds / vectorized_seconds, loop_result == vectorized_result))
+    print('Clustering:')
+    for name, frames in (('recorded', recorded_angles([path for path in arguments.images if isfile(path)])),
+                         ('generated', drifting_angles(arguments.frames, arguments.seed))):
+        if len(frames) == 0:
+            print('{} frames: no lines'.format(name))
+            continue
+        report = compare_clustering(frames)
+        print('{0} frames ({1}): kmeans {2:.3f} ms, axis_split {3:.3f} ms per frame, agreement {4:.4f}, identical frames {5}'.format(
+            name, len(frames), report['kmeans_ms'], report['axis_split_ms'], report['agreement'], report['identical_frames']))
+
+# Original Author: Lukas Loeffler
@@ -8,12 +8,13 @@ import cv2 as cv
 
 from collections import defaultdict
 
-from constants import RED_LOW, RED_HIGH, MAXIMAL_THETA_RADIANT_VERTICAL
+from frame_cache import FrameCache
+from constants import RED_LOW, RED_HIGH, MAXIMAL_THETA_RADIANT_VERTICAL, MINIMAL_INTERSECTION_ANGLE, INTERSECTION_CLUSTERING
 
 
 class IntersectionDetection:
 
-    def __init__(self, width, height, bot, kernel_size=(5, 5), preview=False, debug=False):
+    def __init__(self, width, height, bot, kernel_size=(5, 5), preview=False, debug=False, frame_cache: FrameCache = None):
         # Define Region of interest
         self.resolution = (int(width), int(height))
         w = self.resolution[0]//3
@@ -33,6 +34,9 @@ class IntersectionDetection:
 
         self._bot = bot
 
+        # Images derived from the latest frame, shared with the other detectors
+        self._frame_cache = frame_cache if frame_cache is not None else FrameCache()
+
         # number of failed tries
         self.failed_tries = 0
 
@@ -44,6 +48,47 @@ class IntersectionDetection:
         https://stackoverflow.com/a/46572063/1755401
         """
 
+        # Get angles in [0, pi] radians
+        angles = np.array([line[0][1] for line in lines])
+
+        labels = self.cluster_angles(angles, k, **kwargs)
+
+        # Segment lines based on their label of 0 or 1
+        segmented = defaultdict(list)
+        for i, line in zip(range(len(lines)), lines):
+            segmented[labels[i]].append(line)
+
+        self.segmented = list(segmented.values())
+        # print("Segmented lines into two groups: %d, %d" % (len(segmented[0]), len(segmented[1])))
+
+        return self.segmented
+
+    def cluster_angles(self, angles, k=2, method: str = INTERSECTION_CLUSTERING, **kwargs):
+        """
+        Clusters the angles of lines, the angles are doubled, so lines with the angles 0 and pi are in the same cluster.
+
+        Parameter
+        ---------
+        angles: numpy.ndarray
+            Theta of every line in [0, pi] radians.
+        k: int
+            Number of clusters, axis_split only supports 2 and uses kmeans otherwise.
+        method: str
+            'axis_split' or 'kmeans', by default INTERSECTION_CLUSTERING.
+        kwargs:
+            criteria, flags and attempts of cv2.kmeans.
+
+        Returns
+        -------
+        numpy.ndarray: The cluster of every line.
+        """
+        if method == 'axis_split' and k == 2:
+            return self.axis_split(angles)
+
+        # Multiply the angles by two and find coordinates of that angle on the Unit Circle
+        pts = np.stack((np.cos(2 * angles), np.sin(2 * angles)),
+                       axis=1).astype(np.float32)
+
         # Define criteria = (type, max_iter, epsilon)
         default_criteria_type = cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER
         criteria = kwargs.get('criteria', (default_criteria_type, 10, 1.0))
@@ -51,13 +96,6 @@ class IntersectionDetection:
         flags = kwargs.get('flags', cv.KMEANS_RANDOM_CENTERS)
         attempts = kwargs.get('attempts', 10)
 
-        # Get angles in [0, pi] radians
-        angles = np.array([line[0][1] for line in lines])
-
-        # Multiply the angles by two and find coordinates of that angle on the Unit Circle
-        pts = np.array([[np.cos(2 * angle), np.sin(2 * angle)]
-                       for angle in angles], dtype=np.float32)
-
         # Run k-means
         if sys.version_info[0] == 2:
             # python 2.x
@@ -67,17 +105,37 @@ class IntersectionDetection:
             labels, centers = cv.kmeans(
                 pts, k, None, criteria, attempts, flags)[1:]
 
-        labels = labels.reshape(-1)  # Transpose to row vector
+        return labels.reshape(-1)  # Transpose to row vector
 
-        # Segment lines based on their label of 0 or 1
-        segmented = defaultdict(list)
-        for i, line in zip(range(len(lines)), lines):
-            segmented[labels[i]].append(line)
+    def axis_split(self, angles):
+        """
+        Splits lines into two groups of nearly perpendicular lines in a single pass, instead of cv2.kmeans with random restarts.
+        On the unit circle of the doubled angles, perpendicular lines lie opposite each other, so both groups lie along an axis through the centre.
+        The direction of this axis is the mean of the quadrupled angles, in which both groups coincide, halved.
+        Every line is assigned by the side of the perpendicular of the axis, on which its doubled angle lies.
+        The groups are separated correctly as long as the angle between them is larger than 45 degree.
+        If all lines are nearly parallel, they are split by the side of their mean angle, like cv2.kmeans splits them, too.
 
-        self.segmented = list(segmented.values())
-        # print("Segmented lines into two groups: %d, %d" % (len(segmented[0]), len(segmented[1])))
+        Parameter
+        ---------
+        angles: numpy.ndarray
+            Theta of every line in [0, pi] radians.
 
-        return self.segmented
+        Returns
+        -------
+        numpy.ndarray: The group 0 or 1 of every line.
+        """
+        doubled = 2 * np.asarray(angles, dtype=np.float64)
+        quadrupled = 2 * doubled
+        axis = np.arctan2(np.sin(quadrupled).sum(),
+                          np.cos(quadrupled).sum()) / 2
+        labels = np.cos(doubled - axis) < 0
+        if np.all(labels == labels[0]):
+            # Deviation of every doubled angle from the mean doubled angle
+            deviation = np.sin(doubled - np.arctan2(np.sin(doubled).sum(),
+                                                    np.cos(doubled).sum()))
+            labels = deviation > deviation.mean()
+        return labels.astype(np.int32)
 
     def intersection(self, line1, line2):
         """
@@ -95,7 +153,7 @@ class IntersectionDetection:
         A = np.array([[np.cos(theta1), np.sin(theta1)],
                       [np.cos(theta2), np.sin(theta2)]])
         b = np.array([[rho1], [rho2]])
-        x0, y0 = np.linalg.solve(A, b)
+        x0, y0 = np.linalg.solve(A, b)[:, 0]
         x0, y0 = int(np.round(x0)), int(np.round(y0))
 
         return [[x0, y0]]
@@ -103,14 +161,35 @@ class IntersectionDetection:
     def segmented_intersections(self, lines):
         """
         Find the intersection between groups of lines.
+
+        The intersections of all line pairs of two groups are calculated at once with Cramer's rule,
+        instead of solving a linear equation system for every pair like intersection does.
+        Nearly parallel pairs with an angle smaller than MINIMAL_INTERSECTION_ANGLE are skipped.
+        The intersections are ordered like the pairs of the groups and have the layout [[x0, y0]] of intersection.
         """
 
         intersections = []
-        for i, group in enumerate(lines[:-1]):
-            for next_group in lines[i + 1:]:
-                for line1 in group:
-                    for line2 in next_group:
-                        intersections.append(self.intersection(line1, line2))
+        # Rho and theta of every line, shape=(lines, 2) per group
+        groups = [np.asarray(group, dtype=np.float64).reshape(-1, 2)
+                  for group in lines]
+        minimal_determinant = np.sin(MINIMAL_INTERSECTION_ANGLE)
+        for i, group in enumerate(groups[:-1]):
+            for next_group in groups[i + 1:]:
+                # Lines of the first group along the rows, lines of the second group along the columns
+                rho1 = group[:, 0, None]
+                cos1 = np.cos(group[:, 1, None])
+                sin1 = np.sin(group[:, 1, None])
+                rho2 = next_group[None, :, 0]
+                cos2 = np.cos(next_group[None, :, 1])
+                sin2 = np.sin(next_group[None, :, 1])
+                # Determinant of [[cos1, sin1], [cos2, sin2]], the sine of the angle between the lines
+                determinant = cos1 * sin2 - sin1 * cos2
+                valid = np.abs(determinant) > minimal_determinant
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    x0 = np.round((rho1 * sin2 - sin1 * rho2) / determinant)
+                    y0 = np.round((cos1 * rho2 - rho1 * cos2) / determinant)
+                intersections.extend([[int(x), int(y)]]
+                                     for x, y in zip(x0[valid], y0[valid]))
 
         return intersections
 
@@ -130,33 +209,79 @@ class IntersectionDetection:
     #             y2 = int(y0 - 1000 * (a))
     #             cv.line(img, (x1, y1), (x2, y2), color, 1)
 
-    def detect_intersection(self, img):
+    def red_mask(self, img, sequence: int = None):
+        """
+        Returns the mask of the red pixels of the imagesection with the intersection.
+
+        Parameter
+        ---------
+        img: numpy.ndarray
+            Colored imagesection with the intersection, cut out by detect_intersection.
+        sequence: int
+            Sequence number of the frame, the mask is shared with the parking space detection. None computes the mask without caching.
+
+        Returns
+        -------
+        numpy.ndarray: The mask, red pixels are 255.
+        """
+        return self._frame_cache.get(sequence, 'intersection_red_mask', lambda: cv.inRange(img, RED_LOW, RED_HIGH))
+
+    def dark_mask(self, img, sequence: int = None):
+        """
+        Returns the mask of the dark and red pixels of the imagesection with the intersection,
+        thresholded like detect_intersection does, but without the further image processing and line detection.
+
+        Parameter
+        ---------
+        img: numpy.ndarray
+            The colored camera frame.
+        sequence: int
+            Sequence number of the frame, the mask is shared with the intersection tracker. None computes the mask without caching.
+
+        Returns
+        -------
+        numpy.ndarray: The mask of the imagesection, dark and red pixels are True.
+        """
+        height, width, _ = img.shape
+        height_crop = int(height / 4)
+        width_crop = int(width / 4)
+
+        def compute():
+            gray = self._frame_cache.gray(sequence, img)[height - height_crop:height,
+                                                         width_crop:width - width_crop]
+            mask = self.red_mask(img[height - height_crop:height,
+                                     width_crop:width - width_crop, :], sequence)
+            return (gray <= 40) | (mask != 0)
+
+        return self._frame_cache.get(sequence, 'intersection_dark_mask', compute)
+
+    def detect_intersection(self, img, sequence: int = None):
         height, width, _ = img.shape
         height_crop = int(height / 4)
         width_crop = int(width / 4)
         resized = img[height - height_crop:height,
                       width_crop:width - width_crop, :]
 
-        # Copy of colored imagesection with the intersection
-        resized_full_colored = resized.copy()
+        # Colored imagesection with the intersection, the frame is read-only, so it isn't changed
+        resized_full_colored = resized
 
         try:
-            # Turn red dots into black
-            mask = cv.inRange(resized, RED_LOW, RED_HIGH)
-            resized[mask != 0] = [0, 0, 0]
             if self.preview:
-                cv.imshow('red_to_black', resized)
-
-            # Convert to grayscale
-            gray = cv.cvtColor(resized, cv.COLOR_BGR2GRAY)
+                mask = self.red_mask(resized, sequence)
+                # Turn red dots into black, in a copy, because the frame is shared with the other threads of the robot
+                red_to_black = resized.copy()
+                red_to_black[mask != 0] = [0, 0, 0]
+                cv.imshow('red_to_black', red_to_black)
+
+            # Extract black areas, red dots turned black are black areas too.
+            # It is the dark mask shared with the intersection tracker, thresholded on the grayscale image shared with the line tracking.
+            thresh = self.dark_mask(img, sequence).astype(np.uint8) * 255
         except Exception as exception:
             self.failed_tries += 1
             if self.failed_tries > 5:
                 raise exception
             return
 
-        # extract black areas
-        _, thresh = cv.threshold(gray, 40, 255, cv.THRESH_BINARY_INV)
         # do some image processing
         eroded = cv.dilate(thresh, None, iterations=1)
         eroded = cv.erode(eroded, None, iterations=3)
@@ -189,6 +314,7 @@ class IntersectionDetection:
             intersections = self.segmented_intersections(self.segmented)
 
             self._bot.intersection_img = resized_full_colored
+            self._bot.intersection_frame = (sequence, resized_full_colored)
 
         self._bot.intersection = intersections
         # print(datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3])
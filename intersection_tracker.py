@@ -0,0 +1,166 @@
+import numpy as np
+
+from intersection_detection import IntersectionDetection
+
+from constants import INTERSECTION_TRACKING_REFRESH, INTERSECTION_PIXELS_PER_POWER_SECOND, INTERSECTION_TRACKING_WINDOW, INTERSECTION_CROSS_FRACTION, INTERSECTION_TRIGGER_FRACTION
+
+
+class IntersectionTracker:
+    """
+    Tracks a detected intersection from frame to frame, so the full intersection detection with hough lines doesn't run on every frame.
+    While the robot drives forward, the intersection moves down the image in proportion to the drive power.
+    The tracker moves the last detected intersection and its lines by the predicted distance and checks with the dark pixels around the predicted intersection,
+    if there still is a cross of lines. The full intersection detection only runs, if this check fails, every INTERSECTION_TRACKING_REFRESH frames,
+    or while no intersection is tracked, if a row of the imagesection is mostly dark, so a line crossing the followed line enters the imagesection.
+    The results are published like the intersection detection does, in bot.intersection and in the segmented lines of the intersection detection.
+    """
+
+    def __init__(self, detector: IntersectionDetection, bot, refresh: int = INTERSECTION_TRACKING_REFRESH, pixels_per_power_second: float = INTERSECTION_PIXELS_PER_POWER_SECOND,
+                 window: int = INTERSECTION_TRACKING_WINDOW, cross_fraction: float = INTERSECTION_CROSS_FRACTION, trigger_fraction: float = INTERSECTION_TRIGGER_FRACTION):
+        """
+        Creates a new intersection tracker, which tracks nothing yet.
+
+        Parameter
+        ---------
+        detector: IntersectionDetection
+            The full intersection detection.
+        bot: SwarmRobot
+            Instance of the robot, its drive power predicts the movement and the intersections are published to it.
+        refresh: int
+            Number of frames, after which a tracked intersection is detected again, by default INTERSECTION_TRACKING_REFRESH.
+        pixels_per_power_second: float
+            Pixels per second the intersection moves down per percent drive power, by default INTERSECTION_PIXELS_PER_POWER_SECOND.
+        window: int
+            Size of the checked window around the predicted intersection in pixels, by default INTERSECTION_TRACKING_WINDOW.
+        cross_fraction: float
+            Share of the window, which both lines of the cross have to cover, by default INTERSECTION_CROSS_FRACTION.
+        trigger_fraction: float
+            Share of a row, which has to be dark to start the full detection, by default INTERSECTION_TRIGGER_FRACTION.
+        """
+        self._detector = detector
+        self._bot = bot
+        self._refresh = max(1, refresh)
+        self._pixels_per_power_second = pixels_per_power_second
+        self._radius = window // 2
+        self._cross_fraction = cross_fraction
+        self._trigger_fraction = trigger_fraction
+
+        # Intersections and lines of the last full detection and how far they moved down since then
+        self._detected_intersections = []
+        self._detected_segmented = []
+        self._offset = 0.0
+        self._frames_since_detection = 0
+        self._timestamp = None
+
+        # Number of frames and full detections, to measure how often the full detection is skipped
+        self.frames = 0
+        self.full_detections = 0
+
+    def update(self, frame, sequence: int = None, timestamp: float = None):
+        """
+        Updates the intersection with a new frame, runs the full intersection detection only if needed.
+
+        Parameter
+        ---------
+        frame: numpy.ndarray
+            The colored camera frame.
+        sequence: int
+            Sequence number of the frame, to share the derived images with the other detectors.
+        timestamp: float
+            Capture time of the frame in seconds, to predict the movement since the last frame. None predicts no movement.
+        """
+        self.frames += 1
+        dark = self._detector.dark_mask(frame, sequence)
+        if len(self._detected_intersections) > 0 and self._frames_since_detection < self._refresh:
+            shift = self._predicted_shift(timestamp)
+            # The median ignores single intersections of steep lines far outside of the imagesection
+            x, y = np.median([intersection[0] for intersection in self._detected_intersections], axis=0)
+            if self.is_cross(dark, x, y + self._offset + shift):
+                self._move(shift)
+                self._timestamp = timestamp
+                return
+        elif len(self._detected_intersections) == 0 and not self.is_triggered(dark):
+            self._timestamp = timestamp
+            return
+        self._detect(frame, sequence, timestamp)
+
+    def is_cross(self, dark, x: float, y: float) -> bool:
+        """
+        Checks cheaply if there is a cross of lines at a point, the horizontal and the vertical line through the point have to be mostly dark.
+
+        Parameter
+        ---------
+        dark: numpy.ndarray
+            Mask of the dark pixels of the imagesection.
+        x, y: float
+            The point in the imagesection.
+
+        Returns
+        -------
+        bool: True if both lines through the point cover at least INTERSECTION_CROSS_FRACTION of the window.
+        """
+        height, width = dark.shape
+        x, y = int(round(x)), int(round(y))
+        if not (0 <= x < width and 0 <= y < height):
+            return False
+        # The window is cut off at the border of the imagesection
+        window = dark[max(0, y - self._radius):y + self._radius + 1,
+                      max(0, x - self._radius):x + self._radius + 1]
+        row = min(y, self._radius)
+        column = min(x, self._radius)
+        # The detected intersections lie on the edges of the thick lines, not in their middle,
+        # so the lines are searched in bands of a third of the window around the point
+        band = max(1, self._radius // 3)
+        horizontal = window[max(0, row - band):row + band + 1, :].any(axis=0).mean()
+        vertical = window[:, max(0, column - band):column + band + 1].any(axis=1).mean()
+        return horizontal >= self._cross_fraction and vertical >= self._cross_fraction
+
+    def is_triggered(self, dark) -> bool:
+        """
+        Checks cheaply if a line crossing the followed line is in the imagesection.
+
+        Parameter
+        ---------
+        dark: numpy.ndarray
+            Mask of the dark pixels of the imagesection.
+
+        Returns
+        -------
+        bool: True if a row covers at least INTERSECTION_TRIGGER_FRACTION of the width with dark pixels.
+        """
+        return dark.mean(axis=1).max() >= self._trigger_fraction
+
+    def _predicted_shift(self, timestamp: float) -> float:
+        """
+        Returns how many pixels the intersection moved down since the last frame.
+        """
+        if timestamp is None or self._timestamp is None:
+            return 0.0
+        return self._bot.drive_power * self._pixels_per_power_second * (timestamp - self._timestamp)
+
+    def _move(self, shift: float):
+        """
+        Moves the intersections and the lines of the last full detection down and publishes them.
+        Moving down by the offset adds offset * sin(theta) to rho of a line in hesse normal form.
+        """
+        self._offset += shift
+        self._frames_since_detection += 1
+        offset = int(round(self._offset))
+        self._detector.segmented = [[np.array([[rho + self._offset * np.sin(theta), theta]], dtype=np.float32)
+                                     for [[rho, theta]] in group] for group in self._detected_segmented]
+        self._bot.intersection = [[[x, y + offset]]
+                                  for [[x, y]] in self._detected_intersections]
+
+    def _detect(self, frame, sequence: int, timestamp: float):
+        """
+        Runs the full intersection detection and tracks its result.
+        """
+        self.full_detections += 1
+        self._detector.detect_intersection(frame, sequence=sequence)
+        self._detected_intersections = list(self._bot.intersection)
+        self._detected_segmented = self._detector.segmented
+        self._offset = 0.0
+        self._frames_since_detection = 0
+        self._timestamp = timestamp
+
+# Original Author: Lukas Loeffler
@@ -3,11 +3,12 @@ from time import sleep
 import cv2 as cv
 import numpy as numpy
 
+from frame_cache import FrameCache
 from constants import TURN_SLEEP_TIME
 
 
 class LineTracker:
-    def __init__(self, width, height, bot, method='contour', kernel_size=(5, 5), preview: bool=False, debug: bool=False):
+    def __init__(self, width, height, bot, method='contour', kernel_size=(5, 5), preview: bool=False, debug: bool=False, frame_cache: FrameCache=None):
         """
         Parameter
         ---------
@@ -24,6 +25,8 @@ class LineTracker:
             WARNING only set true when using a GUI! If true, the current frame with detected lines will be displayed in a window next to the console.
         debug: bool
             WARNING only set true when using a GUI! If true, the current frame will be displayed in the single steps like black and white, blured and so on.
+        frame_cache: FrameCache
+            Cache of the images derived from the latest frame, shared with the other detectors. By default a cache only used by the line tracker.
         """
         # Define Region of interest
         self.resolution = (int(width), int(height))
@@ -46,16 +49,20 @@ class LineTracker:
         # SwarmRobot
         self.bot = bot;
 
-    def track_line(self, frame, event, bot):
+        self._frame_cache = frame_cache if frame_cache is not None else FrameCache()
+
+    def track_line(self, frame, event, bot, sequence: int = None):
         if not event.isSet():
             # Cut out Region of interest
             if self.debug:
                 cv.imshow('Frame', frame)
+            full_frame = frame
+            roi = (self.roi_y1, self.roi_y2, self.roi_x1, self.roi_x2)
             frame = frame[self.roi_y1:self.roi_y2, self.roi_x1:self.roi_x2]
 
-            # Convert to grayscale
+            # Convert to grayscale, with the sequence number of the frame the grayscale image of the whole frame is shared with the other detectors
             try:
-                gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+                gray = self._frame_cache.gray_roi(sequence, full_frame, roi)
                 if self.debug:
                     cv.imshow('Gray', gray)
             except Exception as exception:
@@ -68,14 +75,14 @@ class LineTracker:
             # Reset failed tries after a successfull trie, to prevent just stopping after to many fails.
             self.failed_tries = 0
 
-            # Gausian blur
-            blur = cv.GaussianBlur(gray, self.kernel_size, 0)
+            # Gausian blur, cached with the sequence number of the frame
             if self.debug:
+                blur = self._frame_cache.blurred_gray(sequence, full_frame, roi, self.kernel_size)
                 cv.imshow('Blur', blur)
 
-            # Color thresholding
+            # Color thresholding, cached with the sequence number of the frame
             # thresh = cv.adaptiveThreshold(blur ,255,cv.ADAPTIVE_THRESH_MEAN_C, cv.THRESH_BINARY_INV,11,2)
-            rel, thresh = cv.threshold(blur, 60, 255, cv.THRESH_BINARY_INV)
+            thresh = self._frame_cache.line_mask(sequence, full_frame, roi, self.kernel_size, 60)
             if self.debug:
                 cv.imshow('Thresh', thresh)
 
@@ -95,6 +102,8 @@ class LineTracker:
                 cy = int(M['m01']/M['m00'])
 
                 if self.preview:
+                    # The frame is shared with the other threads of the robot and read-only, so the preview draws into a copy.
+                    frame = frame.copy()
                     cv.line(frame, (cx, 0), (cx, 720), (255, 0, 0), 1)
                     cv.line(frame, (0, cy), (1280, cy), (255, 0, 0), 1)
 
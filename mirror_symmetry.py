@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+import argparse
+
+import numpy as np
+
+from parking_learner import ParkingLearner
+from parkingdirection import Parkingdirection
+from transition_table import TransitionTable
+from state_resolution import StateResolution
+
+
+class MirrorSymmetry:
+    """
+    Mirror image of the state and action space about the axis through the parking lot.
+    Mirroring negates phi and orientation and swaps the turning directions left and right, the length of an action stays the same.
+    A state and action combination is mirror symmetric, if the mirrored combination has the same reward and leads to the mirrored next state.
+    The kinematic model in ParkingLearner.update_state turns the orientation in the same direction for left and right curves,
+    so mostly driving straight is mirror symmetric, the symmetry is therefore checked with the transition table instead of assumed.
+    """
+
+    def __init__(self, parking_direction: Parkingdirection, transition_table: TransitionTable = None):
+        """
+        Calculates the mirrored state and action combinations and which of them are mirror symmetric.
+
+        Parameter
+        ---------
+        parking_direction: Parkingdirection
+            The parking direction, which defines the reward.
+        transition_table: TransitionTable
+            The precomputed kinematic model, by default the cached transition table of the current geometry.
+        """
+        self._transition_table = transition_table if transition_table is not None else TransitionTable.load()
+        state_shape = self._transition_table.state_shape
+        action_shape = self._transition_table.action_shape
+        rho, phi, orientation, direction, length = np.meshgrid(*(np.arange(size) for size in state_shape + action_shape),
+                                                               indexing='ij', sparse=True)
+        # Flat index of the mirrored state and action combination of every combination.
+        self.mirror = np.ravel_multi_index((rho, -phi % state_shape[1], -orientation % state_shape[2], action_shape[0] - 1 - direction, length),
+                                           state_shape + action_shape).reshape(-1)
+        # Flat index of the mirrored state of every state.
+        self.mirror_state = np.ravel_multi_index((rho[..., 0, 0], -phi[..., 0, 0] % state_shape[1], -orientation[..., 0, 0] % state_shape[2]),
+                                                 state_shape).reshape(-1)
+        next_state = self._transition_table.flat_next_state()
+        leaves = self._transition_table.leaves_table()
+        in_range = self._transition_table.in_range.reshape(-1)
+        reward = ParkingLearner(bot=None, parkingdirection=parking_direction, resolution=StateResolution.from_shape(
+            state_shape)).reward_table(self._transition_table).reshape(-1)
+        self.symmetric = (leaves == leaves[self.mirror]) & (in_range == in_range[self.mirror]) & (reward == reward[self.mirror]) & (
+            leaves | (next_state[self.mirror] == self.mirror_state[next_state]))
+
+    def report(self) -> dict:
+        """
+        Returns
+        -------
+        dict: Share of mirror symmetric state and action combinations, in total and for every turning direction.
+        """
+        symmetric = self.symmetric.reshape(self._transition_table.next_rho.shape)
+        report = {'symmetric': float(symmetric.mean())}
+        for direction in range(symmetric.shape[3]):
+            report['direction_{}'.format(direction)] = float(
+                symmetric[:, :, :, direction].mean())
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Prints how many state and action combinations of the simulator model are mirror symmetric.')
+    parser.parse_args()
+    transition_table = TransitionTable.load()
+    for parking_direction in Parkingdirection:
+        print(parking_direction.name)
+        for key, value in MirrorSymmetry(parking_direction, transition_table).report().items():
+            print('    {0}: {1:.4f}'.format(key, value))
+
+# Original Author: Lukas Loeffler
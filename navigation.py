@@ -75,10 +75,13 @@ class Navigator:
                 # intersection = list(filter(lambda x: x[0][0]>0 and x[0][0]<2000, intersection))
                 if n >= 0:
                     time.sleep(1)
-                    # Get better img while not moving for scanning
-                    _, image = self.bot._camera.read()
+                    # Get better img while not moving for scanning, the first frame captured after the robot stopped
+                    sequence, _, image = self.bot._frame_broker.latest()
+                    sequence, _, image = self.bot._frame_broker.wait_for_newer(
+                        sequence)
                     while image is None:
-                        _, image = self.bot._camera.read()
+                        sequence, _, image = self.bot._frame_broker.wait_for_newer(
+                            sequence)
                     # Get part of image that contains relevant data
                     qr_img = self.int_detector.get_right_upper_corner_intersection(
                         image, intersection[n])
@@ -97,8 +100,9 @@ class Navigator:
                     cv.imwrite(date, qr_img)
 
                     # When it contains parking space
+                    intersection_sequence, intersection_img = self.bot.intersection_frame
                     is_parking_space = self.parking_detector.detect_red_line(
-                        self.bot.intersection_img)
+                        intersection_img, intersection_sequence)
                     if is_parking_space:
                         self._detected = True
                         rho, phi, orientation = self.parking_detector.calculate_position(intersections=intersection, intersection_index=n, detected_lines=detected_lines)
@@ -0,0 +1,265 @@
+from multiprocessing import Process, Queue, shared_memory
+from queue import Empty
+
+import numpy as np
+
+from parking_learner import ParkingLearner
+from parkingdirection import Parkingdirection
+from batch_simulator import BatchSimulator
+from qtable_storage import decode_qtable, encode_qtable
+
+from constants import SIMULATION_WORKERS, SIMULATION_BATCH_SIZE
+
+
+def share_arrays(arrays: dict) -> tuple:
+    """
+    Copies arrays into one new shared memory block, so worker processes can read them without an own copy.
+
+    Parameter
+    ---------
+    arrays: dict
+        The arrays keyed by name.
+
+    Returns
+    -------
+    tuple: The shared memory block, which has to be closed and unlinked by the caller, and the layout of the arrays for attach_arrays.
+    """
+    layout = {}
+    size = 0
+    for array_name, array in arrays.items():
+        # Aligns every array to 8 bytes.
+        size += -size % 8
+        layout[array_name] = (size, array.shape, array.dtype.str)
+        size += array.nbytes
+    memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+    for array_name, array in arrays.items():
+        offset, shape, dtype = layout[array_name]
+        np.ndarray(shape=shape, dtype=dtype, buffer=memory.buf,
+                   offset=offset)[...] = array
+    return (memory, layout)
+
+
+def attach_arrays(memory: shared_memory.SharedMemory, layout: dict) -> dict:
+    """
+    Returns read-only views of the arrays in a shared memory block created by share_arrays.
+
+    Parameter
+    ---------
+    memory: multiprocessing.shared_memory.SharedMemory
+        The shared memory block.
+    layout: dict
+        The layout of the arrays returned by share_arrays.
+
+    Returns
+    -------
+    dict: The read-only arrays keyed by name, they have to be deleted before the shared memory block is closed.
+    """
+    arrays = {}
+    for array_name, (offset, shape, dtype) in layout.items():
+        arrays[array_name] = np.ndarray(
+            shape=shape, dtype=dtype, buffer=memory.buf, offset=offset)
+        arrays[array_name].flags.writeable = False
+    return arrays
+
+
+def worker_seeds(seed, workers: int) -> list:
+    """
+    Spawns the seeds of the workers from one seed, the same seed always gives the same worker seeds.
+
+    Parameter
+    ---------
+    seed: int or numpy.random.SeedSequence
+        Seed of the worker seeds, None for a random seed.
+    workers: int
+        Number of workers.
+
+    Returns
+    -------
+    list: One numpy.random.SeedSequence per worker.
+    """
+    seed_sequence = seed if isinstance(
+        seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return seed_sequence.spawn(workers)
+
+
+def _simulation_worker(shared_memory_name: str, shape: tuple, dtype: str, tables_memory_name: str, tables_layout: dict, alpha: float, y: float, parking_direction_name: str, number_of_episodes: int, random_start: bool, batch_size: int, seed: np.random.SeedSequence, results: Queue):
+    """
+    Runs batched episodes in a worker process against the q-table in shared memory.
+    The q-table is updated lock free (Hogwild), concurrent updates of the same entry can overwrite each other.
+    The read-only tables of the batch simulator are shared too, so no worker loads its own transition table.
+
+    Parameter
+    ---------
+    shared_memory_name: str
+        Name of the shared memory block containing the q-table.
+    shape: tuple
+        Shape of the q-table.
+    dtype: str
+        Data type of the q-table.
+    tables_memory_name: str
+        Name of the shared memory block containing the tables of the batch simulator.
+    tables_layout: dict
+        Layout of the tables returned by share_arrays.
+    alpha, y: float
+        Learning parameters of the parking learner.
+    parking_direction_name: str
+        Name of the Parkingdirection.
+    number_of_episodes: int
+        How many episodes this worker simulates.
+    random_start: bool
+        If true, every episode starts at a random state.
+    batch_size: int
+        Number of episodes simulated in lockstep.
+    seed: numpy.random.SeedSequence
+        Seed of this worker.
+    results: multiprocessing.Queue
+        Queue to return the number of simulated steps.
+    """
+    qtable_memory = shared_memory.SharedMemory(name=shared_memory_name)
+    tables_memory = shared_memory.SharedMemory(name=tables_memory_name)
+    try:
+        qtable = np.ndarray(shape=shape, dtype=dtype,
+                            buffer=qtable_memory.buf)
+        tables = attach_arrays(tables_memory, tables_layout)
+        parking_learner = ParkingLearner(bot=None, qtable=qtable, alpha=alpha, y=y,
+                                         parkingdirection=Parkingdirection[parking_direction_name])
+        steps = BatchSimulator(parking_learner, batch_size=batch_size, tables=tables).run(
+            number_of_episodes=number_of_episodes, random_start=random_start, seed=seed)
+        results.put(steps)
+        del parking_learner, qtable, tables
+    finally:
+        qtable_memory.close()
+        tables_memory.close()
+
+
+class ParallelSimulator:
+    """
+    Simulates parking episodes in several worker processes.
+    The q-table is copied into a shared memory block, every worker runs a BatchSimulator on it and updates it lock free (Hogwild).
+    The read-only tables of the BatchSimulator, like the next states and the rewards, are calculated once and shared in a second shared memory block,
+    so only the batches of the workers need memory per worker.
+    Every worker gets its own seed, spawned from one seed, so a run is reproducible except for the order of concurrent updates.
+    Scaled int16 q-tables are shared as float32 and encoded back afterwards.
+    The workers don't count visits and draw uniform random start states, only the q-table is shared.
+    Needs python 3.8 or newer, because of multiprocessing.shared_memory.
+    """
+
+    def __init__(self, parking_learner: ParkingLearner, workers: int = SIMULATION_WORKERS, batch_size: int = SIMULATION_BATCH_SIZE):
+        """
+        Creates a new parallel simulator for the q-table of the given parking learner.
+
+        Parameter
+        ---------
+        parking_learner: ParkingLearner
+            The parking learner, whose q-table, alpha, y and parking direction are used.
+        workers: int
+            Number of worker processes, by default SIMULATION_WORKERS.
+        batch_size: int
+            Number of episodes every worker simulates in lockstep, by default SIMULATION_BATCH_SIZE.
+        """
+        self._parking_learner = parking_learner
+        self._workers = max(1, workers)
+        self._batch_size = batch_size
+
+    def run(self, number_of_episodes: int, random_start: bool = False, seed=None) -> int:
+        """
+        Simulates the given number of parking episodes, split over all workers, and fills the q-table of the parking learner.
+
+        Parameter
+        ---------
+        number_of_episodes: int
+            How many episodes are simulated in total.
+        random_start: bool
+            If true, every episode starts at a random state, otherwise at the default start state.
+        seed: int or numpy.random.SeedSequence
+            Seed of the worker seeds, by default None for a random seed.
+
+        Returns
+        -------
+        int: The number of simulated steps of all workers.
+        """
+        # Calculates the tables of the batch simulator once for all workers.
+        tables_memory, tables_layout = share_arrays(
+            BatchSimulator(self._parking_learner, batch_size=self._batch_size).tables())
+        scale = self._parking_learner._qtable_scale
+        qtable = self._parking_learner._qtable if scale is None else decode_qtable(
+            self._parking_learner._qtable, scale, dtype='float32')
+        qtable_memory = None
+        try:
+            qtable_memory = shared_memory.SharedMemory(
+                create=True, size=qtable.nbytes)
+            shared_qtable = np.ndarray(
+                shape=qtable.shape, dtype=qtable.dtype, buffer=qtable_memory.buf)
+            shared_qtable[...] = qtable
+            seeds = worker_seeds(seed, self._workers)
+            results = Queue()
+            processes = []
+            for worker in range(self._workers):
+                # Splits the episodes as even as possible.
+                worker_episodes = number_of_episodes // self._workers + \
+                    (1 if worker < number_of_episodes % self._workers else 0)
+                process = Process(target=_simulation_worker, args=(qtable_memory.name, qtable.shape, qtable.dtype.str, tables_memory.name, tables_layout, self._parking_learner._alpha, self._parking_learner._y,
+                                  self._parking_learner._parking_direction.name, worker_episodes, random_start, self._batch_size, seeds[worker], results))
+                process.start()
+                processes.append(process)
+            steps = 0
+            finished_workers = 0
+            while finished_workers < len(processes):
+                try:
+                    steps += results.get(timeout=1)
+                    finished_workers += 1
+                except Empty:
+                    # Stops waiting, if a worker crashed without a result.
+                    if any(process.exitcode not in (None, 0) for process in processes):
+                        for process in processes:
+                            process.terminate()
+                        raise RuntimeError('Simulation worker crashed')
+            for process in processes:
+                process.join()
+            # Copies the result back into the q-table of the parking learner.
+            if scale is None:
+                qtable[...] = shared_qtable
+            else:
+                self._parking_learner._qtable[...] = encode_qtable(
+                    shared_qtable, dtype='int16', scale=scale)[0]
+            del shared_qtable
+        finally:
+            if qtable_memory is not None:
+                qtable_memory.close()
+                qtable_memory.unlink()
+            tables_memory.close()
+            tables_memory.unlink()
+        return steps
+
+if __name__ == '__main__':
+    import argparse
+
+    from qtable_storage import empty_qtable
+
+    parser = argparse.ArgumentParser(
+        description='Checks that two parallel simulations with the same seed give the same worker seeds and q-tables.')
+    parser.add_argument('--workers', type=int, default=SIMULATION_WORKERS,
+                        help='Number of worker processes, by default SIMULATION_WORKERS.')
+    parser.add_argument('--episodes', type=int, default=1000,
+                        help='Number of simulated episodes of every run, by default 1000.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of both runs, by default 0.')
+    arguments = parser.parse_args()
+    first_seeds = worker_seeds(np.random.SeedSequence(arguments.seed), arguments.workers)
+    second_seeds = worker_seeds(arguments.seed, arguments.workers)
+    if any(not np.array_equal(first.generate_state(4), second.generate_state(4)) for first, second in zip(first_seeds, second_seeds)):
+        raise RuntimeError('The same seed gave different worker seeds')
+    qtables = []
+    for run in range(2):
+        qtable = empty_qtable(dtype='float64')[0]
+        parking_learner = ParkingLearner(bot=None, qtable=qtable)
+        ParallelSimulator(parking_learner, workers=arguments.workers).run(
+            number_of_episodes=arguments.episodes, random_start=True, seed=np.random.SeedSequence(arguments.seed))
+        qtables.append(parking_learner._qtable)
+    different = int(np.count_nonzero(qtables[0] != qtables[1]))
+    # Only concurrent updates of several workers can change the order of the updates.
+    if different > 0 and arguments.workers == 1:
+        raise RuntimeError('The same seed gave {} different q values'.format(different))
+    print('Same worker seeds, {0} of {1} q values differ'.format(different, qtables[0].size))
+
+# Original Author: Lukas Loeffler
@@ -1,14 +1,22 @@
-import random
-
 from time import sleep
+from typing import TYPE_CHECKING
 
 import numpy as np
 
-from swarmrobot import SwarmRobot
 from parkingdirection import Parkingdirection
 from programm_type import ProgrammType
+from transition_table import TransitionTable
+from qtable_storage import empty_qtable, INT16_MAXIMUM
+from greedy_policy import GreedyPolicy
+from action_sampler import ActionSampler
+from sparse_qtable import SparseQTable
+from state_resolution import StateResolution
+
+from constants import TURN_SLEEP_TIME, TURNING_RADIUS_50, TURNING_RADIUS_100, TURNING_DIRECTIONS, PARKING_TIME, FORWARD_PARKING_RHO, FORWARD_PARKING_PHI, FORWARD_PARKING_ORIENTATION, BACKWARD_PARKING_RHO, BACKWARD_PARKING_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH, BACKWARD_ACTION_LENGTH_SUBTRAHEND, FORWARD_ACTION_LENGTH_SUBTRAHEND, SIMULATION_MAXIMAL_STEPS, SIMULATION_TRUNCATE_REVISITS
 
-from constants import TURN_SLEEP_TIME, TURNING_RADIUS_50, TURNING_RADIUS_100, TURNING_DIRECTIONS, PARKING_TIME, FORWARD_PARKING_RHO, FORWARD_PARKING_PHI, FORWARD_PARKING_ORIENTATION, BACKWARD_PARKING_RHO, BACKWARD_PARKING_ORIENTATION, MAXIMAL_DISTANCE_TO_PARKING_LOT, SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH, BACKWARD_ACTION_LENGTH_SUBTRAHEND, FORWARD_ACTION_LENGTH_SUBTRAHEND, MAXIMAL_RANDOM_ACTION_DIRECTION, MAXIMAL_RANDOM_ACTION_LENGTH
+# Imported only for type hints, because importing the swarmrobot needs the hardware of the robot.
+if TYPE_CHECKING:
+    from swarmrobot import SwarmRobot
 
 # region conversions
 
@@ -106,7 +114,7 @@ class ParkingLearner:
     The parking position contains the state of the right parking position, for all parking directions.
     """
 
-    def __init__(self, bot: SwarmRobot, qtable: np.ndarray = None, alpha: float = 1, y: float = 0.95, parkingdirection: Parkingdirection = Parkingdirection.FORWARD, action: str = 'explore'):
+    def __init__(self, bot: 'SwarmRobot', qtable: np.ndarray = None, alpha: float = 1, y: float = 0.95, parkingdirection: Parkingdirection = Parkingdirection.FORWARD, action: str = 'explore', qtable_scale: float = None, policy: GreedyPolicy = None, seed=None, visits: np.ndarray = None, resolution: StateResolution = None):
         """
         Creates a new instance of a parking learner.
 
@@ -125,11 +133,24 @@ class ParkingLearner:
             The direction of parking the robot, either FORAWARD or BACKWARD.
         action: str
             The action to even 'explore' or 'utilize' at pakring, 
+        qtable_scale: float
+            Scale of an int16 q-table, the q value is the stored integer times the scale. None for float q-tables.
+        policy: GreedyPolicy
+            Cached best actions of the q-table, used to utilize. If given without q-table, the parking learner can only utilize.
+        seed: int or numpy.random.SeedSequence
+            Seed of the random actions to explore, by default None for a random seed.
+        visits: numpy.ndarray
+            Visit counts of the state and action combinations with the shape of the q-table, increased at every q value update. By default None, the visits are not counted.
+        resolution: StateResolution
+            The size of the state bins, by default derived from the shape of the q-table or the resolution of constants.py without q-table.
         """
-        qtable_is_numpy_array = qtable.__class__ == np.ndarray
         self._bot = bot
-        self._qtable = qtable if qtable_is_numpy_array else np.zeros(
-            shape=(SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH))
+        if resolution is None:
+            resolution = StateResolution.from_shape(qtable.shape) if isinstance(
+                qtable, (np.ndarray, SparseQTable)) else StateResolution()
+        self._resolution = resolution
+        self._set_qtable(qtable, qtable_scale, policy, visits)
+        self._action_sampler = ActionSampler(seed)
         self._state = {
             'rho': 0,
             'phi': 0,
@@ -141,21 +162,59 @@ class ParkingLearner:
         self._y = y
         self._parking_direction = parkingdirection
         self._exploration_counter = 0
+        # Precomputed kinematic model for the simulation, loaded at the first simulated action.
+        self._transition_table = None
+        # Truncation of simulated episodes, which cycle through states in range.
+        self._maximal_simulation_steps = SIMULATION_MAXIMAL_STEPS
+        self._truncate_revisits = SIMULATION_TRUNCATE_REVISITS
         # Turning radia  for 0.5 and 1.0 steering.
         self._turning_radius = [TURNING_RADIUS_50, TURNING_RADIUS_100]
+        # The parking position is given in the base resolution in constants.py.
+        forward_rho, forward_phi, forward_orientation = self._resolution.base_state(
+            FORWARD_PARKING_RHO, FORWARD_PARKING_PHI, FORWARD_PARKING_ORIENTATION)
+        backward_rho, _, backward_orientation = self._resolution.base_state(
+            BACKWARD_PARKING_RHO, 0, BACKWARD_PARKING_ORIENTATION)
         self._parking_position = {
             'FORWARD': {
-                'rho': FORWARD_PARKING_RHO,
-                'phi': FORWARD_PARKING_PHI,
-                'orientation': FORWARD_PARKING_ORIENTATION
+                'rho': forward_rho,
+                'phi': forward_phi,
+                'orientation': forward_orientation
             },
             'BACKWARD': {
-                'rho': BACKWARD_PARKING_RHO,
-                'orientation': BACKWARD_PARKING_ORIENTATION
+                'rho': backward_rho,
+                'orientation': backward_orientation
             }
         }
 
-    def change_parking_direction(self, new_parking_direction: Parkingdirection = Parkingdirection.FORWARD, new_qtable: np.ndarray = None) -> np.ndarray:
+    def _set_qtable(self, qtable: np.ndarray, qtable_scale: float, policy: GreedyPolicy, visits: np.ndarray = None):
+        """
+        Sets q-table, scale, greedy policy and visit counts.
+        Creates a new q-table, if no q-table and no policy is given.
+
+        Parameter
+        ---------
+        qtable: numpy.ndarray or SparseQTable
+            The q-table or None.
+        qtable_scale: float
+            Scale of an int16 q-table, None for float q-tables.
+        policy: GreedyPolicy
+            The greedy policy of the q-table or None.
+        visits: numpy.ndarray
+            The visit counts of the q-table or None.
+        """
+        is_qtable = isinstance(qtable, (np.ndarray, SparseQTable))
+        if is_qtable or policy is not None:
+            self._qtable = qtable if is_qtable else None
+            self._qtable_scale = qtable_scale
+        else:
+            self._qtable, self._qtable_scale = empty_qtable(
+                shape=self._resolution.shape + (SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH))
+        self._policy = policy
+        self._visits = visits
+        # States whose q values changed since the last policy refresh.
+        self._changed_states = set()
+
+    def change_parking_direction(self, new_parking_direction: Parkingdirection = Parkingdirection.FORWARD, new_qtable: np.ndarray = None, new_qtable_scale: float = None, new_policy: GreedyPolicy = None, new_visits: np.ndarray = None) -> np.ndarray:
         """
         Changes parking direction of the robot and sets a new q-table.
 
@@ -165,11 +224,45 @@ class ParkingLearner:
             The new parking direction.
         new_qtable: np.ndarray(shape=(61, 36, 36, 5, 20))
             The new 5 dimensional q-table filled, filled with floats.
+        new_qtable_scale: float
+            Scale of an int16 q-table, None for float q-tables.
+        new_policy: GreedyPolicy
+            The greedy policy of the new q-table, by default None.
+        new_visits: numpy.ndarray
+            The visit counts of the new q-table, by default None.
         """
-        new_qtable_is_numpy_array = new_qtable.__class__ == np.ndarray
+        # Refreshes the greedy policy of the old q-table, before it is replaced.
+        self.refresh_policy()
         self._parking_direction = new_parking_direction
-        self._qtable = new_qtable if new_qtable_is_numpy_array else np.zeros(
-            shape=(SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH))
+        self._set_qtable(new_qtable, new_qtable_scale, new_policy, new_visits)
+
+    def set_seed(self, seed):
+        """
+        Sets a new seed of the random actions to explore.
+
+        Parameter
+        ---------
+        seed: int or numpy.random.SeedSequence
+            The new seed, None for a random seed.
+        """
+        self._action_sampler = ActionSampler(seed)
+
+    def refresh_policy(self, all_states: bool = False):
+        """
+        Recalculates the greedy policy for the states whose q values changed since the last refresh.
+
+        Parameter
+        ---------
+        all_states: bool
+            If true, the policy of all states is recalculated, needed after the q-table was changed without self.set_q_value, e.g. by the BatchSimulator.
+        """
+        if self._policy is None or self._qtable is None:
+            return
+        if all_states:
+            self._policy.refresh(self._qtable)
+        elif len(self._changed_states) > 0:
+            self._policy.refresh(self._qtable, self._changed_states)
+        self._changed_states = set()
 
     def set_action_utilize(self):
         """
@@ -190,6 +283,43 @@ class ParkingLearner:
         self._action = 'explore'
         self._exploration_counter = exploration_counter
 
+    def q_values(self, rho: int, phi: int, orientation: int) -> np.ndarray:
+        """
+        Returns the q values of all actions of a state, decoded if the q-table is a scaled int16 q-table.
+
+        Parameter
+        ---------
+        rho, phi, orientation: int
+            The state.
+
+        Returns
+        -------
+        numpy.ndarray: The q values with shape=(5, 20).
+        """
+        state_qtable = self._qtable[int(rho), int(phi), int(orientation)]
+        return state_qtable if self._qtable_scale is None else state_qtable * self._qtable_scale
+
+    def set_q_value(self, index: tuple, q_value: float):
+        """
+        Sets a q value, encoded if the q-table is a scaled int16 q-table, and counts the visit of the state and action combination.
+
+        Parameter
+        ---------
+        index: tuple
+            Index of the state and action combination (rho, phi, orientation, direction, length).
+        q_value: float
+            The new q value.
+        """
+        if self._qtable_scale is None:
+            self._qtable[index] = q_value
+        else:
+            self._qtable[index] = np.clip(
+                np.rint(q_value / self._qtable_scale), -INT16_MAXIMUM, INT16_MAXIMUM)
+        if self._policy is not None:
+            self._changed_states.add(index[:3])
+        if self._visits is not None:
+            self._visits[index] += 1
+
     def update_state(self, direction_index: int, length_index: int) -> bool:
         """
         Calculates and sets new realtive position to parking lot as state.
@@ -208,9 +338,9 @@ class ParkingLearner:
         # Converts indicies and rounded state to calculateready numbers.
         length = index2dlength.__func__(length_index)
         direction = index2direction.__func__(direction_index)
-        state_rho = self._state['rho']
-        rad_phi = np.deg2rad(self._state['phi'] * 10)
-        rad_orientation = np.deg2rad(self._state['orientation'] * 10)
+        state_rho = self._resolution.rho(self._state['rho'])
+        rad_phi = self._resolution.angle(self._state['phi'])
+        rad_orientation = self._resolution.angle(self._state['orientation'])
         # Calculates new State
         [x, y] = pol2cart.__func__(state_rho, rad_phi)
         if direction == 0.0:
@@ -243,12 +373,11 @@ class ParkingLearner:
             y_t = y_m + y_delta_t
         # Sets new position as robot state.
         [rho_t, phi_t] = cart2pol.__func__(x_t, y_t)
-        self._state['rho'] = int(rho_t)
-        self._state['phi'] = int(
-            np.rint(np.rad2deg(phi_t)/10)) % SIZE_STATE_PHI
-        self._state['orientation'] = int(
-            np.rint(np.rad2deg(orientation_t)/10)) % SIZE_STATE_ORIENTATION
-        return rho_t <= MAXIMAL_DISTANCE_TO_PARKING_LOT
+        self._state['rho'] = self._resolution.rho_index(rho_t)
+        self._state['phi'] = self._resolution.angle_index(phi_t)
+        self._state['orientation'] = self._resolution.angle_index(
+            orientation_t)
+        return bool(self._resolution.in_range(rho_t))
 
     def action(self, direction_index: int, length_index: int) -> bool:
         """
@@ -289,6 +418,10 @@ class ParkingLearner:
         sleep(TURN_SLEEP_TIME)
         self._bot.straight()
         self._parking = True
+        # The measured position is given in the base resolution.
+        if not self._resolution.is_base():
+            distance, angle, orientation = self._resolution.from_base(
+                distance, angle, orientation)
         self.parking(distance=distance, angle=angle, orientation=orientation)
 
     def end_parking(self):
@@ -333,10 +466,34 @@ class ParkingLearner:
         reward = 0.0
         if self.check_location():
             reward = 100.0
-        if self._state['rho'] > MAXIMAL_DISTANCE_TO_PARKING_LOT:
+        if self._state['rho'] >= self._resolution.shape[0]:
             reward = -100.0
         return reward
 
+    def reward_table(self, transition_table: TransitionTable) -> np.ndarray:
+        """
+        Calculates the reward of every state and action combination at once, like self.get_reward for the state after the action.
+
+        Parameter
+        ---------
+        transition_table: TransitionTable
+            The precomputed next states.
+
+        Returns
+        -------
+        numpy.ndarray: The rewards with the shape of the q-table, dtype float32.
+        """
+        parking_position = self._parking_position[self._parking_direction.name]
+        is_parked = (transition_table.next_rho == parking_position['rho']) & (
+            transition_table.next_orientation == parking_position['orientation'])
+        if self._parking_direction == Parkingdirection.FORWARD:
+            is_parked &= transition_table.next_phi == parking_position['phi']
+        reward = np.zeros(shape=transition_table.next_rho.shape, dtype=np.float32)
+        reward[is_parked] = 100.0
+        reward[transition_table.next_rho >=
+               transition_table.state_shape[0]] = -100.0
+        return reward
+
     def parking(self, distance: float, angle: float, orientation: float):
         """
         Parks the robot automaticly.
@@ -367,18 +524,22 @@ class ParkingLearner:
             # Decides to utilize the filled q-table oder explore and fill the q-table.
             # Uses q-table to find a way to park.
             if self._action == 'utilize':
-                state_qtable = self._qtable[int(self._state['rho']), int(
-                    self._state['phi']), int(self._state['orientation'])]
-                (action_direction_index, action_length_index) = np.unravel_index(
-                    state_qtable.argmax(), state_qtable.shape)
+                if self._policy is not None:
+                    # Uses the cached best action of the state.
+                    self.refresh_policy()
+                    (action_direction_index, action_length_index) = self._policy.action(
+                        self._state['rho'], self._state['phi'], self._state['orientation'])
+                else:
+                    state_qtable = self._qtable[int(self._state['rho']), int(
+                        self._state['phi']), int(self._state['orientation'])]
+                    (action_direction_index, action_length_index) = np.unravel_index(
+                        state_qtable.argmax(), state_qtable.shape)
                 is_in_range = self.action(
                     action_direction_index, action_length_index)
             # Fills q-Table.
             if self._action == 'explore':
-                action_direction_index = random.randint(
-                    0, MAXIMAL_RANDOM_ACTION_DIRECTION)
-                action_length_index = random.randint(
-                    0, MAXIMAL_RANDOM_ACTION_LENGTH)
+                (action_direction_index,
+                 action_length_index) = self._action_sampler.next_action()
                 old_state = {
                     'rho': self._state['rho'],
                     'phi': self._state['phi'],
@@ -386,17 +547,17 @@ class ParkingLearner:
                 }
                 is_in_range = self.action(
                     action_direction_index, action_length_index)
-                old_q_s_t = self._qtable[int(old_state['rho']), int(old_state['phi']), int(
-                    old_state['orientation']), action_direction_index, action_length_index]
+                old_q_s_t = self.q_values(old_state['rho'], old_state['phi'], old_state['orientation'])[
+                    action_direction_index, action_length_index]
                 # Checks if state is out of range, sets possible action q table based on check.
-                if self._state['rho'] <= MAXIMAL_DISTANCE_TO_PARKING_LOT:
-                    possible_actions_qtable = self._qtable[int(self._state['rho']), int(
-                        self._state['phi']), int(self._state['orientation'])]
+                if self._state['rho'] < self._resolution.shape[0]:
+                    possible_actions_qtable = self.q_values(
+                        self._state['rho'], self._state['phi'], self._state['orientation'])
                 else:
                     possible_actions_qtable = [-100.0]
                 # Fills q-Table.
-                self._qtable[int(old_state['rho']), int(old_state['phi']), int(old_state['orientation']), action_direction_index, action_length_index] = (
-                    1 - self._alpha) * old_q_s_t + self._alpha * (self.get_reward() + self._y * np.amax(possible_actions_qtable))
+                self.set_q_value((int(old_state['rho']), int(old_state['phi']), int(old_state['orientation']), action_direction_index, action_length_index), (
+                    1 - self._alpha) * old_q_s_t + self._alpha * (self.get_reward() + self._y * np.amax(possible_actions_qtable)))
             # Stays in the parking lot for 30 seconds, after a succesfully parking manover.
             if self.check_location():
                 self._parking = False
@@ -424,6 +585,7 @@ class ParkingLearner:
     def simulated_action(self, direction_index: int, length_index: int) -> bool:
         """
         Calculate its new position relative to the parking lot.
+        Looks up the new position in the precomputed transition table, states outside of the table are calculated with self.update_state.
 
         Parameter
         ----------
@@ -436,12 +598,27 @@ class ParkingLearner:
         -------
         boolean: True if the robot is less equals 60 cm from the parking lot away.
         """
-        return self.update_state(direction_index=direction_index, length_index=length_index)
+        if self._transition_table is None:
+            self._transition_table = TransitionTable.load(
+                resolution=self._resolution)
+        rho = self._state['rho']
+        phi = self._state['phi']
+        orientation = self._state['orientation']
+        if not self._transition_table.contains(rho, phi, orientation):
+            return self.update_state(direction_index=direction_index, length_index=length_index)
+        index = (int(rho), int(phi), int(orientation),
+                 direction_index, length_index)
+        self._state['rho'] = int(self._transition_table.next_rho[index])
+        self._state['phi'] = int(self._transition_table.next_phi[index])
+        self._state['orientation'] = int(
+            self._transition_table.next_orientation[index])
+        return bool(self._transition_table.in_range[index])
 
-    def simulated_parking(self, distance: float, angle: float, orientation: float):
+    def simulated_parking(self, distance: float, angle: float, orientation: float) -> tuple:
         """
         Simulates parking the robot.
         Behavies always like exploring.
+        The episode is truncated after self._maximal_simulation_steps steps or, if self._truncate_revisits is true, when a state is reached a second time.
 
         Parameter
         ----------
@@ -451,16 +628,27 @@ class ParkingLearner:
             The angle how much the parking lot is left or right from the robot in rad.
         orientation: float
             How much the robot is turned relativ to the parking lot in rad.
+
+        Returns
+        -------
+        tuple: The number of steps, if the parking position was reached and if the episode was truncated.
         """
         self._state['rho'] = distance
         self._state['phi'] = angle
         self._state['orientation'] = orientation
         is_in_range = True
+        steps = 0
+        parked = False
+        truncated = False
+        # Bitset of the visited states, one bit per state.
+        visited = None
+        if self._truncate_revisits:
+            visited = bytearray(
+                int(np.prod(self._resolution.shape)) // 8 + 1)
+            self._visit_state(visited)
         while self._parking:
-            action_direction_index = random.randint(
-                0, MAXIMAL_RANDOM_ACTION_DIRECTION)
-            action_length_index = random.randint(
-                0, MAXIMAL_RANDOM_ACTION_LENGTH)
+            (action_direction_index,
+             action_length_index) = self._action_sampler.next_action()
             old_state = {
                 'rho': self._state['rho'],
                 'phi': self._state['phi'],
@@ -469,21 +657,48 @@ class ParkingLearner:
             # Simulates action
             is_in_range = self.simulated_action(
                 action_direction_index, action_length_index)
-            old_q_s_t = self._qtable[int(old_state['rho']), int(old_state['phi']), int(
-                old_state['orientation']), action_direction_index, action_length_index]
+            old_q_s_t = self.q_values(old_state['rho'], old_state['phi'], old_state['orientation'])[
+                action_direction_index, action_length_index]
             # Checks if state is out of range, sets possible action q table based on check.
-            if self._state['rho'] <= MAXIMAL_DISTANCE_TO_PARKING_LOT:
-                possible_actions_qtable = self._qtable[int(self._state['rho']), int(
-                    self._state['phi']), int(self._state['orientation'])]
+            if self._state['rho'] < self._resolution.shape[0]:
+                possible_actions_qtable = self.q_values(
+                    self._state['rho'], self._state['phi'], self._state['orientation'])
             else:
                 possible_actions_qtable = [-100.0]
             # Fills q-Table.
-            self._qtable[int(old_state['rho']), int(old_state['phi']), int(old_state['orientation']), action_direction_index, action_length_index] = (
-                1 - self._alpha) * old_q_s_t + self._alpha * (self.get_reward() + self._y * np.amax(possible_actions_qtable))
+            reward = self.get_reward()
+            self.set_q_value((int(old_state['rho']), int(old_state['phi']), int(old_state['orientation']), action_direction_index, action_length_index), (
+                1 - self._alpha) * old_q_s_t + self._alpha * (reward + self._y * np.amax(possible_actions_qtable)))
+            steps += 1
+            parked = parked or reward > 0
             if not is_in_range:
                 self._parking = False
+            elif (self._maximal_simulation_steps > 0 and steps >= self._maximal_simulation_steps) or (visited is not None and self._visit_state(visited)):
+                truncated = True
+                self._parking = False
+        return (steps, parked, truncated)
 
-    def simulated_start(self, distance: int = 15, angle: int = 0, orientation: int = 18):
+    def _visit_state(self, visited: bytearray) -> bool:
+        """
+        Marks the current state in the bitset of visited states.
+
+        Parameter
+        ---------
+        visited: bytearray
+            Bitset with one bit per state.
+
+        Returns
+        -------
+        bool: True if the state was visited before.
+        """
+        state_index = (int(self._state['rho']) * self._resolution.shape[1] + int(self._state['phi'])
+                       ) * self._resolution.shape[2] + int(self._state['orientation'])
+        bit = 1 << (state_index & 7)
+        was_visited = visited[state_index >> 3] & bit != 0
+        visited[state_index >> 3] |= bit
+        return was_visited
+
+    def simulated_start(self, distance: int = 15, angle: int = 0, orientation: int = 18) -> tuple:
         """
         Starts simulated parking process.
 
@@ -495,9 +710,13 @@ class ParkingLearner:
             The angle phi of the robot relativ to the parking lot entrance. By defautl 0 degree.
         orientation: int = 18
             The angle, that describes in what direction the front of the robot is, relativ to the parking lot entrance. By default 180 degrees saved as 18.
+
+        Returns
+        -------
+        tuple: The number of steps, if the parking position was reached and if the episode was truncated.
         """
         self._parking = True
-        self.simulated_parking(distance, angle, orientation)
+        return self.simulated_parking(distance, angle, orientation)
 
     # endregion
 
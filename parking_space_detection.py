@@ -27,9 +27,12 @@ class ParkingSpaceDetection:
         self.debug = debug
         self._intersection_detector = intersection_detector
 
-    def detect_red_line(self, img):
-        # threshold on red color
-        thresh = cv.inRange(img, RED_LOW, RED_HIGH)
+    def detect_red_line(self, img, sequence: int = None):
+        # threshold on red color, the mask of the intersection detection is reused for the same frame
+        if self._intersection_detector is not None:
+            thresh = self._intersection_detector.red_mask(img, sequence)
+        else:
+            thresh = cv.inRange(img, RED_LOW, RED_HIGH)
 
         # apply morphology close
         kernel = np.ones((5, 5), np.uint8)
@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+import sys
+import argparse
+import datetime
+
+from os.path import isfile
+
+import numpy as np
+
+from parking_learner import ParkingLearner
+from parkingdirection import Parkingdirection
+from transition_table import TransitionTable
+from state_resolution import StateResolution
+from greedy_policy import GreedyPolicy, load_policy_pair
+from qtable_storage import has_qtable_pair_mmap, qtable_mmap_directory, load_or_create_qtable_pair, MANIFEST_FILE
+
+from constants import EVALUATION_MAXIMAL_STEPS, EVALUATION_PERCENTILES
+
+
+class PolicyEvaluator:
+    """
+    Evaluates a greedy policy with the simulator model, instead of letting the robot park on the floor.
+    The policy is rolled forward from every state (rho, phi, orientation) at once with numpy arrays, until the robot parks, leaves the parking area or the step limit is reached.
+    The policy is deterministic, so a start state reaching the step limit loops forever.
+    """
+
+    def __init__(self, parking_direction: Parkingdirection, transition_table: TransitionTable = None):
+        """
+        Creates a new policy evaluator for a parking direction.
+
+        Parameter
+        ---------
+        parking_direction: Parkingdirection
+            The parking direction, which defines the parking position.
+        transition_table: TransitionTable
+            The precomputed kinematic model, by default the cached transition table of the current geometry.
+        """
+        self._transition_table = transition_table if transition_table is not None else TransitionTable.load()
+        self._number_of_actions = int(
+            np.prod(self._transition_table.action_shape))
+        self._next_state = self._transition_table.flat_next_state().reshape(-1)
+        self._in_range = self._transition_table.in_range.reshape(-1)
+        self._resolution = StateResolution.from_shape(
+            self._transition_table.state_shape)
+        self._parked = ParkingLearner(bot=None, parkingdirection=parking_direction, resolution=self._resolution).reward_table(
+            self._transition_table).reshape(-1) > 0
+
+    def rollout(self, policy: GreedyPolicy, maximal_steps: int = EVALUATION_MAXIMAL_STEPS) -> tuple:
+        """
+        Rolls the policy forward from every state.
+
+        Parameter
+        ---------
+        policy: GreedyPolicy
+            The evaluated greedy policy.
+        maximal_steps: int
+            Step limit of every episode, by default EVALUATION_MAXIMAL_STEPS.
+
+        Returns
+        -------
+        tuple: Three arrays with the shape of the states, the number of steps, if the robot parked and if the robot left the parking area.
+        """
+        state_shape = self._transition_table.state_shape
+        number_of_states = int(np.prod(state_shape))
+        number_of_lengths = self._transition_table.action_shape[1]
+        policy.complete()
+        # Flat action index of the best action of every state.
+        action = (policy.policy[..., 0].astype(np.int64) * number_of_lengths +
+                  policy.policy[..., 1]).reshape(-1)
+        steps = np.full(shape=number_of_states,
+                        fill_value=maximal_steps, dtype=np.int32)
+        parked = np.zeros(shape=number_of_states, dtype=bool)
+        left = np.zeros(shape=number_of_states, dtype=bool)
+        # Start state and current state of the running episodes.
+        start = np.arange(number_of_states)
+        state = start.copy()
+        for step in range(1, maximal_steps + 1):
+            if len(state) == 0:
+                break
+            state_action = state * self._number_of_actions + action[state]
+            is_parked = self._parked[state_action]
+            is_left = ~self._in_range[state_action]
+            finished = is_parked | is_left
+            steps[start[finished]] = step
+            parked[start[is_parked]] = True
+            left[start[is_left & ~is_parked]] = True
+            start = start[~finished]
+            state = self._next_state[state_action[~finished]]
+        return (steps.reshape(state_shape), parked.reshape(state_shape), left.reshape(state_shape))
+
+    def evaluate(self, policy: GreedyPolicy, maximal_steps: int = EVALUATION_MAXIMAL_STEPS, start: tuple = (15, 0, 18)) -> dict:
+        """
+        Evaluates the policy from every start state.
+
+        Parameter
+        ---------
+        policy: GreedyPolicy
+            The evaluated greedy policy.
+        maximal_steps: int
+            Step limit of every episode, by default EVALUATION_MAXIMAL_STEPS.
+        start: tuple
+            Default start state (rho, phi, orientation) of the exhibition in the base resolution, reported separately.
+
+        Returns
+        -------
+        dict: Success rate, out of range rate, looping rate, mean and percentiles of the steps to park and the result of the default start state.
+        """
+        steps, parked, left = self.rollout(policy, maximal_steps)
+        start = self._resolution.base_state(*start)
+        looping = ~(parked | left)
+        parked_steps = steps[parked]
+        report = {
+            'states': int(parked.size),
+            'success_rate': float(parked.mean()),
+            'out_of_range_rate': float(left.mean()),
+            'looping_rate': float(looping.mean()),
+            'looping_states': int(np.count_nonzero(looping)),
+            'mean_steps': float(parked_steps.mean()) if parked_steps.size > 0 else float('nan'),
+            'default_start_parked': bool(parked[start]),
+            'default_start_steps': int(steps[start])
+        }
+        for percentile in EVALUATION_PERCENTILES:
+            report['p{}_steps'.format(percentile)] = float(np.percentile(
+                parked_steps, percentile)) if parked_steps.size > 0 else float('nan')
+        return report
+
+
+def evaluate_qtable_pair(name: str, maximal_steps: int = EVALUATION_MAXIMAL_STEPS) -> dict:
+    """
+    Evaluates the greedy policies of a saved q-table pair.
+    An up to date greedy policy pair is used, otherwise the greedy policies are derived from the q-table pair.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair.
+    maximal_steps: int
+        Step limit of every episode, by default EVALUATION_MAXIMAL_STEPS.
+
+    Returns
+    -------
+    dict: The reports keyed by Parkingdirection.
+    """
+    qtable_path = '{0}/{1}'.format(qtable_mmap_directory(name),
+                                   MANIFEST_FILE) if has_qtable_pair_mmap(name) else './{}.npz'.format(name)
+    if not isfile(qtable_path):
+        raise FileNotFoundError('No q-table pair {}'.format(name))
+    policy_pair = load_policy_pair(name, qtable_path)
+    if policy_pair is None:
+        qtable_pair = load_or_create_qtable_pair(name)[0]
+        policy_pair = {parking_direction: GreedyPolicy.from_qtable(
+            qtable_pair[parking_direction]) for parking_direction in Parkingdirection}
+    transition_table = TransitionTable.load(
+        resolution=StateResolution.from_shape(policy_pair[Parkingdirection.FORWARD].policy.shape))
+    return {parking_direction: PolicyEvaluator(parking_direction, transition_table).evaluate(policy_pair[parking_direction], maximal_steps)
+            for parking_direction in Parkingdirection}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Evaluates the greedy policies of a q-table pair from every start state with the simulator model.')
+    parser.add_argument('name', nargs='?', default='default',
+                        help='Name of the q-table pair, by default "default".')
+    parser.add_argument('--steps', type=int, default=EVALUATION_MAXIMAL_STEPS,
+                        help='Step limit of every episode.')
+    parser.add_argument('--minimal-success-rate', type=float, default=None,
+                        help='Exits with status 1, if the success rate of a parking direction is lower.')
+    arguments = parser.parse_args()
+    start_time = datetime.datetime.now()
+    reports = evaluate_qtable_pair(arguments.name, arguments.steps)
+    passed = True
+    for parking_direction, report in reports.items():
+        print(parking_direction.name)
+        for key, value in report.items():
+            print('    {0}: {1}'.format(key, value))
+        if arguments.minimal_success_rate is not None and report['success_rate'] < arguments.minimal_success_rate:
+            passed = False
+    print('Evaluated in {}'.format(datetime.datetime.now() - start_time))
+    if not passed:
+        print('Success rate lower than {}'.format(
+            arguments.minimal_success_rate))
+        sys.exit(1)
+
+# Original Author: Lukas Loeffler
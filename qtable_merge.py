@@ -0,0 +1,233 @@
+#!/usr/bin/python3
+import argparse
+import datetime
+import zipfile
+
+import numpy as np
+
+from parkingdirection import Parkingdirection
+from qtable_storage import check_dtype, encode_qtable, INT16_MAXIMUM
+
+from constants import QTABLE_DTYPE, QTABLE_INT16_LIMIT
+
+MERGE_STRATEGIES = ('weighted', 'max', 'most-visited')
+"""
+tuple[str]:
+Supported strategies to merge q-tables.
+'weighted': Average of the q values, weighted by the visits.
+'max': Biggest visited q value.
+'most-visited': Q value of the q-table with the most visits.
+"""
+
+
+def _open_npz_member(npz_file: zipfile.ZipFile, key: str) -> tuple:
+    """
+    Opens an array of an .npz file for reading slice by slice along the first axis.
+
+    Parameter
+    ---------
+    npz_file: zipfile.ZipFile
+        The opened .npz file.
+    key: str
+        Name of the array.
+
+    Returns
+    -------
+    tuple: The opened file object positioned at the data, the shape and the data type of the array.
+    """
+    member = npz_file.open('{}.npy'.format(key))
+    version = np.lib.format.read_magic(member)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(
+            member)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(
+            member)
+    if fortran_order:
+        raise ValueError(
+            'Array {} is saved in fortran order and can not be read slice by slice'.format(key))
+    return (member, shape, dtype)
+
+
+def _read_slice(member, shape: tuple, dtype: np.dtype) -> np.ndarray:
+    """
+    Reads the next slice along the first axis of an opened array.
+
+    Parameter
+    ---------
+    member: file object
+        The opened array returned by _open_npz_member.
+    shape: tuple
+        Shape of the whole array.
+    dtype: numpy.dtype
+        Data type of the array.
+
+    Returns
+    -------
+    numpy.ndarray: The slice with shape=shape[1:].
+    """
+    count = int(np.prod(shape[1:]))
+    return np.frombuffer(member.read(count * dtype.itemsize), dtype=dtype, count=count).reshape(shape[1:])
+
+
+def _merge_slice(qtables: list, visits: list, strategy: str) -> np.ndarray:
+    """
+    Merges the same slice of several q-tables.
+
+    Parameter
+    ---------
+    qtables: list
+        The float q values of the slice of every q-table.
+    visits: list
+        The visits of the slice of every q-table.
+    strategy: str
+        One of MERGE_STRATEGIES.
+
+    Returns
+    -------
+    numpy.ndarray: The merged q values of the slice, 0.0 where no q-table was visited.
+    """
+    qtables = np.stack(qtables)
+    visits = np.stack(visits).astype(float)
+    if strategy == 'weighted':
+        total = visits.sum(axis=0)
+        return np.divide((qtables * visits).sum(axis=0), total, out=np.zeros_like(total), where=total > 0)
+    if strategy == 'max':
+        merged = np.where(visits > 0, qtables, -np.inf).max(axis=0)
+        return np.where(np.isfinite(merged), merged, 0.0)
+    most_visited = visits.argmax(axis=0)
+    return np.take_along_axis(qtables, most_visited[np.newaxis], axis=0)[0]
+
+
+def _merged_slices(input_files: list, paths: list, parking_direction: Parkingdirection, strategy: str):
+    """
+    Reads the q-tables of a parking direction slice by slice and merges them.
+
+    Parameter
+    ---------
+    input_files: list
+        The opened .npz files.
+    paths: list
+        Paths of the .npz files, used in error messages.
+    parking_direction: Parkingdirection
+        The parking direction of the merged q-tables.
+    strategy: str
+        One of MERGE_STRATEGIES.
+
+    Returns
+    -------
+    generator: Yields the shape of the q-tables first and the merged q values and summed visits of every slice afterwards.
+    """
+    members = []
+    readers = []
+    shape = None
+    try:
+        for path, input_file in zip(paths, input_files):
+            qtable_member, member_shape, qtable_dtype = _open_npz_member(
+                input_file, parking_direction.name)
+            members.append(qtable_member)
+            if shape is not None and member_shape != shape:
+                raise ValueError('Q-table {0} of {1} has shape {2}, expected {3}'.format(
+                    parking_direction.name, path, member_shape, shape))
+            shape = member_shape
+            scale_key = '{}_SCALE.npy'.format(parking_direction.name)
+            scale = float(np.load(input_file.open(scale_key))
+                          ) if scale_key in input_file.namelist() else None
+            visits_key = '{}_VISITS'.format(parking_direction.name)
+            visits_member = None
+            visits_dtype = None
+            if '{}.npy'.format(visits_key) in input_file.namelist():
+                visits_member, _, visits_dtype = _open_npz_member(
+                    input_file, visits_key)
+                members.append(visits_member)
+            readers.append((qtable_member, qtable_dtype,
+                           scale, visits_member, visits_dtype))
+        yield shape
+        for _ in range(shape[0]):
+            qtable_slices = []
+            visit_slices = []
+            for qtable_member, qtable_dtype, scale, visits_member, visits_dtype in readers:
+                qtable_slice = _read_slice(
+                    qtable_member, shape, qtable_dtype).astype(float)
+                if scale is not None:
+                    qtable_slice *= scale
+                qtable_slices.append(qtable_slice)
+                # Without visits, every q value other than 0.0 counts as one visit.
+                visit_slices.append(_read_slice(visits_member, shape, visits_dtype) if visits_member is not None else (
+                    qtable_slice != 0.0).astype(np.uint32))
+            yield (_merge_slice(qtable_slices, visit_slices, strategy),
+                   np.minimum(np.sum(visit_slices, axis=0, dtype=np.uint64), np.iinfo(np.uint32).max).astype(np.uint32))
+    finally:
+        for member in members:
+            member.close()
+
+
+def merge_qtable_pairs(paths: list, output: str, strategy: str = 'weighted', dtype: str = QTABLE_DTYPE):
+    """
+    Merges q-table pairs trained on several machines into one q-table pair, which can be loaded by Exhibition.laod_qtable_pair.
+    The q-tables are read and written slice by slice (one rho at a time), so only a few slices are in memory at once.
+    The visits of every state and action combination are read from the optional arrays FORWARD_VISITS and BACKWARD_VISITS,
+    without visits every q value other than 0.0 counts as one visit. The merged q-table pair contains the sum of the visits.
+    A zip file can only write one array at once, so the q-tables are read twice, once for the q values and once for the visits.
+
+    Parameter
+    ---------
+    paths: list
+        Paths of the .npz files of the q-table pairs.
+    output: str
+        Path of the merged .npz file.
+    strategy: str
+        One of MERGE_STRATEGIES, by default 'weighted'.
+    dtype: str
+        Data type of the merged q-tables, by default QTABLE_DTYPE.
+    """
+    if strategy not in MERGE_STRATEGIES:
+        raise ValueError('Unsupported merge strategy {0}, use one of {1}'.format(
+            strategy, ', '.join(MERGE_STRATEGIES)))
+    dtype = np.dtype(check_dtype(dtype))
+    # Scale of an int16 result, the maximal q value of the result is not known before merging.
+    output_scale = QTABLE_INT16_LIMIT / INT16_MAXIMUM if dtype == np.int16 else None
+    input_files = [zipfile.ZipFile(path) for path in paths]
+    try:
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as output_file:
+            for parking_direction in Parkingdirection:
+                for key, array_dtype in ((parking_direction.name, dtype), ('{}_VISITS'.format(parking_direction.name), np.dtype(np.uint32))):
+                    merged_slices = _merged_slices(
+                        input_files, paths, parking_direction, strategy)
+                    shape = next(merged_slices)
+                    with output_file.open('{}.npy'.format(key), 'w', force_zip64=True) as array_output:
+                        np.lib.format.write_array_header_2_0(array_output, {
+                            'descr': np.lib.format.dtype_to_descr(array_dtype), 'fortran_order': False, 'shape': shape})
+                        for merged, visits in merged_slices:
+                            if array_dtype == np.uint32:
+                                array_output.write(visits.tobytes())
+                            else:
+                                array_output.write(encode_qtable(
+                                    merged, dtype.name, output_scale)[0].tobytes())
+                if output_scale is not None:
+                    with output_file.open('{}_SCALE.npy'.format(parking_direction.name), 'w') as scale_output:
+                        np.lib.format.write_array(
+                            scale_output, np.array(output_scale))
+    finally:
+        for input_file in input_files:
+            input_file.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Merges q-table pairs trained on several machines into one q-table pair.')
+    parser.add_argument('output', help='Name of the merged q-table pair.')
+    parser.add_argument('inputs', nargs='+',
+                        help='Names of the merged q-table pairs.')
+    parser.add_argument('--strategy', choices=MERGE_STRATEGIES, default='weighted',
+                        help='weighted averages the q values by the visits, max takes the biggest visited q value, most-visited takes the q value of the q-table with the most visits.')
+    parser.add_argument('--dtype', default=QTABLE_DTYPE,
+                        help='Data type of the merged q-tables, by default QTABLE_DTYPE.')
+    arguments = parser.parse_args()
+    start_time = datetime.datetime.now()
+    merge_qtable_pairs(['./{}.npz'.format(name) for name in arguments.inputs], './{}.npz'.format(
+        arguments.output), strategy=arguments.strategy, dtype=arguments.dtype)
+    print('Merged {0} q-table pairs in {1}'.format(
+        len(arguments.inputs), datetime.datetime.now() - start_time))
+
+# Original Author: Lukas Loeffler
@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+import argparse
+import datetime
+
+import numpy as np
+
+from parking_learner import ParkingLearner
+from parkingdirection import Parkingdirection
+from transition_table import TransitionTable
+from qtable_storage import save_qtable_pair
+
+from constants import SOLVER_TOLERANCE, SOLVER_MAXIMAL_SWEEPS
+
+
+class QTableSolver:
+    """
+    Calculates a complete q-table with the known model of the parking learner, instead of learning it with random exploration.
+    Runs synchronous q-iteration over the whole q-table: every sweep sets the q value of every state and action combination to
+    the reward plus y times the maximal q value of the next state, like the update of ParkingLearner.simulated_parking with alpha = 1.
+    The q-table of random exploration converges to the same values, so the solved q-table can be used to utilize or to continue exploring.
+    """
+
+    def __init__(self, parking_learner: ParkingLearner, transition_table: TransitionTable = None):
+        """
+        Creates a new solver for the parking direction and y of the given parking learner.
+
+        Parameter
+        ---------
+        parking_learner: ParkingLearner
+            The parking learner, whose parking direction and y are used.
+        transition_table: TransitionTable
+            The precomputed kinematic model, by default the cached transition table of the current geometry and the state resolution of the parking learner.
+        """
+        self._parking_learner = parking_learner
+        self._transition_table = transition_table if transition_table is not None else TransitionTable.load(
+            resolution=parking_learner._resolution)
+        self._number_of_actions = int(
+            np.prod(self._transition_table.action_shape))
+        self._number_of_states = int(
+            np.prod(self._transition_table.state_shape))
+        # Next states outside of the q-table point to an additional state with the value -100.0.
+        self._next_state = self._transition_table.flat_next_state().astype(np.intp)
+        self._next_state[self._transition_table.leaves_table()] = self._number_of_states
+        self._reward = parking_learner.reward_table(
+            self._transition_table).reshape(-1).astype(float)
+
+    def solve(self, tolerance: float = SOLVER_TOLERANCE, maximal_sweeps: int = SOLVER_MAXIMAL_SWEEPS, verbose: bool = False) -> tuple:
+        """
+        Runs q-iteration until the q values change less than the tolerance.
+        The change of the q values of the next sweep is at most y times the change of the state values (maximal q value of a state) of the last sweep,
+        so the state values are compared, which is much cheaper than comparing the whole q-table.
+
+        Parameter
+        ---------
+        tolerance: float
+            Stops if no q value will change more than tolerance, by default SOLVER_TOLERANCE.
+        maximal_sweeps: int
+            Stops after this number of sweeps, even if not converged, by default SOLVER_MAXIMAL_SWEEPS.
+        verbose: bool
+            If true, prints the change of every sweep.
+
+        Returns
+        -------
+        tuple: The solved q-table with the shape of the transition table, the number of sweeps and the maximal q value change of the last sweep.
+        """
+        y = self._parking_learner._y
+        qtable = np.zeros(shape=self._next_state.shape, dtype=float)
+        # Maximal q value of every state, plus the additional state outside of the q-table.
+        state_value = np.full(shape=self._number_of_states + 1, fill_value=-100.0)
+        state_value[:-1] = 0.0
+        delta = np.inf
+        sweeps = 0
+        while sweeps < maximal_sweeps and delta >= tolerance:
+            np.take(state_value, self._next_state, out=qtable, mode='clip')
+            qtable *= y
+            qtable += self._reward
+            new_state_value = qtable.reshape(-1, self._number_of_actions).max(axis=1)
+            delta = y * np.max(np.abs(new_state_value - state_value[:-1]))
+            state_value[:-1] = new_state_value
+            sweeps += 1
+            if verbose:
+                print('Sweep {0}: maximal change {1}'.format(sweeps, delta))
+        return (qtable.reshape(self._transition_table.next_rho.shape), sweeps, delta)
+
+
+def solve_qtable_pair(name: str, y: float = 0.95, tolerance: float = SOLVER_TOLERANCE, maximal_sweeps: int = SOLVER_MAXIMAL_SWEEPS, verbose: bool = False) -> dict:
+    """
+    Solves the q-tables for parking forward and backward and saves them in QTABLE_DTYPE like Exhibition.save_qtable.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair file without file extension.
+    y: float
+        The y of the parking learner, by default 0.95.
+    tolerance: float
+        Convergence tolerance, by default SOLVER_TOLERANCE.
+    maximal_sweeps: int
+        Maximal number of sweeps per q-table, by default SOLVER_MAXIMAL_SWEEPS.
+    verbose: bool
+        If true, prints the change of every sweep.
+
+    Returns
+    -------
+    dict: The solved q-table pair, keyed by Parkingdirection.
+    """
+    transition_table = TransitionTable.load()
+    qtable_pair = {}
+    for parking_direction in Parkingdirection:
+        start_time = datetime.datetime.now()
+        parking_learner = ParkingLearner(
+            bot=None, y=y, parkingdirection=parking_direction)
+        qtable, sweeps, delta = QTableSolver(parking_learner, transition_table).solve(
+            tolerance=tolerance, maximal_sweeps=maximal_sweeps, verbose=verbose)
+        qtable_pair[parking_direction] = qtable
+        print('Solved {0} in {1} sweeps, last change {2}, in {3}'.format(
+            parking_direction.name, sweeps, delta, datetime.datetime.now() - start_time))
+    save_qtable_pair(name, qtable_pair)
+    return qtable_pair
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Calculates a complete q-table pair with q-iteration over the simulator model.')
+    parser.add_argument('name', nargs='?', default='default',
+                        help='Name of the q-table pair file without file extension, by default "default".')
+    parser.add_argument('--y', type=float, default=0.95,
+                        help='The y of the q-learning, by default 0.95.')
+    parser.add_argument('--tolerance', type=float, default=SOLVER_TOLERANCE,
+                        help='Stops if no q value changes more than this value in a sweep.')
+    parser.add_argument('--sweeps', type=int, default=SOLVER_MAXIMAL_SWEEPS,
+                        help='Maximal number of sweeps per q-table.')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Prints the change of every sweep.')
+    arguments = parser.parse_args()
+    solve_qtable_pair(name=arguments.name, y=arguments.y, tolerance=arguments.tolerance,
+                      maximal_sweeps=arguments.sweeps, verbose=arguments.verbose)
+
+# Original Author: Lukas Loeffler
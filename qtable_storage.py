@@ -0,0 +1,556 @@
+#!/usr/bin/python3
+import os
+import json
+import argparse
+
+from os.path import isfile, isdir
+
+import numpy as np
+
+from parkingdirection import Parkingdirection
+from sparse_qtable import SparseQTable
+
+from constants import QTABLE_MMAP_DIRECTORY, QTABLE_DTYPE, QTABLE_INT16_LIMIT, SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH
+
+QTABLE_DTYPES = ('float64', 'float32', 'float16', 'int16')
+"""
+tuple[str]:
+Supported data types of q-tables.
+int16 q-tables are scaled, the q value is the stored integer times the scale of the q-table.
+"""
+
+INT16_MAXIMUM = 32767
+"""
+int:
+Biggest absolute value stored in a scaled int16 q-table.
+"""
+
+VISITS_DTYPE = 'uint32'
+"""
+str:
+Data type of the visit counts of the state and action combinations, saved as FORWARD_VISITS and BACKWARD_VISITS next to the q-tables.
+"""
+
+MANIFEST_FILE = 'manifest.json'
+"""
+str:
+Name of the manifest file of a memory mapped q-table pair.
+"""
+
+MANIFEST_VERSION = 2
+"""
+int:
+Version of the manifest format.
+Version 2 lists the files of the q-table pair, every save writes new files and the manifest references them, when all are written.
+"""
+
+
+def check_dtype(dtype: str) -> str:
+    """
+    Checks if the data type is supported for q-tables.
+
+    Parameter
+    ---------
+    dtype: str
+        Name of the data type.
+
+    Returns
+    -------
+    str: The name of the data type.
+    """
+    if str(dtype) not in QTABLE_DTYPES:
+        raise ValueError('Unsupported q-table dtype {0}, use one of {1}'.format(
+            dtype, ', '.join(QTABLE_DTYPES)))
+    return str(dtype)
+
+
+def empty_qtable(dtype: str = QTABLE_DTYPE, shape: tuple = (SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH)) -> tuple:
+    """
+    Creates a new q-table filled with zeros.
+
+    Parameter
+    ---------
+    dtype: str
+        Data type of the q-table, by default QTABLE_DTYPE.
+    shape: tuple
+        Shape of the q-table, by default the shape of the state and action space in constants.py.
+
+    Returns
+    -------
+    tuple: The q-table and its scale, the scale is None if the q-table is not int16.
+    """
+    dtype = check_dtype(dtype)
+    scale = QTABLE_INT16_LIMIT / INT16_MAXIMUM if dtype == 'int16' else None
+    return (np.zeros(shape=shape, dtype=dtype), scale)
+
+
+def empty_visits(shape: tuple = (SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH)) -> np.ndarray:
+    """
+    Creates new visit counts filled with zeros.
+
+    Parameter
+    ---------
+    shape: tuple
+        Shape of the q-table, by default the shape of the state and action space in constants.py.
+
+    Returns
+    -------
+    numpy.ndarray: The visit counts, dtype VISITS_DTYPE.
+    """
+    return np.zeros(shape=shape, dtype=VISITS_DTYPE)
+
+
+def encode_qtable(qtable: np.ndarray, dtype: str = QTABLE_DTYPE, scale: float = None) -> tuple:
+    """
+    Converts a float q-table into the given data type.
+
+    Parameter
+    ---------
+    qtable: numpy.ndarray
+        The q-table with float values.
+    dtype: str
+        Data type of the result, by default QTABLE_DTYPE.
+    scale: float
+        Scale of an int16 result. By default the scale is chosen, so that the biggest absolute q value and QTABLE_INT16_LIMIT fit.
+
+    Returns
+    -------
+    tuple: The converted q-table and its scale, the scale is None if the q-table is not int16.
+    """
+    dtype = check_dtype(dtype)
+    if dtype != 'int16':
+        return (qtable.astype(dtype), None)
+    if scale is None:
+        scale = max(float(np.max(np.abs(qtable))) if qtable.size > 0 else 0.0,
+                    QTABLE_INT16_LIMIT) / INT16_MAXIMUM
+    return (np.clip(np.rint(qtable / scale), -INT16_MAXIMUM, INT16_MAXIMUM).astype(np.int16), scale)
+
+
+def decode_qtable(qtable: np.ndarray, scale: float = None, dtype: str = 'float64') -> np.ndarray:
+    """
+    Converts a q-table of any supported data type into float values.
+
+    Parameter
+    ---------
+    qtable: numpy.ndarray
+        The q-table.
+    scale: float
+        Scale of an int16 q-table, None for float q-tables.
+    dtype: str
+        Float data type of the result, by default float64.
+
+    Returns
+    -------
+    numpy.ndarray: The q-table with float values.
+    """
+    if scale is None:
+        return qtable.astype(dtype)
+    return (qtable * scale).astype(dtype)
+
+
+def convert_qtable(qtable: np.ndarray, scale: float = None, dtype: str = QTABLE_DTYPE) -> tuple:
+    """
+    Converts a q-table of any supported data type into the given data type.
+    Returns the q-table itself, if it already has the data type. Sparse q-tables are converted into dense q-tables.
+
+    Parameter
+    ---------
+    qtable: numpy.ndarray
+        The q-table.
+    scale: float
+        Scale of an int16 q-table, None for float q-tables.
+    dtype: str
+        Data type of the result, by default QTABLE_DTYPE.
+
+    Returns
+    -------
+    tuple: The converted q-table and its scale, the scale is None if the q-table is not int16.
+    """
+    dtype = check_dtype(dtype)
+    if isinstance(qtable, SparseQTable):
+        qtable = qtable.to_dense()
+    if qtable.dtype == np.dtype(dtype):
+        return (qtable, scale)
+    return encode_qtable(decode_qtable(qtable, scale), dtype)
+
+
+def load_qtable_pair(path: str, dtype: str = QTABLE_DTYPE) -> tuple:
+    """
+    Loads a q-table pair from an .npz file and converts it into the given data type.
+    Files saved before the data type was selectable contain float64 q-tables, they are converted like every other file.
+
+    Parameter
+    ---------
+    path: str
+        Path of the .npz file.
+    dtype: str
+        Data type of the loaded q-tables, by default QTABLE_DTYPE.
+
+    Returns
+    -------
+    tuple: Dictionary of q-tables and dictionary of scales, both keyed by Parkingdirection.
+    """
+    qtable_pair = {}
+    scale_pair = {}
+    with np.load(path, allow_pickle=True) as data:
+        for parking_direction in Parkingdirection:
+            scale_key = '{}_SCALE'.format(parking_direction.name)
+            scale = float(data[scale_key]) if scale_key in data.files else None
+            qtable_pair[parking_direction], scale_pair[parking_direction] = convert_qtable(
+                data[parking_direction.name], scale, dtype)
+    return (qtable_pair, scale_pair)
+
+
+def save_qtable_pair(name: str, qtable_pair: dict, scale_pair: dict = None, dtype: str = QTABLE_DTYPE, visit_pair: dict = None):
+    """
+    Saves a q-table pair in the given data type into a compressed .npz file.
+    The scales of int16 q-tables are saved as FORWARD_SCALE and BACKWARD_SCALE next to the q-tables, the visit counts as FORWARD_VISITS and BACKWARD_VISITS.
+
+    Parameter
+    ---------
+    name: str
+        Name or path of the file, '.npz' is appended by numpy if missing.
+    qtable_pair: dict
+        The q-tables keyed by Parkingdirection.
+    scale_pair: dict
+        The scales of the q-tables keyed by Parkingdirection, by default no scales.
+    dtype: str
+        Data type of the saved q-tables, by default QTABLE_DTYPE.
+    visit_pair: dict
+        The visit counts keyed by Parkingdirection, by default no visit counts.
+    """
+    arrays = {}
+    for parking_direction in Parkingdirection:
+        scale = scale_pair[parking_direction] if scale_pair is not None else None
+        qtable, scale = convert_qtable(
+            qtable_pair[parking_direction], scale, dtype)
+        arrays[parking_direction.name] = qtable
+        if scale is not None:
+            arrays['{}_SCALE'.format(parking_direction.name)] = np.array(scale)
+        if visit_pair is not None and visit_pair[parking_direction] is not None:
+            arrays['{}_VISITS'.format(parking_direction.name)] = visit_pair[parking_direction]
+    np.savez_compressed(name, **arrays)
+
+
+def load_visit_pair(path: str, mode: str = 'c') -> dict:
+    """
+    Loads the visit counts saved next to a q-table pair.
+
+    Parameter
+    ---------
+    path: str
+        Path of the .npz file or of the directory of a memory mapped q-table pair.
+    mode: str
+        Memory map mode of the visit counts of a memory mapped q-table pair, by default copy on write.
+
+    Returns
+    -------
+    dict: The visit counts keyed by Parkingdirection, None for a parking direction without visit counts.
+    """
+    visit_pair = {}
+    if isdir(path):
+        files = read_manifest(path)['files']
+        for parking_direction in Parkingdirection:
+            visits_key = '{}_VISITS'.format(parking_direction.name)
+            visit_pair[parking_direction] = np.load('{0}/{1}'.format(path, files[visits_key]),
+                                                    mmap_mode=mode) if visits_key in files else None
+        return visit_pair
+    with np.load(path) as data:
+        for parking_direction in Parkingdirection:
+            visits_key = '{}_VISITS'.format(parking_direction.name)
+            visit_pair[parking_direction] = data[visits_key] if visits_key in data.files else None
+    return visit_pair
+
+
+def qtable_mmap_directory(name: str) -> str:
+    """
+    Returns the directory of a memory mapped q-table pair.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair.
+
+    Returns
+    -------
+    str: Path of the directory.
+    """
+    return QTABLE_MMAP_DIRECTORY.format(name)
+
+
+def has_qtable_pair_mmap(name: str) -> bool:
+    """
+    Checks if a memory mapped q-table pair with the given name exists.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair.
+
+    Returns
+    -------
+    bool: True if the manifest of the q-table pair exists.
+    """
+    return isfile('{0}/{1}'.format(qtable_mmap_directory(name), MANIFEST_FILE))
+
+
+def read_manifest(directory: str) -> dict:
+    """
+    Reads the manifest of a memory mapped q-table pair and checks, that all files it references exist.
+    The files of a manifest of version 1 are named after the parking direction, like FORWARD.npy and FORWARD_VISITS.npy.
+
+    Parameter
+    ---------
+    directory: str
+        Directory of the memory mapped q-table pair.
+
+    Returns
+    -------
+    dict: The manifest with the data type, the shape, the scales and the file names keyed by FORWARD, BACKWARD, FORWARD_VISITS and BACKWARD_VISITS.
+    """
+    with open('{0}/{1}'.format(directory, MANIFEST_FILE)) as manifest_file:
+        manifest = json.loads(manifest_file.read())
+    if manifest['version'] > MANIFEST_VERSION:
+        raise ValueError('Unsupported q-table manifest version {}'.format(
+            manifest['version']))
+    if 'files' not in manifest:
+        manifest['files'] = {}
+        for parking_direction in Parkingdirection:
+            for key in (parking_direction.name, '{}_VISITS'.format(parking_direction.name)):
+                if key == parking_direction.name or isfile('{0}/{1}.npy'.format(directory, key)):
+                    manifest['files'][key] = '{}.npy'.format(key)
+    for file_name in manifest['files'].values():
+        if not isfile('{0}/{1}'.format(directory, file_name)):
+            raise FileNotFoundError('{0}/{1} of the q-table manifest is missing'.format(
+                directory, file_name))
+    return manifest
+
+
+def _write_synced(path: str, write_function):
+    """
+    Writes a file into a temporary file, syncs it to the disk and renames it to the path.
+    Existing memory maps of the old file stay valid, because the old file is replaced and not overwritten.
+
+    Parameter
+    ---------
+    path: str
+        Path of the file.
+    write_function: function
+        Function writing the content into the given file object.
+    """
+    temporary_path = '{}.tmp'.format(path)
+    with open(temporary_path, 'wb') as file:
+        write_function(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def save_qtable_pair_mmap(name: str, qtable_pair: dict, scale_pair: dict = None, dtype: str = QTABLE_DTYPE, visit_pair: dict = None):
+    """
+    Saves a q-table pair as uncompressed .npy files plus a small json manifest, which can be memory mapped by open_qtable_pair_mmap.
+    Every save writes new files named after the parking direction and the number of the save, e.g. FORWARD.3.npy, and syncs them to the disk.
+    The manifest referencing them is written last and replaces the old manifest, afterwards the files of the previous save are removed.
+    So a crash during saving leaves the previous q-table pair complete, the manifest never references files of different saves.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair, the files are saved in the directory QTABLE_MMAP_DIRECTORY.
+    qtable_pair: dict
+        The q-tables keyed by Parkingdirection.
+    scale_pair: dict
+        The scales of the q-tables keyed by Parkingdirection, by default no scales.
+    dtype: str
+        Data type of the saved q-tables, by default QTABLE_DTYPE.
+    visit_pair: dict
+        The visit counts keyed by Parkingdirection, saved as <direction>_VISITS.<save>.npy, by default no visit counts.
+    """
+    directory = qtable_mmap_directory(name)
+    if not isdir(directory):
+        os.makedirs(directory)
+    save = 1
+    if isfile('{0}/{1}'.format(directory, MANIFEST_FILE)):
+        with open('{0}/{1}'.format(directory, MANIFEST_FILE)) as manifest_file:
+            save = json.loads(manifest_file.read()).get('save', 0) + 1
+    manifest = {'version': MANIFEST_VERSION, 'save': save,
+                'dtype': check_dtype(dtype), 'scales': {}, 'files': {}}
+    for parking_direction in Parkingdirection:
+        scale = scale_pair[parking_direction] if scale_pair is not None else None
+        qtable, scale = convert_qtable(
+            qtable_pair[parking_direction], scale, dtype)
+        arrays = {parking_direction.name: qtable}
+        if visit_pair is not None and visit_pair[parking_direction] is not None:
+            arrays['{}_VISITS'.format(parking_direction.name)] = visit_pair[parking_direction]
+        for key, array in arrays.items():
+            file_name = '{0}.{1}.npy'.format(key, save)
+            _write_synced('{0}/{1}'.format(directory, file_name),
+                          lambda file: np.save(file, array))
+            manifest['files'][key] = file_name
+        manifest['scales'][parking_direction.name] = scale
+        manifest['shape'] = list(qtable.shape)
+    _write_synced('{0}/{1}'.format(directory, MANIFEST_FILE),
+                  lambda file: file.write(json.dumps(manifest, indent=4).encode('utf-8')))
+    # Memory maps of the removed files stay valid, until they are closed.
+    for file_name in os.listdir(directory):
+        if file_name.endswith(('.npy', '.tmp')) and file_name not in manifest['files'].values():
+            os.remove('{0}/{1}'.format(directory, file_name))
+
+
+def open_qtable_pair_mmap(name: str, mode: str = 'c') -> tuple:
+    """
+    Opens a q-table pair saved by save_qtable_pair_mmap as memory maps.
+    Opening is nearly instant, only the pages of the visited states are read from the disk.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair.
+    mode: str
+        Memory map mode of numpy.load.
+        'c' (default) copy on write, changes stay in memory until the q-table pair is saved.
+        'r+' changes are written into the files, call sync_qtable_pair to flush them.
+        'r' read only.
+
+    Returns
+    -------
+    tuple: Dictionary of memory mapped q-tables and dictionary of scales, both keyed by Parkingdirection.
+    """
+    directory = qtable_mmap_directory(name)
+    manifest = read_manifest(directory)
+    qtable_pair = {}
+    scale_pair = {}
+    for parking_direction in Parkingdirection:
+        qtable_pair[parking_direction] = np.load('{0}/{1}'.format(
+            directory, manifest['files'][parking_direction.name]), mmap_mode=mode)
+        if list(qtable_pair[parking_direction].shape) != manifest['shape'] or str(qtable_pair[parking_direction].dtype) != manifest['dtype']:
+            raise ValueError('{0} q-table of {1} doesn\'t match its manifest'.format(
+                parking_direction.name, directory))
+        scale_pair[parking_direction] = manifest['scales'][parking_direction.name]
+    return (qtable_pair, scale_pair)
+
+
+def load_or_create_qtable_pair(name: str, shape: tuple = (SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH)) -> tuple:
+    """
+    Loads a q-table pair like Exhibition.laod_qtable_pair, without a robot.
+    A memory mapped q-table pair is preferred and loaded into memory, otherwise the .npz file is loaded.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair, None creates a new q-table pair.
+    shape: tuple
+        Shape of the q-tables of a new q-table pair, by default the shape of the state and action sizes in constants.py.
+
+    Returns
+    -------
+    tuple: Dictionary of q-tables and dictionary of scales, both keyed by Parkingdirection.
+    """
+    if name is not None and has_qtable_pair_mmap(name):
+        qtable_pair, scale_pair = open_qtable_pair_mmap(name)
+        for parking_direction in Parkingdirection:
+            qtable_pair[parking_direction], scale_pair[parking_direction] = convert_qtable(
+                qtable_pair[parking_direction], scale_pair[parking_direction])
+        return (qtable_pair, scale_pair)
+    if name is not None and isfile('./{}.npz'.format(name)):
+        return load_qtable_pair('./{}.npz'.format(name))
+    qtable_pair = {}
+    scale_pair = {}
+    for parking_direction in Parkingdirection:
+        qtable_pair[parking_direction], scale_pair[parking_direction] = empty_qtable(
+            shape=shape)
+    return (qtable_pair, scale_pair)
+
+
+def sync_qtable_pair(qtable_pair: dict):
+    """
+    Flushes the changes of memory mapped q-tables opened with mode 'r+' to the disk.
+
+    Parameter
+    ---------
+    qtable_pair: dict
+        The q-tables keyed by Parkingdirection.
+    """
+    for qtable in qtable_pair.values():
+        if isinstance(qtable, np.memmap):
+            qtable.flush()
+
+
+def precision_report(qtable: np.ndarray, dtype: str, scale: float = None) -> dict:
+    """
+    Compares a q-table with its conversion into the given data type.
+
+    Parameter
+    ---------
+    qtable: numpy.ndarray
+        The q-table.
+    dtype: str
+        Data type to compare with.
+    scale: float
+        Scale of an int16 q-table, None for float q-tables.
+
+    Returns
+    -------
+    dict: Memory usage of both q-tables in bytes, saved bytes, maximal absolute error and number of states with a changed best action.
+    """
+    original = decode_qtable(qtable, scale)
+    converted, converted_scale = convert_qtable(qtable, scale, dtype)
+    decoded = decode_qtable(converted, converted_scale)
+    number_of_actions = qtable.shape[-2] * qtable.shape[-1]
+    changed_policy = original.reshape(-1, number_of_actions).argmax(
+        axis=1) != decoded.reshape(-1, number_of_actions).argmax(axis=1)
+    return {
+        'bytes': qtable.nbytes,
+        'converted_bytes': converted.nbytes,
+        'saved_bytes': qtable.nbytes - converted.nbytes,
+        'maximal_error': float(np.max(np.abs(original - decoded))),
+        'changed_policy_states': int(np.count_nonzero(changed_policy))
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Converts q-table pairs between data types and storage formats.')
+    parser.add_argument('command', choices=('report', 'convert', 'import', 'export'),
+                        help='report prints the memory saved and the changed policy of a data type, convert saves the q-table pair in another data type, import converts an .npz file into the memory mapped format and export the memory mapped format into an .npz file.')
+    parser.add_argument('name', help='Name of the q-table pair without file extension.')
+    parser.add_argument('--dtype', default=None, choices=QTABLE_DTYPES,
+                        help='Target data type, by default QTABLE_DTYPE for report and convert and the stored data type for import and export.')
+    parser.add_argument('--output', default=None,
+                        help='Name of the converted q-table pair, by default the name with the dtype appended for convert and the name for import and export.')
+    arguments = parser.parse_args()
+    if arguments.command == 'export':
+        qtable_pair, scale_pair = open_qtable_pair_mmap(arguments.name, mode='r')
+        visit_pair = load_visit_pair(
+            qtable_mmap_directory(arguments.name), mode='r')
+        output = arguments.output if arguments.output is not None else arguments.name
+        save_qtable_pair(output, qtable_pair, scale_pair, dtype=arguments.dtype if arguments.dtype is not None else str(
+            qtable_pair[Parkingdirection.FORWARD].dtype), visit_pair=visit_pair)
+        print('Saved {}.npz'.format(output))
+    else:
+        path = './{}.npz'.format(arguments.name)
+        if not isfile(path):
+            raise FileNotFoundError(path)
+        with np.load(path, allow_pickle=True) as data:
+            stored_dtype = str(data[Parkingdirection.FORWARD.name].dtype)
+        qtable_pair, scale_pair = load_qtable_pair(path, dtype=stored_dtype)
+        visit_pair = load_visit_pair(path)
+        if arguments.command == 'import':
+            output = arguments.output if arguments.output is not None else arguments.name
+            save_qtable_pair_mmap(output, qtable_pair, scale_pair, dtype=arguments.dtype if arguments.dtype is not None else stored_dtype, visit_pair=visit_pair)
+            print('Saved {}'.format(qtable_mmap_directory(output)))
+        else:
+            dtype = arguments.dtype if arguments.dtype is not None else QTABLE_DTYPE
+            for parking_direction in Parkingdirection:
+                report = precision_report(
+                    qtable_pair[parking_direction], dtype, scale_pair[parking_direction])
+                print('{0}: {1} -> {2}, {3} MB -> {4} MB, saved {5} MB, maximal error {6}, changed best action in {7} states'.format(
+                    parking_direction.name, stored_dtype, dtype, report['bytes'] / 1e6, report['converted_bytes'] / 1e6,
+                    report['saved_bytes'] / 1e6, report['maximal_error'], report['changed_policy_states']))
+            if arguments.command == 'convert':
+                output = arguments.output if arguments.output is not None else '{0}_{1}'.format(
+                    arguments.name, dtype)
+                save_qtable_pair(output, qtable_pair, scale_pair, dtype=dtype, visit_pair=visit_pair)
+                print('Saved {}.npz'.format(output))
+
+# Original Author: Lukas Loeffler
@@ -3,7 +3,6 @@ import sys
 import traceback
 import datetime
 
-from random import randint
 from json import loads
 from re import compile
 from time import sleep
@@ -13,30 +12,51 @@ from os import system, name
 import numpy as np
 
 from parking_learner import ParkingLearner
+from batch_simulator import BatchSimulator
+from training_metrics import TrainingMonitor
+from checkpoint import Checkpointer, load_checkpoint
 from parkingdirection import Parkingdirection
 from print_logo import PrintLogo
 
+from coverage import CoverageStartSampler
 from exhibition import Exhibition
 
-from constants import DISPLAY_CONFIRMATION_SLEEP_TIME, NUMBER_OF_SIMULATIONS, SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH
+from constants import DISPLAY_CONFIRMATION_SLEEP_TIME, NUMBER_OF_SIMULATIONS, RANDOM_SEED, TRACK_VISITS, COVERAGE_START
 
 
 class Simulator(Exhibition):
     """
     A class to simulate the exhibiton parking application.
     """
+    # The batched and parallel simulators and the training metrics need dense q-tables.
+    qtable_backend = 'dense'
+    track_visits = TRACK_VISITS
 
-    def __init__(self, random_start: bool = False):
+    def __init__(self, random_start: bool = False, batch: bool = False, parallel: bool = False, resume: bool = False):
         """
-        Calls __init__ function of parent class and sets additional random start attribute.
+        Calls __init__ function of parent class and sets additional random start and batch attributes.
 
         Parameter
         ---------
         random_start: bool
             If the commandline argument random_start is set, the start function will generate random start positions.
+        batch: bool
+            If the commandline argument batch is set, the start function simulates many episodes in lockstep with the BatchSimulator.
+        parallel: bool
+            If the commandline argument parallel is set, the start function simulates the episodes in SIMULATION_WORKERS processes with the ParallelSimulator.
+        resume: bool
+            If the commandline argument resume is set, the first start continues the training from the latest checkpoint.
         """
         super().__init__()
         self._random_start = random_start
+        self._batch = batch
+        self._parallel = parallel
+        self._resume = resume
+        # Every random number generator gets its own seed, spawned from RANDOM_SEED.
+        self._seed_sequence = np.random.SeedSequence(RANDOM_SEED)
+        self._parking_learner.set_seed(self._seed_sequence.spawn(1)[0])
+        self._start_generator = np.random.default_rng(
+            self._seed_sequence.spawn(1)[0])
         self._execution_time = None
 
     def main(self, administrator_mode: bool = False, park_lot_detection: bool = False):
@@ -112,6 +132,10 @@ class Simulator(Exhibition):
     def start(self, random_start: bool = False):
         """
         Start simulation parking process to learn and fill a q-table.
+        Writes training metrics every METRICS_INTERVAL episodes and stops early, if the greedy policy is stable for EARLY_STOP_INTERVALS intervals.
+        The parallel simulator runs without metrics.
+        Without batch and parallel, a checkpoint is saved every CHECKPOINT_EPISODES episodes or CHECKPOINT_SECONDS seconds, to resume the training after a crash.
+        If COVERAGE_START is true, random start states are drawn weighted towards rarely visited states, except by the parallel simulator.
 
         Parameter
         ---------
@@ -126,36 +150,125 @@ class Simulator(Exhibition):
         """
         print("Start simulation")
         start_time = datetime.datetime.now()
+        if self._parallel:
+            # Imported here, because multiprocessing.shared_memory needs python 3.8 or newer.
+            from parallel_simulator import ParallelSimulator
+            steps = ParallelSimulator(self._parking_learner).run(
+                number_of_episodes=NUMBER_OF_SIMULATIONS, random_start=random_start, seed=self._seed_sequence.spawn(1)[0])
+            # The parallel simulator writes the q-table directly, so the greedy policy of all states is refreshed.
+            self._parking_learner.refresh_policy(all_states=True)
+            end_time = datetime.datetime.now()
+            print("Finished similation of {} episodes with {} steps in {}".format(
+                NUMBER_OF_SIMULATIONS, steps, end_time - start_time))
+            sleep(DISPLAY_CONFIRMATION_SLEEP_TIME)
+            return end_time - start_time
+        if self._batch:
+            monitor = TrainingMonitor(
+                self._parking_learner._qtable, self._parking_learner._qtable_scale)
+            steps = BatchSimulator(self._parking_learner).run(
+                number_of_episodes=NUMBER_OF_SIMULATIONS, random_start=random_start, seed=self._seed_sequence.spawn(1)[0], monitor=monitor, start_sampler=self.start_sampler())
+            # The batch simulator writes the q-table directly, so the greedy policy of all states is refreshed.
+            self._parking_learner.refresh_policy(all_states=True)
+            end_time = datetime.datetime.now()
+            print("Finished similation of {} episodes with {} steps in {}".format(
+                monitor.episodes, steps, end_time - start_time))
+            sleep(DISPLAY_CONFIRMATION_SLEEP_TIME)
+            return end_time - start_time
+        first_simulation = 0
+        if self._resume:
+            first_simulation = self.resume_checkpoint()
+            self._resume = False
+        # Created after resuming, because the checkpoint replaces the q-table of the parking learner.
+        monitor = TrainingMonitor(
+            self._parking_learner._qtable, self._parking_learner._qtable_scale)
+        checkpointer = Checkpointer(self.config['qtable_name'])
+        start_sampler = self.start_sampler()
         # To change the number of runs, change to number in the following line.
-        for x in range(NUMBER_OF_SIMULATIONS):
-            if random_start:
-                start_distance = randint(0, SIZE_STATE_RHO - 1)
-                start_angle = randint(0, SIZE_STATE_PHI - 1)
-                start_orientation = randint(0, SIZE_STATE_ORIENTATION - 1)
+        for x in range(first_simulation, NUMBER_OF_SIMULATIONS):
+            if random_start and start_sampler is not None:
+                (start_distance, start_angle,
+                 start_orientation) = start_sampler.sample_state()
+            elif random_start:
+                (start_distance, start_angle, start_orientation) = self._start_generator.integers(
+                    0, self._parking_learner._resolution.shape).tolist()
             else:
-                start_distance = 15
-                start_angle = 0
-                start_orientation = 18
+                (start_distance, start_angle, start_orientation) = self._parking_learner._resolution.base_state(
+                    15, 0, 18)
             single_start_execution_time = datetime.datetime.now()
             print("Running simulation number {}".format(x + 1))
-            self._parking_learner.simulated_start(
+            steps, parked, truncated = self._parking_learner.simulated_start(
                 distance=start_distance, angle=start_angle, orientation=start_orientation)
             single_end_execution_time = datetime.datetime.now()
             print("Finished simulation number {} in {}".format(
                 x + 1, single_end_execution_time - single_start_execution_time))
+            monitor.record(episodes=1, steps=steps,
+                           parked=int(parked), truncated=int(truncated))
+            if checkpointer.due(x + 1):
+                checkpointer.save(self._qtable_pair, self._qtable_scale_pair, x + 1, {
+                    'start': self._start_generator.bit_generator.state,
+                    'actions': self._parking_learner._action_sampler.get_state()
+                }, self._parking_learner._exploration_counter, self._visit_pair)
+            # Stops early, if the greedy policy is stable.
+            if monitor.interval_finished() and monitor.log():
+                print("Greedy policy stable, stopped after {} simulations".format(x + 1))
+                break
+        monitor.finish()
+        checkpointer.wait()
         end_time = datetime.datetime.now()
         print("Finished similation in {}".format(end_time - start_time))
         sleep(DISPLAY_CONFIRMATION_SLEEP_TIME)
         return end_time - start_time
 
+    def start_sampler(self) -> CoverageStartSampler:
+        """
+        Creates the sampler of the random start states, which prefers rarely visited states.
+        It uses the start state random number generator, so the start states of a resumed training continue like the start states of an uninterrupted training,
+        but the weights are recalculated from the restored visit counts.
+
+        Returns
+        -------
+        CoverageStartSampler: The sampler, None if COVERAGE_START is false or the visits are not counted.
+        """
+        if not COVERAGE_START or self._parking_learner._visits is None:
+            return None
+        return CoverageStartSampler(self._parking_learner._visits, seed=self._start_generator)
+
+    def resume_checkpoint(self) -> int:
+        """
+        Loads the latest checkpoint of the current q-table pair and restores the random number generators and the exploration counter.
+
+        Returns
+        -------
+        int: Number of episodes finished before the checkpoint, 0 if no checkpoint exists.
+        """
+        checkpoint = load_checkpoint(self.config['qtable_name'])
+        if checkpoint is None:
+            print("No checkpoint found, start new simulation")
+            return 0
+        qtable_pair, scale_pair, visit_pair, state = checkpoint
+        self.set_qtable_pair(qtable_pair, scale_pair, visit_pair=visit_pair)
+        self._start_generator.bit_generator.state = state['random_state']['start']
+        self._parking_learner._action_sampler.set_state(
+            state['random_state']['actions'])
+        self._parking_learner._exploration_counter = state['exploration_counter']
+        print("Resume simulation after {} episodes".format(state['episode']))
+        return state['episode']
+
 
 if __name__ == '__main__':
     try:
         # Checks for random_start in comandline arguments.
         random_start = True if 'random_start' in sys.argv[
             1:] or 'random' in sys.argv[1:] else False
+        # Checks for batch in comandline arguments.
+        batch = True if 'batch' in sys.argv[1:] else False
+        # Checks for parallel in comandline arguments.
+        parallel = True if 'parallel' in sys.argv[1:] else False
+        # Checks for resume in comandline arguments.
+        resume = True if 'resume' in sys.argv[1:] else False
         # Generates simulator instance.
-        runner = Simulator(random_start=random_start)
+        runner = Simulator(random_start=random_start,
+                           batch=batch, parallel=parallel, resume=resume)
         # Executes simulation.
         runner.main(administrator_mode=True)
     except Exception as exception:
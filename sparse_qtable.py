@@ -0,0 +1,149 @@
+import numpy as np
+
+from constants import QTABLE_DTYPE, SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH
+
+
+class SparseQTable:
+    """
+    Q-table, which stores only the action blocks of states with q values, instead of the whole state grid.
+    A dictionary maps the packed state index to a row of a block array with shape=(rows, direction, length), which grows when new states get q values.
+    States without a row have only q values of 0.0, so most of the 61 x 36 x 36 states never visited from realistic start positions need no memory.
+    It is indexed like a dense q-table with a state (rho, phi, orientation) or a state and action combination (rho, phi, orientation, direction, length).
+    """
+
+    def __init__(self, shape: tuple = (SIZE_STATE_RHO, SIZE_STATE_PHI, SIZE_STATE_ORIENTATION, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH), dtype: str = QTABLE_DTYPE, capacity: int = 1024):
+        """
+        Creates a new sparse q-table without q values.
+
+        Parameter
+        ---------
+        shape: tuple
+            Shape of the equal dense q-table, by default the shape of the state and action space in constants.py.
+        dtype: str
+            Data type of the q values, by default QTABLE_DTYPE.
+        capacity: int
+            Number of states, memory is reserved for at the beginning.
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._rows = {}
+        self._blocks = np.zeros(
+            shape=(max(1, capacity),) + self.shape[3:], dtype=self.dtype)
+        self._empty_block = np.zeros(shape=self.shape[3:], dtype=self.dtype)
+        self._empty_block.flags.writeable = False
+
+    def _state_index(self, rho: int, phi: int, orientation: int) -> int:
+        """
+        Packs a state into one integer.
+        """
+        return (int(rho) * self.shape[1] + int(phi)) * self.shape[2] + int(orientation)
+
+    def _row(self, state_index: int) -> int:
+        """
+        Returns the row of a state, creates a new row if the state has no row.
+        """
+        row = self._rows.get(state_index)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._blocks):
+                # Doubles the block array, so adding states needs amortized constant time.
+                blocks = np.zeros(
+                    shape=(2 * len(self._blocks),) + self.shape[3:], dtype=self.dtype)
+                blocks[:len(self._blocks)] = self._blocks
+                self._blocks = blocks
+            self._rows[state_index] = row
+        return row
+
+    def __getitem__(self, index: tuple):
+        """
+        Returns the action block of a state, or the q value of a state and action combination.
+        The action block of a state without row is read only.
+        """
+        row = self._rows.get(self._state_index(*index[:3]))
+        block = self._empty_block if row is None else self._blocks[row]
+        return block if len(index) == 3 else block[index[3:]]
+
+    def __setitem__(self, index: tuple, value):
+        """
+        Sets the action block of a state, or the q value of a state and action combination.
+        """
+        row = self._row(self._state_index(*index[:3]))
+        if len(index) == 3:
+            self._blocks[row] = value
+        else:
+            self._blocks[row][index[3:]] = value
+
+    def __len__(self) -> int:
+        """
+        Returns
+        -------
+        int: The number of states with a row.
+        """
+        return len(self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns
+        -------
+        int: The number of bytes of the block array.
+        """
+        return self._blocks.nbytes
+
+    def compact(self):
+        """
+        Frees the reserved memory of the block array, which is not used by a state.
+        """
+        self._blocks = self._blocks[:max(1, len(self._rows))].copy()
+
+    def states(self) -> list:
+        """
+        Returns
+        -------
+        list: The states (rho, phi, orientation) with a row.
+        """
+        return [np.unravel_index(state_index, self.shape[:3]) for state_index in self._rows]
+
+    def to_dense(self) -> np.ndarray:
+        """
+        Converts the sparse q-table into a dense q-table.
+
+        Returns
+        -------
+        numpy.ndarray: The dense q-table.
+        """
+        dense = np.zeros(shape=self.shape, dtype=self.dtype)
+        if len(self._rows) > 0:
+            state_indices = np.fromiter(
+                self._rows.keys(), dtype=np.int64, count=len(self._rows))
+            rows = np.fromiter(self._rows.values(),
+                               dtype=np.int64, count=len(self._rows))
+            dense.reshape((-1,) + self.shape[3:])[state_indices] = self._blocks[rows]
+        return dense
+
+    @staticmethod
+    def from_dense(dense: np.ndarray):
+        """
+        Converts a dense q-table into a sparse q-table, only states with a q value other than 0.0 get a row.
+        The dense q-table is read slice by slice, so a memory mapped q-table is never loaded completely.
+
+        Parameter
+        ---------
+        dense: numpy.ndarray
+            The dense q-table.
+
+        Returns
+        -------
+        SparseQTable: The sparse q-table.
+        """
+        sparse_qtable = SparseQTable(shape=dense.shape, dtype=dense.dtype)
+        states_per_rho = dense.shape[1] * dense.shape[2]
+        for rho in range(dense.shape[0]):
+            blocks = np.asarray(dense[rho]).reshape((-1,) + dense.shape[3:])
+            for state_index in np.flatnonzero(blocks.reshape(len(blocks), -1).any(axis=1)):
+                row = sparse_qtable._row(rho * states_per_rho + int(state_index))
+                sparse_qtable._blocks[row] = blocks[state_index]
+        sparse_qtable.compact()
+        return sparse_qtable
+
+# Original Author: Lukas Loeffler
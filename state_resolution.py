@@ -0,0 +1,276 @@
+#!/usr/bin/python3
+import argparse
+
+import numpy as np
+
+from parkingdirection import Parkingdirection
+from qtable_storage import load_qtable_pair, load_visit_pair, save_qtable_pair
+
+from constants import MAXIMAL_DISTANCE_TO_PARKING_LOT, STATE_RHO_STEP, STATE_ANGLE_STEP, STATE_ROUNDING_DECIMALS
+
+BASE_RHO_STEP = 1.0
+"""
+float:
+Rho step of the base resolution in centimeter (cm).
+Positions like the parking position in constants.py and the default start state (15, 0, 18) are given in the base resolution.
+"""
+
+BASE_ANGLE_STEP = 10.0
+"""
+float:
+Phi and orientation step of the base resolution in degree, e.g. 180 degree is saved as 18.
+"""
+
+
+class StateResolution:
+    """
+    Size of the bins, the relative position of the robot to the parking lot is rounded to.
+    Rho is cut off to full rho steps, phi and orientation are rounded to the nearest angle step.
+    The default resolution with 1 cm and 10 degree steps has 61 x 36 x 36 states, a coarser resolution trains faster, a finer one parks more precise.
+    """
+
+    def __init__(self, rho_step: float = STATE_RHO_STEP, angle_step: float = STATE_ANGLE_STEP):
+        """
+        Creates a new state resolution.
+
+        Parameter
+        ---------
+        rho_step: float
+            Rho step in centimeter (cm), MAXIMAL_DISTANCE_TO_PARKING_LOT must be a multiple of it. By default STATE_RHO_STEP.
+        angle_step: float
+            Phi and orientation step in degree, 360 must be a multiple of it. By default STATE_ANGLE_STEP.
+        """
+        rho_steps = MAXIMAL_DISTANCE_TO_PARKING_LOT / rho_step
+        angle_steps = 360.0 / angle_step
+        if rho_step <= 0 or abs(rho_steps - round(rho_steps)) > 1e-9:
+            raise ValueError('{0} cm is no divisor of MAXIMAL_DISTANCE_TO_PARKING_LOT {1} cm'.format(
+                rho_step, MAXIMAL_DISTANCE_TO_PARKING_LOT))
+        if angle_step <= 0 or abs(angle_steps - round(angle_steps)) > 1e-9:
+            raise ValueError(
+                '{} degree is no divisor of 360 degree'.format(angle_step))
+        self.rho_step = float(rho_step)
+        self.angle_step = float(angle_step)
+        self.shape = (int(round(rho_steps)) + 1,
+                      int(round(angle_steps)), int(round(angle_steps)))
+
+    @staticmethod
+    def from_shape(shape: tuple):
+        """
+        Returns the resolution of a q-table or transition table.
+
+        Parameter
+        ---------
+        shape: tuple
+            Shape of the table, the first three axes are the states (rho, phi, orientation).
+
+        Returns
+        -------
+        StateResolution: The resolution with this number of states.
+        """
+        if shape[1] != shape[2]:
+            raise ValueError(
+                'Phi and orientation of shape {} have different resolutions'.format(shape))
+        return StateResolution(MAXIMAL_DISTANCE_TO_PARKING_LOT / (shape[0] - 1), 360.0 / shape[1])
+
+    def is_base(self) -> bool:
+        """
+        Returns
+        -------
+        bool: True if this is the base resolution with 1 cm and 10 degree steps.
+        """
+        return self.rho_step == BASE_RHO_STEP and self.angle_step == BASE_ANGLE_STEP
+
+    def key(self) -> tuple:
+        """
+        Returns
+        -------
+        tuple: The steps of the resolution, part of the cache key of the transition table.
+        """
+        return (self.rho_step, self.angle_step)
+
+    def rho(self, rho_index) -> float:
+        """
+        Converts a rho index into centimeter (cm).
+        """
+        return rho_index * self.rho_step
+
+    def angle(self, angle_index) -> float:
+        """
+        Converts a phi or orientation index into radians.
+        """
+        return np.deg2rad(angle_index * self.angle_step)
+
+    def rho_index(self, rho):
+        """
+        Converts a rho in centimeter (cm) into its index, rho can be a float or a numpy.ndarray.
+        Rho is rounded to STATE_ROUNDING_DECIMALS decimals of a rho step before it is cut off.
+        """
+        index = np.round(np.asarray(rho) / self.rho_step,
+                         STATE_ROUNDING_DECIMALS).astype(np.int64)
+        return int(index) if index.ndim == 0 else index
+
+    def in_range(self, rho):
+        """
+        Checks if a rho in centimeter (cm) is less equals MAXIMAL_DISTANCE_TO_PARKING_LOT, rho can be a float or a numpy.ndarray.
+        Rho is rounded like in rho_index.
+        """
+        return np.round(np.asarray(rho) / self.rho_step, STATE_ROUNDING_DECIMALS) <= self.shape[0] - 1
+
+    def angle_index(self, angle):
+        """
+        Converts a phi or orientation in radians into its index, angle can be a float or a numpy.ndarray.
+        The angle is rounded to STATE_ROUNDING_DECIMALS decimals of an angle step before it is rounded to the nearest angle step.
+        """
+        index = np.rint(np.round(np.rad2deg(angle) / self.angle_step,
+                                 STATE_ROUNDING_DECIMALS)).astype(np.int64) % self.shape[1]
+        return int(index) if index.ndim == 0 else index
+
+    def from_base(self, rho: float, phi: float, orientation: float) -> tuple:
+        """
+        Converts a position given in the base resolution into this resolution, without rounding.
+
+        Parameter
+        ---------
+        rho, phi, orientation: float
+            The position in the base resolution.
+
+        Returns
+        -------
+        tuple: The position (rho, phi, orientation) in this resolution.
+        """
+        angle_factor = BASE_ANGLE_STEP / self.angle_step
+        return (rho * (BASE_RHO_STEP / self.rho_step), phi * angle_factor, orientation * angle_factor)
+
+    def base_state(self, rho: float, phi: float, orientation: float) -> tuple:
+        """
+        Converts a state given in the base resolution into the indices of this resolution.
+
+        Parameter
+        ---------
+        rho, phi, orientation: float
+            The state in the base resolution.
+
+        Returns
+        -------
+        tuple: The state indices (rho, phi, orientation) in this resolution.
+        """
+        rho, phi, orientation = self.from_base(rho, phi, orientation)
+        return (int(rho), int(np.rint(phi)) % self.shape[1], int(np.rint(orientation)) % self.shape[2])
+
+
+def resample_qtable(qtable: np.ndarray, target: StateResolution, source: StateResolution = None) -> np.ndarray:
+    """
+    Resamples a q-table to another state resolution, e.g. to warm start training at a finer resolution with a q-table trained at a coarse resolution.
+    Every state of the target resolution gets the q values of the source state containing it, the centre of a rho bin and the angle of a phi or orientation bin.
+    The actions are the same in every resolution, so the action blocks are copied unchanged.
+
+    Parameter
+    ---------
+    qtable: numpy.ndarray
+        The q-table, resample visit counts with resample_visits.
+    target: StateResolution
+        The resolution of the resampled q-table.
+    source: StateResolution
+        The resolution of the q-table, by default derived from its shape.
+
+    Returns
+    -------
+    numpy.ndarray: The resampled q-table with the data type of the q-table.
+    """
+    source = source if source is not None else StateResolution.from_shape(
+        qtable.shape)
+    return np.asarray(qtable)[np.ix_(*_state_maps(target, source))]
+
+
+def resample_visits(visits: np.ndarray, target: StateResolution, source: StateResolution = None) -> np.ndarray:
+    """
+    Resamples visit counts to another state resolution, the total of the visits stays the same.
+    Along a finer axis the visits of a source state are split evenly between the target states it contains,
+    along a coarser axis the visits of all source states a target state contains are summed.
+
+    Parameter
+    ---------
+    visits: numpy.ndarray
+        The visit counts.
+    target: StateResolution
+        The resolution of the resampled visit counts.
+    source: StateResolution
+        The resolution of the visit counts, by default derived from their shape.
+
+    Returns
+    -------
+    numpy.ndarray: The resampled visit counts with the data type of the visit counts, saturated at its maximum.
+    """
+    source = source if source is not None else StateResolution.from_shape(
+        visits.shape)
+    resampled = np.asarray(visits).astype(np.uint64)
+    for axis, (index_map, inverse_map) in enumerate(zip(_state_maps(target, source), _state_maps(source, target))):
+        resampled = _resample_counts(resampled, index_map, inverse_map, axis)
+    return np.minimum(resampled, np.iinfo(visits.dtype).max).astype(visits.dtype)
+
+
+def _state_maps(target: StateResolution, source: StateResolution) -> tuple:
+    """
+    Maps every rho, phi and orientation index of the target resolution to the index of the source resolution containing it,
+    the centre of a rho bin and the angle of a phi or orientation bin.
+    """
+    rho_map = np.minimum(((np.arange(target.shape[0]) + 0.5) * target.rho_step / source.rho_step).astype(np.int64),
+                         source.shape[0] - 1)
+    phi_map = np.rint(np.arange(target.shape[1]) * target.angle_step /
+                      source.angle_step).astype(np.int64) % source.shape[1]
+    orientation_map = np.rint(np.arange(target.shape[2]) * target.angle_step /
+                              source.angle_step).astype(np.int64) % source.shape[2]
+    return (rho_map, phi_map, orientation_map)
+
+
+def _resample_counts(counts: np.ndarray, index_map: np.ndarray, inverse_map: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Resamples counts along one axis, the counts of a source index are split evenly between all target indices mapped to it by index_map,
+    or added to the target index mapped to it by inverse_map, if no target index is mapped to it.
+    The remainder of an uneven split goes to the first target indices.
+    """
+    unmapped = np.setdiff1d(np.arange(len(inverse_map)), index_map)
+    target_index = np.concatenate((np.arange(len(index_map)), inverse_map[unmapped]))
+    source_index = np.concatenate((index_map, unmapped))
+    shares = np.bincount(source_index, minlength=len(inverse_map))
+    order = np.argsort(source_index, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order)) - (np.cumsum(shares) - shares)[source_index[order]]
+    moved = np.moveaxis(counts, axis, 0)
+    split_shape = (len(source_index),) + (1,) * (moved.ndim - 1)
+    source_counts = moved[source_index]
+    share = shares[source_index].astype(np.uint64).reshape(split_shape)
+    split = source_counts // share + (source_counts % share > rank.astype(np.uint64).reshape(split_shape))
+    resampled = np.zeros(shape=(len(index_map),) + moved.shape[1:], dtype=np.uint64)
+    np.add.at(resampled, target_index, split)
+    return np.moveaxis(resampled, 0, axis)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Resamples a q-table pair to another state resolution.')
+    parser.add_argument('input', help='Name of the resampled q-table pair.')
+    parser.add_argument('output', help='Name of the saved q-table pair.')
+    parser.add_argument('--rho-step', type=float, default=STATE_RHO_STEP,
+                        help='Rho step of the saved q-table pair in cm, by default STATE_RHO_STEP.')
+    parser.add_argument('--angle-step', type=float, default=STATE_ANGLE_STEP,
+                        help='Phi and orientation step of the saved q-table pair in degree, by default STATE_ANGLE_STEP.')
+    arguments = parser.parse_args()
+    target = StateResolution(arguments.rho_step, arguments.angle_step)
+    qtable_pair, scale_pair = load_qtable_pair(
+        './{}.npz'.format(arguments.input))
+    visit_pair = load_visit_pair('./{}.npz'.format(arguments.input))
+    for parking_direction in Parkingdirection:
+        source = StateResolution.from_shape(
+            qtable_pair[parking_direction].shape)
+        qtable_pair[parking_direction] = resample_qtable(
+            qtable_pair[parking_direction], target, source)
+        if visit_pair[parking_direction] is not None:
+            visit_pair[parking_direction] = resample_visits(
+                visit_pair[parking_direction], target, source)
+        print('{0}: {1} states -> {2} states'.format(parking_direction.name,
+              int(np.prod(source.shape)), int(np.prod(target.shape))))
+    save_qtable_pair(arguments.output, qtable_pair,
+                     scale_pair, visit_pair=visit_pair)
+
+# Original Author: Lukas Loeffler
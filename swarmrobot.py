@@ -8,9 +8,11 @@ import cv2 as cv
 from motor import CalibratedMotor, Motor
 from pidcontroller import PIDController
 from line_tracking import LineTracker
+from frame_broker import FrameBroker
+from frame_cache import FrameCache
 from programm_type import ProgrammType
 
-from constants import DRIVE_POWER_LIMIT, DRIVE_SLEEP_TIME, TURN_SLEEP_TIME, DEGREE_PER_CM
+from constants import DRIVE_POWER_LIMIT, DRIVE_SLEEP_TIME, TURN_SLEEP_TIME, DEGREE_PER_CM, INTERSECTION_TRACKING
 
 
 class SwarmRobot:
@@ -35,6 +37,10 @@ class SwarmRobot:
 
         # Camera
         self._camera = cv.VideoCapture(0)
+        # Reads the camera once for all worker threads, started with the first worker thread.
+        self._frame_broker = FrameBroker(self._camera)
+        # Images derived from the latest frame, shared by all detectors.
+        self._frame_cache = FrameCache()
 
         self._event = Event()
 
@@ -43,13 +49,15 @@ class SwarmRobot:
         self.full_rotation_deg = 510
         self.last_line_tracking = 0
         self.power_lvl = 0
+        # Last set power of the drive motor, predicts how far a tracked intersection moves
+        self.drive_power = 0
 
         # Linetracking
         self._track_process = None
         self._track_active = False
         self._pid_controller = PIDController(verbose=False)
         self._line_tracker = LineTracker(self._camera.get(cv.CAP_PROP_FRAME_WIDTH), self._camera.get(
-            cv.CAP_PROP_FRAME_HEIGHT), preview=self._preview_mode, bot=self, debug=self._debug_mode)
+            cv.CAP_PROP_FRAME_HEIGHT), preview=self._preview_mode, bot=self, debug=self._debug_mode, frame_cache=self._frame_cache)
 
         # Navigation
         self._programm_type = programm_type
@@ -61,8 +69,11 @@ class SwarmRobot:
         self._intsecdet_process = None
         self._intsecdet_active = False
         self._intersection_detector = None
+        self._intersection_tracker = None
         self.intersection = []
         self.intersection_img = None
+        # Sequence number of the frame and intersection_img, set together, so the red mask of the image can be taken from the frame cache.
+        self.intersection_frame = (None, None)
 
         # Parking
         self._parking_learner = None
@@ -74,9 +85,11 @@ class SwarmRobot:
 
     def change_drive_power(self, pnew):
         self._drive_motor.change_power(pnew)
+        self.drive_power = pnew
 
     def set_drive_power(self, pnew):
         self._drive_motor.set_power(pnew)
+        self.drive_power = pnew
 
     def set_drive_steer(self, pnew):
         pos = self._steer_motor.position_from_factor(pnew)
@@ -135,6 +148,7 @@ class SwarmRobot:
 
     def stop_all(self):
         self._drive_motor.stop()
+        self.drive_power = 0
         self._steer_motor.stop()
 
     def straight(self):
@@ -153,6 +167,7 @@ class SwarmRobot:
         from time import sleep
 
         def follow(event):
+            sequence = 0
             try:
                 while True:
                     if not self._track_active:
@@ -162,10 +177,11 @@ class SwarmRobot:
                         sleep(0.5)
 
                     if self._track_active:
-                        _, frame = self._camera.read()
+                        sequence, _, frame = self._frame_broker.wait_for_newer(
+                            sequence)
                         if frame is not None:
                             pos = self._line_tracker.track_line(
-                                frame, event, self)
+                                frame, event, self, sequence=sequence)
                             self.last_line_tracking = pos
                             if pos != None:
                                 self.steer = self._pid_controller.pid(pos)
@@ -178,6 +194,7 @@ class SwarmRobot:
                 self.log_error("[Autopilot|{0}] {1}\nTraceback:\n{2}".format(
                     datetime.datetime.now().isoformat(), str(exception), traceback.format_exc()))
 
+        self._frame_broker.start()
         self._track_process = Thread(
             group=None, target=follow, daemon=True, args=(self._event,))
         self._track_process.start()
@@ -203,6 +220,7 @@ class SwarmRobot:
                 cv.CAP_PROP_FRAME_HEIGHT), self, parking_learner=self._parking_learner, preview=self._preview_mode, debug=self._debug_mode)
 
         def navigate(event):
+            sequence = 0
             try:
                 while True:
                     if not self._navigation_active:
@@ -212,7 +230,8 @@ class SwarmRobot:
                         sleep(5)
 
                     if self._navigation_active:
-                        _, frame = self._camera.read()
+                        sequence, _, frame = self._frame_broker.wait_for_newer(
+                            sequence)
                         if frame is not None:
                             self._navigator.navigate(frame, event)
             except KeyboardInterrupt:
@@ -223,6 +242,7 @@ class SwarmRobot:
                 self.log_error("[Navigation|{0}] {1}\nTraceback:\n{2}".format(
                     datetime.datetime.now().isoformat(), str(exception), traceback.format_exc()))
 
+        self._frame_broker.start()
         self._navigation_process = Thread(
             group=None, target=navigate, daemon=True, args=(self._event,))
         self._navigation_process.start()
@@ -236,12 +256,18 @@ class SwarmRobot:
         import datetime
         from time import sleep
         from intersection_detection import IntersectionDetection
+        from intersection_tracker import IntersectionTracker
 
         if self._intersection_detector == None:
             self._intersection_detector = IntersectionDetection(self._camera.get(
-                cv.CAP_PROP_FRAME_WIDTH), self._camera.get(cv.CAP_PROP_FRAME_HEIGHT), self, preview=self._preview_mode, debug=self._debug_mode)
+                cv.CAP_PROP_FRAME_WIDTH), self._camera.get(cv.CAP_PROP_FRAME_HEIGHT), self, preview=self._preview_mode, debug=self._debug_mode, frame_cache=self._frame_cache)
+            if INTERSECTION_TRACKING:
+                # Runs the full intersection detection only, if the intersection can't be tracked.
+                self._intersection_tracker = IntersectionTracker(
+                    self._intersection_detector, self)
 
         def detect_intersection():
+            sequence = 0
             try:
                 while True:
                     if not self._intsecdet_active:
@@ -251,10 +277,14 @@ class SwarmRobot:
                         sleep(5)
 
                     if self._intsecdet_active:
-                        _, frame = self._camera.read()
-                        if frame is not None:
+                        sequence, timestamp, frame = self._frame_broker.wait_for_newer(
+                            sequence)
+                        if frame is not None and self._intersection_tracker is not None:
+                            self._intersection_tracker.update(
+                                frame, sequence=sequence, timestamp=timestamp)
+                        elif frame is not None:
                             self._intersection_detector.detect_intersection(
-                                frame)
+                                frame, sequence=sequence)
             except KeyboardInterrupt:
                 self.stop_all()
             except Exception as exception:
@@ -263,6 +293,7 @@ class SwarmRobot:
                 self.log_error("[Intersection Detection|{0}] {1}\nTraceback:\n{2}".format(
                     datetime.datetime.now().isoformat(), str(exception), traceback.format_exc()))
 
+        self._frame_broker.start()
         self._intsecdet_process = Thread(
             group=None, target=detect_intersection, daemon=True)
         self._intsecdet_process.start()
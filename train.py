@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+import argparse
+import datetime
+
+from os.path import isfile
+
+import numpy as np
+
+from parking_learner import ParkingLearner
+from parkingdirection import Parkingdirection
+from batch_simulator import BatchSimulator
+from training_metrics import TrainingMonitor
+from greedy_policy import GreedyPolicy, save_policy_pair
+from qtable_storage import save_qtable_pair, has_qtable_pair_mmap, save_qtable_pair_mmap, qtable_mmap_directory, empty_visits, load_visit_pair, load_or_create_qtable_pair
+from coverage import CoverageStartSampler
+from state_resolution import StateResolution, resample_qtable, resample_visits
+
+from constants import NUMBER_OF_SIMULATIONS, SIMULATION_BATCH_SIZE, QTABLE_STORAGE, TRACK_VISITS, COVERAGE_START, STATE_RHO_STEP, STATE_ANGLE_STEP, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH
+
+
+def load_or_create_visit_pair(name: str, qtable_pair: dict) -> dict:
+    """
+    Loads the visit counts of a q-table pair, visit counts of another state resolution are resampled and missing visit counts are created filled with zeros.
+
+    Parameter
+    ---------
+    name: str
+        Name of the q-table pair, None creates new visit counts.
+    qtable_pair: dict
+        The q-tables keyed by Parkingdirection, their shape is the shape of new visit counts.
+
+    Returns
+    -------
+    dict: The visit counts keyed by Parkingdirection.
+    """
+    visit_pair = {parking_direction: None for parking_direction in Parkingdirection}
+    if name is not None and has_qtable_pair_mmap(name):
+        visit_pair = load_visit_pair(qtable_mmap_directory(name))
+    elif name is not None and isfile('./{}.npz'.format(name)):
+        visit_pair = load_visit_pair('./{}.npz'.format(name))
+    for parking_direction in Parkingdirection:
+        if visit_pair[parking_direction] is None:
+            visit_pair[parking_direction] = empty_visits(
+                qtable_pair[parking_direction].shape)
+        elif visit_pair[parking_direction].shape != qtable_pair[parking_direction].shape:
+            visit_pair[parking_direction] = resample_visits(visit_pair[parking_direction], StateResolution.from_shape(
+                qtable_pair[parking_direction].shape))
+    return visit_pair
+
+
+def train(output: str, episodes: int = NUMBER_OF_SIMULATIONS, random_start: bool = True, seed: int = None, workers: int = 1, batch_size: int = SIMULATION_BATCH_SIZE, directions: list = None, alpha: float = 1.0, y: float = 0.95, qtable_name: str = None, metrics: bool = True, resolution: StateResolution = None) -> dict:
+    """
+    Trains a q-table pair with the simulator model, without the hardware of the robot, and saves it.
+    A q-table pair of another state resolution is resampled first, so a q-table pair trained at a coarse resolution warm starts the training at a finer resolution.
+    If TRACK_VISITS is true, the visit counts are saved with the q-table pair and with one worker and COVERAGE_START random start states prefer rarely visited states.
+
+    Parameter
+    ---------
+    output: str
+        Name of the saved q-table pair, saved in the QTABLE_STORAGE format.
+    episodes: int
+        Number of simulated episodes per parking direction, by default NUMBER_OF_SIMULATIONS.
+    random_start: bool
+        If true, every episode starts at a random state, otherwise at the default start state.
+    seed: int
+        Seed of the simulation, by default None for a random seed.
+        With more than one worker only the worker seeds are reproducible, concurrent updates can change the trained q-table pair.
+    workers: int
+        Number of worker processes, 1 simulates in this process with metrics and early stopping.
+    batch_size: int
+        Number of episodes simulated in lockstep, by default SIMULATION_BATCH_SIZE.
+    directions: list
+        Parking directions to train, by default both.
+    alpha, y: float
+        Learning parameters, by default 1.0 and 0.95 like the exhibition.
+    qtable_name: str
+        Name of a q-table pair to continue training, by default None to start with empty q-tables.
+    metrics: bool
+        If true and workers is 1, writes training metrics into <output>_<direction>_metrics.csv and stops early on a stable greedy policy.
+    resolution: StateResolution
+        State resolution of the trained q-table pair, by default the resolution of constants.py.
+
+    Returns
+    -------
+    dict: The trained q-table pair keyed by Parkingdirection.
+    """
+    resolution = resolution if resolution is not None else StateResolution()
+    qtable_pair, scale_pair = load_or_create_qtable_pair(
+        qtable_name, resolution.shape + (SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH))
+    for parking_direction in Parkingdirection:
+        if qtable_pair[parking_direction].shape[:3] != resolution.shape:
+            qtable_pair[parking_direction] = resample_qtable(
+                qtable_pair[parking_direction], resolution)
+    visit_pair = load_or_create_visit_pair(
+        qtable_name, qtable_pair) if TRACK_VISITS else None
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(Parkingdirection))
+    for parking_direction, seed_sequence in zip(Parkingdirection, seed_sequences):
+        if directions is not None and parking_direction not in directions:
+            continue
+        start_time = datetime.datetime.now()
+        parking_learner = ParkingLearner(bot=None, qtable=qtable_pair[parking_direction], alpha=alpha, y=y,
+                                         parkingdirection=parking_direction, qtable_scale=scale_pair[parking_direction], seed=seed_sequence,
+                                         visits=visit_pair[parking_direction] if visit_pair is not None else None, resolution=resolution)
+        if workers > 1:
+            # Imported here, because multiprocessing.shared_memory needs python 3.8 or newer.
+            from parallel_simulator import ParallelSimulator
+            steps = ParallelSimulator(parking_learner, workers=workers, batch_size=batch_size).run(
+                number_of_episodes=episodes, random_start=random_start, seed=seed_sequence)
+        else:
+            monitor = TrainingMonitor(parking_learner._qtable, parking_learner._qtable_scale, path='./{0}_{1}_metrics.csv'.format(
+                output, parking_direction.name.lower())) if metrics else None
+            start_sampler = CoverageStartSampler(parking_learner._visits, seed=seed_sequence.spawn(
+                1)[0]) if COVERAGE_START and parking_learner._visits is not None else None
+            steps = BatchSimulator(parking_learner, batch_size=batch_size).run(
+                number_of_episodes=episodes, random_start=random_start, seed=seed_sequence, monitor=monitor, start_sampler=start_sampler)
+        # Copy on write memory maps are not written, so the q-table is kept from the parking learner.
+        qtable_pair[parking_direction] = parking_learner._qtable
+        print('Trained {0} with {1} steps in {2}'.format(
+            parking_direction.name, steps, datetime.datetime.now() - start_time))
+    if QTABLE_STORAGE == 'mmap':
+        save_qtable_pair_mmap(output, qtable_pair,
+                              scale_pair, visit_pair=visit_pair)
+    else:
+        save_qtable_pair(output, qtable_pair, scale_pair,
+                         visit_pair=visit_pair)
+    save_policy_pair(output, {parking_direction: GreedyPolicy.from_qtable(
+        qtable_pair[parking_direction]) for parking_direction in Parkingdirection})
+    return qtable_pair
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Trains a q-table pair with the simulator model, without the hardware of the swarmrobot.')
+    parser.add_argument('--episodes', type=int, default=NUMBER_OF_SIMULATIONS,
+                        help='Number of simulated episodes per parking direction, by default NUMBER_OF_SIMULATIONS.')
+    parser.add_argument('--start', choices=['random', 'default'], default='random',
+                        help='Start every episode at a random state or at the default start state, by default random.')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed of the simulation, by default a random seed. Only with one worker the same seed trains the same q-table pair.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes, more than 1 needs python 3.8 or newer and disables the metrics.')
+    parser.add_argument('--batch-size', type=int, default=SIMULATION_BATCH_SIZE,
+                        help='Number of episodes simulated in lockstep.')
+    parser.add_argument('--direction', choices=['both', 'forward', 'backward'], default='both',
+                        help='Parking direction to train, by default both.')
+    parser.add_argument('--alpha', type=float, default=1.0,
+                        help='The alpha of the q-learning, by default 1.0.')
+    parser.add_argument('--y', type=float, default=0.95,
+                        help='The y of the q-learning, by default 0.95.')
+    parser.add_argument('--input', default=None,
+                        help='Name of a q-table pair to continue training, by default empty q-tables.')
+    parser.add_argument('--output', default='default',
+                        help='Name of the saved q-table pair, by default "default".')
+    parser.add_argument('--rho-step', type=float, default=STATE_RHO_STEP,
+                        help='Rho step of the states in cm, by default STATE_RHO_STEP.')
+    parser.add_argument('--angle-step', type=float, default=STATE_ANGLE_STEP,
+                        help='Phi and orientation step of the states in degree, by default STATE_ANGLE_STEP.')
+    parser.add_argument('--no-metrics', action='store_true',
+                        help='Neither writes training metrics nor stops early.')
+    arguments = parser.parse_args()
+    train(output=arguments.output, episodes=arguments.episodes, random_start=arguments.start == 'random', seed=arguments.seed,
+          workers=arguments.workers, batch_size=arguments.batch_size,
+          directions=None if arguments.direction == 'both' else [
+              Parkingdirection[arguments.direction.upper()]],
+          alpha=arguments.alpha, y=arguments.y, qtable_name=arguments.input, metrics=not arguments.no_metrics,
+          resolution=StateResolution(arguments.rho_step, arguments.angle_step))
+
+# Original Author: Lukas Loeffler
@@ -0,0 +1,159 @@
+import datetime
+
+import numpy as np
+
+from constants import METRICS_INTERVAL, METRICS_FILE, EARLY_STOP_INTERVALS
+
+
+class TrainingMonitor:
+    """
+    Collects metrics of a simulated training and writes them every METRICS_INTERVAL episodes and at the end of the training as a row into a csv file.
+    A row contains the episodes per second, steps per second, mean episode length and success rate of the interval,
+    the number of truncated episodes, the maximal q value change and the number of states, whose greedy action changed since the last row.
+    The training can be stopped early, when the greedy action of no state changed for EARLY_STOP_INTERVALS intervals.
+    """
+
+    CSV_HEADER = 'episodes,seconds,episodes_per_second,steps_per_second,mean_episode_length,success_rate,truncated_episodes,maximal_q_change,changed_greedy_states'
+
+    def __init__(self, qtable: np.ndarray, qtable_scale: float = None, interval: int = METRICS_INTERVAL, stable_intervals: int = EARLY_STOP_INTERVALS, path: str = METRICS_FILE):
+        """
+        Creates a new training monitor for a q-table and starts the first interval.
+
+        Parameter
+        ---------
+        qtable: numpy.ndarray
+            The q-table, which is trained.
+        qtable_scale: float
+            Scale of an int16 q-table, None for float q-tables.
+        interval: int
+            Number of episodes per metrics row, by default METRICS_INTERVAL.
+        stable_intervals: int
+            Number of intervals without greedy action changes, after which the training stops, by default EARLY_STOP_INTERVALS. 0 never stops early.
+        path: str
+            Path of the csv file, by default METRICS_FILE. None doesn't write a file.
+        """
+        self._qtable = qtable
+        self._qtable_scale = qtable_scale
+        self._interval = max(1, interval)
+        self._stable_intervals = stable_intervals
+        self._path = path
+        self.rows = []
+        self.episodes = 0
+        self._interval_episodes = 0
+        self._interval_steps = 0
+        self._interval_parked = 0
+        self._interval_truncated = 0
+        self._stable_counter = 0
+        self._snapshot = qtable.copy()
+        self._greedy_actions = self._greedy(qtable)
+        self._start_time = datetime.datetime.now()
+        self._interval_start_time = self._start_time
+        if self._path is not None:
+            with open(self._path, 'w') as metrics_file:
+                metrics_file.write('{}\n'.format(self.CSV_HEADER))
+
+    @staticmethod
+    def _greedy(qtable: np.ndarray) -> np.ndarray:
+        """
+        Returns the flat index of the best action of every state.
+
+        Parameter
+        ---------
+        qtable: numpy.ndarray
+            The q-table.
+
+        Returns
+        -------
+        numpy.ndarray: The best action index of every state, shape=(rho, phi, orientation).
+        """
+        return qtable.reshape(qtable.shape[:3] + (-1,)).argmax(axis=3).astype(np.int16)
+
+    def record(self, episodes: int, steps: int, parked: int, truncated: int = 0):
+        """
+        Adds finished episodes to the current interval.
+
+        Parameter
+        ---------
+        episodes: int
+            Number of finished episodes.
+        steps: int
+            Number of steps of the finished episodes.
+        parked: int
+            Number of the finished episodes, which reached the parking position.
+        truncated: int
+            Number of the finished episodes, which were truncated because of the step limit or a revisited state.
+        """
+        self.episodes += episodes
+        self._interval_episodes += episodes
+        self._interval_steps += steps
+        self._interval_parked += parked
+        self._interval_truncated += truncated
+
+    def interval_finished(self) -> bool:
+        """
+        Returns
+        -------
+        bool: True if the current interval contains METRICS_INTERVAL episodes and should be logged.
+        """
+        return self._interval_episodes >= self._interval
+
+    def log(self) -> bool:
+        """
+        Writes the metrics of the current interval and starts the next interval.
+        The q value change is compared slice by slice, so no copy of the whole q-table is needed.
+
+        Returns
+        -------
+        bool: True if the training should stop, because the greedy policy was stable for EARLY_STOP_INTERVALS intervals.
+        """
+        now = datetime.datetime.now()
+        seconds = max((now - self._interval_start_time).total_seconds(), 1e-9)
+        maximal_q_change = 0.0
+        for rho in range(self._qtable.shape[0]):
+            change = np.abs(self._qtable[rho].astype(float) -
+                            self._snapshot[rho]).max()
+            maximal_q_change = max(maximal_q_change, float(change))
+        if self._qtable_scale is not None:
+            maximal_q_change *= self._qtable_scale
+        self._snapshot[...] = self._qtable
+        greedy_actions = self._greedy(self._qtable)
+        changed_greedy_states = int(
+            np.count_nonzero(greedy_actions != self._greedy_actions))
+        self._greedy_actions = greedy_actions
+        row = {
+            'episodes': self.episodes,
+            'seconds': (now - self._start_time).total_seconds(),
+            'episodes_per_second': self._interval_episodes / seconds,
+            'steps_per_second': self._interval_steps / seconds,
+            'mean_episode_length': self._interval_steps / max(1, self._interval_episodes),
+            'success_rate': self._interval_parked / max(1, self._interval_episodes),
+            'truncated_episodes': self._interval_truncated,
+            'maximal_q_change': maximal_q_change,
+            'changed_greedy_states': changed_greedy_states
+        }
+        self.rows.append(row)
+        if self._path is not None:
+            with open(self._path, 'a') as metrics_file:
+                metrics_file.write('{}\n'.format(','.join(str(row[column])
+                                                          for column in self.CSV_HEADER.split(','))))
+        print('Episodes: {0}, episodes/s: {1:.1f}, steps/s: {2:.1f}, success rate: {3:.3f}, truncated: {4}, maximal q change: {5:.4f}, changed greedy states: {6}'.format(
+            row['episodes'], row['episodes_per_second'], row['steps_per_second'], row['success_rate'], row['truncated_episodes'], row['maximal_q_change'], row['changed_greedy_states']))
+        self._interval_episodes = 0
+        self._interval_steps = 0
+        self._interval_parked = 0
+        self._interval_truncated = 0
+        self._interval_start_time = now
+        # Counts the intervals in a row, in which the greedy policy did not change.
+        self._stable_counter = self._stable_counter + \
+            1 if changed_greedy_states == 0 else 0
+        return self._stable_intervals > 0 and self._stable_counter >= self._stable_intervals
+
+    def finish(self):
+        """
+        Writes the metrics of the last, not full interval, so the rows cover all episodes of the training, also after an early stop.
+        Does nothing, if no episode finished since the last row.
+        """
+        if self._interval_episodes > 0:
+            self.log()
+
+# Original Author: Lukas Loeffler
@@ -0,0 +1,268 @@
+import hashlib
+
+from os.path import isfile
+
+import numpy as np
+
+from state_resolution import StateResolution
+
+from constants import TURNING_RADIUS_50, TURNING_RADIUS_100, TURNING_DIRECTIONS, MAXIMAL_DISTANCE_TO_PARKING_LOT, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH, BACKWARD_ACTION_LENGTH_SUBTRAHEND, FORWARD_ACTION_LENGTH_SUBTRAHEND, STATE_ROUNDING_DECIMALS, TRANSITION_TABLE_FILE
+
+TRANSITION_TABLE_VERSION = 3
+"""
+int:
+Version of the transition table calculation, part of the cache key.
+Increase it, if the calculation in compute() changes.
+"""
+
+
+def index_dtype(maximum: int) -> np.dtype:
+    """
+    Returns the smallest signed integer data type, which holds all indices up to maximum.
+
+    Parameter
+    ---------
+    maximum: int
+        The largest index.
+
+    Returns
+    -------
+    numpy.dtype: int8, int16, int32 or int64.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if maximum <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class TransitionTable:
+    """
+    Precomputed kinematic model of the parking learner.
+    Contains the next state and the in range flag of every state and action combination, calculated like ParkingLearner.update_state.
+    Both round the position to STATE_ROUNDING_DECIMALS decimals before it is discretised, so the vectorized calculation gives the same states.
+    The arrays have the shape of the q-table (rho, phi, orientation, direction, length).
+    next_rho can be bigger than the largest rho index, if the robot leaves the parking area, in that case in_range is False.
+    The table is cached on disk, keyed by a hash of the geometry values from constants.py and the state resolution.
+    """
+
+    def __init__(self, next_rho: np.ndarray, next_phi: np.ndarray, next_orientation: np.ndarray, in_range: np.ndarray):
+        """
+        Creates a new transition table from precomputed arrays.
+
+        Parameter
+        ---------
+        next_rho: numpy.ndarray
+            Rho of the next state, int16 in the default resolution.
+        next_phi: numpy.ndarray
+            Phi of the next state, int8 in the default resolution.
+        next_orientation: numpy.ndarray
+            Orientation of the next state, int8 in the default resolution.
+        in_range: numpy.ndarray
+            True if the robot is less equals MAXIMAL_DISTANCE_TO_PARKING_LOT away from the parking lot after the action.
+        """
+        self.next_rho = next_rho
+        self.next_phi = next_phi
+        self.next_orientation = next_orientation
+        self.in_range = in_range
+        self.state_shape = next_rho.shape[:3]
+        self.action_shape = next_rho.shape[3:]
+
+    @staticmethod
+    def geometry(resolution: StateResolution = None) -> tuple:
+        """
+        Returns all values of constants.py the kinematic model depends on.
+
+        Parameter
+        ---------
+        resolution: StateResolution
+            The state resolution, by default the resolution of constants.py.
+
+        Returns
+        -------
+        tuple: The geometry values.
+        """
+        resolution = resolution if resolution is not None else StateResolution()
+        return (TRANSITION_TABLE_VERSION, TURNING_RADIUS_50, TURNING_RADIUS_100, tuple(TURNING_DIRECTIONS), MAXIMAL_DISTANCE_TO_PARKING_LOT, resolution.shape, resolution.key(), STATE_ROUNDING_DECIMALS, SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH, BACKWARD_ACTION_LENGTH_SUBTRAHEND, FORWARD_ACTION_LENGTH_SUBTRAHEND)
+
+    @staticmethod
+    def geometry_hash(resolution: StateResolution = None) -> str:
+        """
+        Returns a short hash of the geometry values, used as cache key.
+
+        Parameter
+        ---------
+        resolution: StateResolution
+            The state resolution, by default the resolution of constants.py.
+
+        Returns
+        -------
+        str: The first 16 hex digits of the sha1 hash of the geometry values.
+        """
+        return hashlib.sha1(repr(TransitionTable.geometry(resolution)).encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def compute(resolution: StateResolution = None):
+        """
+        Calculates the next state for every state and action combination.
+        The calculation is vectorized with numpy and done rho slice by rho slice, to keep the memory usage low.
+
+        Parameter
+        ---------
+        resolution: StateResolution
+            The state resolution, by default the resolution of constants.py.
+
+        Returns
+        -------
+        TransitionTable: The calculated transition table.
+        """
+        resolution = resolution if resolution is not None else StateResolution()
+        shape = resolution.shape + (SIZE_ACTION_DIRECTION, SIZE_ACTION_LENTGH)
+        length_index = np.arange(SIZE_ACTION_LENTGH)
+        length = np.where(length_index < 10, length_index - BACKWARD_ACTION_LENGTH_SUBTRAHEND,
+                          length_index - FORWARD_ACTION_LENGTH_SUBTRAHEND).astype(float)[None, None, None, :]
+        # The index data types depend on the resolution, an action moves the robot at most its length or the diameter of its turning circle away.
+        next_rho = np.empty(shape=shape, dtype=index_dtype(resolution.rho_index(resolution.rho(
+            shape[0] - 1) + max(np.abs(length).max(), 2 * TURNING_RADIUS_50, 2 * TURNING_RADIUS_100)) + 1))
+        next_phi = np.empty(shape=shape, dtype=index_dtype(shape[1] - 1))
+        next_orientation = np.empty(
+            shape=shape, dtype=index_dtype(shape[2] - 1))
+        in_range = np.empty(shape=shape, dtype=bool)
+        # Broadcastable state and action axes, shape=(phi, orientation, direction, length).
+        rad_phi = resolution.angle(np.arange(shape[1]))[:, None, None, None]
+        rad_orientation = resolution.angle(
+            np.arange(shape[2]))[None, :, None, None]
+        direction = np.array(TURNING_DIRECTIONS, dtype=float)[
+            None, None, :, None]
+        # Turning radius based on direction index, like ParkingLearner.update_state.
+        turning_radius = np.array([TURNING_RADIUS_100 if index == 1 or index == 3 else TURNING_RADIUS_50 for index in range(
+            SIZE_ACTION_DIRECTION)])[None, None, :, None]
+        is_straight = direction == 0.0
+        # Angle from the robot to the centre of rotation of the turning circle.
+        centre_angle = np.where(direction > 0, rad_orientation + (1.5 * np.pi),
+                                rad_orientation + (0.5 * np.pi))
+        turning_perimeter = 2 * np.pi * turning_radius
+        turning_radiant = 2 * np.pi * (-length / turning_perimeter)
+        curve_angle = rad_orientation + np.pi + turning_radiant
+        orientation_t = np.where(
+            is_straight, rad_orientation, rad_orientation + turning_radiant)
+        cos_orientation = np.cos(rad_orientation)
+        sin_orientation = np.sin(rad_orientation)
+        cos_centre = np.cos(centre_angle)
+        sin_centre = np.sin(centre_angle)
+        cos_curve = np.cos(curve_angle)
+        sin_curve = np.sin(curve_angle)
+        for rho in range(shape[0]):
+            x = resolution.rho(rho) * np.cos(rad_phi)
+            y = resolution.rho(rho) * np.sin(rad_phi)
+            # Robot drives straight forward or backward.
+            x_straight = x + length * cos_orientation
+            y_straight = y + length * sin_orientation
+            # Robot drives a curve.
+            x_m = x + turning_radius * cos_centre
+            y_m = y + turning_radius * sin_centre
+            x_curve = x_m + turning_radius * cos_curve
+            y_curve = y_m + turning_radius * sin_curve
+            x_t = np.where(is_straight, x_straight, x_curve)
+            y_t = np.where(is_straight, y_straight, y_curve)
+            rho_t = np.sqrt(x_t ** 2 + y_t ** 2)
+            phi_t = np.arctan2(y_t, x_t)
+            next_rho[rho] = resolution.rho_index(rho_t)
+            next_phi[rho] = resolution.angle_index(phi_t)
+            next_orientation[rho] = np.broadcast_to(
+                resolution.angle_index(orientation_t), rho_t.shape)
+            in_range[rho] = resolution.in_range(rho_t)
+        return TransitionTable(next_rho, next_phi, next_orientation, in_range)
+
+    @staticmethod
+    def load(directory: str = '.', resolution: StateResolution = None):
+        """
+        Loads the transition table from the cache file matching the current geometry.
+        Calculates and saves the transition table, if no matching cache file exists.
+
+        Parameter
+        ---------
+        directory: str
+            Directory of the cache file, by default the current directory.
+        resolution: StateResolution
+            The state resolution, by default the resolution of constants.py.
+
+        Returns
+        -------
+        TransitionTable: The transition table of the current geometry.
+        """
+        path = '{0}/{1}'.format(directory,
+                                TRANSITION_TABLE_FILE.format(TransitionTable.geometry_hash(resolution)))
+        if isfile(path):
+            with np.load(path) as data:
+                return TransitionTable(data['next_rho'], data['next_phi'], data['next_orientation'], data['in_range'])
+        transition_table = TransitionTable.compute(resolution)
+        transition_table.save(path)
+        return transition_table
+
+    def save(self, path: str):
+        """
+        Saves the transition table into a compressed .npz file.
+
+        Parameter
+        ---------
+        path: str
+            Path of the file.
+        """
+        np.savez_compressed(path, next_rho=self.next_rho, next_phi=self.next_phi,
+                            next_orientation=self.next_orientation, in_range=self.in_range)
+
+    def flat_next_state(self) -> np.ndarray:
+        """
+        Calculates the flat index of the next state of every state and action combination, for vectorized lookups in a q-table reshaped to (states, actions).
+        Next states outside of the table are clipped into the table, use leaves_table() to mask them.
+
+        Returns
+        -------
+        numpy.ndarray: The flat next state indices, dtype int32, one dimensional.
+        """
+        return np.ravel_multi_index((np.minimum(self.next_rho, self.state_shape[0] - 1), self.next_phi,
+                                     self.next_orientation), self.state_shape).astype(np.int32).reshape(-1)
+
+    def leaves_table(self) -> np.ndarray:
+        """
+        Marks the state and action combinations, whose next state is outside of the q-table.
+
+        Returns
+        -------
+        numpy.ndarray: True where the next rho is bigger than MAXIMAL_DISTANCE_TO_PARKING_LOT, one dimensional.
+        """
+        return (self.next_rho >= self.state_shape[0]).reshape(-1)
+
+    def valid_actions(self) -> tuple:
+        """
+        Lists the actions of every state, which don't leave the q-table, in compressed sparse row format.
+        The valid actions of the flat state s are actions[offsets[s]:offsets[s + 1]].
+        A state, whose actions all leave the q-table, lists all its actions instead, so every state has at least one action to draw.
+
+        Returns
+        -------
+        tuple: The offsets, dtype int64 with one element more than states, and the flat action indices, dtype int16.
+        """
+        valid = ~self.leaves_table().reshape(-1, int(np.prod(self.action_shape)))
+        valid[~valid.any(axis=1)] = True
+        offsets = np.zeros(shape=len(valid) + 1, dtype=np.int64)
+        np.cumsum(valid.sum(axis=1), out=offsets[1:])
+        return (offsets, np.nonzero(valid)[1].astype(np.int16))
+
+    def contains(self, rho, phi, orientation) -> bool:
+        """
+        Checks if a state is part of the table.
+
+        Parameter
+        ---------
+        rho, phi, orientation: int
+            The state.
+
+        Returns
+        -------
+        bool: True if the state indices are integral and inside the state space.
+        """
+        return (rho == int(rho) and phi == int(phi) and orientation == int(orientation)
+                and 0 <= rho < self.state_shape[0] and 0 <= phi < self.state_shape[1] and 0 <= orientation < self.state_shape[2])
+
+# Original Author: Lukas Loeffler